@@ -0,0 +1,112 @@
+"""
+Бенчмарк генерации Excel: время и пиковая память
+
+Запуск из корня репозитория:
+    python -m benchmarks.excel_render
+"""
+import asyncio
+import io
+import os
+import time
+import tracemalloc
+from typing import BinaryIO, Callable, Dict
+
+import openpyxl
+
+from bot.config import config
+from bot.utils.excel_executor import ExcelRenderExecutor
+from bot.utils.excel_generator import build_simple_workbook, stream_simple_workbook, template_renderer
+
+SIZES = (1, 50, 500, 5000)
+REPEATS = 5
+BURST = 8
+
+
+def make_application(participants: int) -> Dict:
+    """Тестовая заявка с заданным числом участников"""
+    return {
+        "sport_type": "Футбол",
+        "event_rank": "Чемпионат России",
+        "country": "Россия",
+        "city": "Казань",
+        "applicant": "Иванов Иван Иванович",
+        "participants": [
+            {"full_name": f"Участник Номер {idx}", "date_from": "01.06.2025", "date_to": "10.06.2025"}
+            for idx in range(1, participants + 1)
+        ]
+    }
+
+
+def saved(build: Callable[[Dict], openpyxl.Workbook]) -> Callable[[Dict, BinaryIO], None]:
+    """Рендерер, сохраняющий собранную в памяти книгу"""
+    return lambda data, output: build(data).save(output)
+
+
+def stream(data: Dict, output: BinaryIO) -> None:
+    stream_simple_workbook(data, iter(data["participants"]), output)
+
+
+def measure(render: Callable[[Dict, BinaryIO], None], data: Dict) -> tuple:
+    """Среднее время (мс) и пиковая память (КБ) генерации с сохранением в память"""
+    elapsed = 0.0
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        render(data, io.BytesIO())
+        elapsed += time.perf_counter() - start
+
+    tracemalloc.start()
+    render(data, io.BytesIO())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed / REPEATS * 1000, peak / 1024
+
+
+def reload_template(data: Dict) -> openpyxl.Workbook:
+    """Базовый вариант для сравнения: загрузка шаблона с диска на каждый запрос"""
+    wb = openpyxl.load_workbook(config.TEMPLATE_FILE)
+    ws = wb[template_renderer.SHEET_NAME]
+    for idx, participant in enumerate(data["participants"][:template_renderer.capacity]):
+        half, slot = divmod(idx, template_renderer.SLOTS_PER_COLUMN)
+        ws.cell(row=template_renderer.FIRST_SLOT_ROW + slot,
+                column=template_renderer.SLOT_COLUMNS[half][1],
+                value=participant["full_name"])
+    return wb
+
+
+async def burst(mode: str, size: int) -> float:
+    """Время (мс) обработки BURST одновременных заявок пулом генерации"""
+    executor = ExcelRenderExecutor(mode=mode, workers=os.cpu_count() or 2)
+    await executor.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(executor.render(make_application(size)) for _ in range(BURST)))
+    elapsed = time.perf_counter() - start
+    await executor.shutdown()
+    return elapsed * 1000
+
+
+def main() -> None:
+    # Разбор шаблона выполняется один раз и в замеры не входит
+    start = time.perf_counter()
+    template_renderer.snapshot
+    print(f"Разбор шаблона: {(time.perf_counter() - start) * 1000:.1f} мс (однократно)\n")
+
+    renderers = {
+        "simple": saved(build_simple_workbook),
+        "stream": stream,
+        "template": saved(template_renderer.build_workbook),
+        "reload": saved(reload_template)
+    }
+    print(f"{'renderer':<10} {'участников':>10} {'время, мс':>10} {'пик, КБ':>10}")
+    for name, build in renderers.items():
+        for size in SIZES:
+            ms, kb = measure(build, make_application(size))
+            print(f"{name:<10} {size:>10} {ms:>10.1f} {kb:>10.0f}")
+
+    print(f"\nПачка из {BURST} заявок по 500 участников, воркеров: {os.cpu_count()}")
+    for mode in ("thread", "process"):
+        print(f"{mode:<10} {asyncio.run(burst(mode, 500)):>10.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
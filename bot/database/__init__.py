@@ -2,7 +2,7 @@
 """
 Database module
 """
-from .database import init_db, get_session
-from .models import User, Application, Draft, Participant
+from .database import init_db, get_session, LazySession
+from .models import User, Application, Draft, Participant, FSMRecord, DeliveryJob
 
-__all__ = ["init_db", "get_session", "User", "Application", "Draft", "Participant"]
+__all__ = ["init_db", "get_session", "LazySession", "User", "Application", "Draft", "Participant", "FSMRecord", "DeliveryJob"]
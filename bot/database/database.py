@@ -2,8 +2,13 @@
 Работа с базой данных
 """
 import logging
-from typing import AsyncGenerator
+import os
+from typing import Any, AsyncGenerator, Callable, Optional
 
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncSession,
@@ -11,7 +16,6 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from bot.config import config
-from .models import Base
 
 logger = logging.getLogger(__name__)
 
@@ -20,8 +24,8 @@ engine = create_async_engine(
     config.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
     echo=config.DEBUG,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW
 )
 
 # Фабрика сессий
@@ -32,11 +36,22 @@ async_session_maker = async_sessionmaker(
 )
 
 
+ALEMBIC_INI = os.path.join(config.BASE_DIR, "alembic.ini")
+
+
+def _upgrade(connection: Connection, revision: str = "head") -> None:
+    alembic_config = AlembicConfig(ALEMBIC_INI)
+    alembic_config.attributes["connection"] = connection
+    # Логирование уже настроено ботом
+    alembic_config.attributes["configure_logger"] = False
+    command.upgrade(alembic_config, revision)
+
+
 async def init_db() -> None:
-    """Инициализация базы данных"""
-    logger.info("Инициализация базы данных...")
+    """Инициализация базы данных: применение миграций Alembic"""
+    logger.info("Применение миграций базы данных...")
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade)
     logger.info("База данных инициализирована")
 
 
@@ -47,3 +62,41 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
             yield session
         finally:
             await session.close()
+
+
+class LazySession:
+    """
+    Ленивая обертка над AsyncSession
+    
+    Сессия создается только при первом обращении к любому ее атрибуту,
+    поэтому шаги FSM, которые не работают с БД, не создают сессию
+    и не занимают соединение из пула.
+    """
+    
+    def __init__(self, factory: Callable[[], AsyncSession] = async_session_maker):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+        self.db_used = False
+    
+    @property
+    def created(self) -> bool:
+        """Была ли создана реальная сессия"""
+        return self._session is not None
+    
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+            # Соединение из пула берется при начале транзакции
+            event.listen(self._session.sync_session, "after_begin", self._on_begin)
+        return self._session
+    
+    def _on_begin(self, session, transaction, connection) -> None:
+        self.db_used = True
+    
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_session(), name)
+    
+    async def close(self) -> None:
+        """Закрытие сессии, если она была создана"""
+        if self._session is not None:
+            await self._session.close()
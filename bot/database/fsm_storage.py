@@ -0,0 +1,234 @@
+"""
+Хранилище состояний FSM в PostgreSQL
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.sql import func
+
+from bot.config import config
+from .database import async_session_maker
+from .models import FSMRecord
+
+logger = logging.getLogger(__name__)
+
+
+def _state_name(state: StateType) -> Optional[str]:
+    return state.state if isinstance(state, State) else state
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM-хранилище на основе таблицы fsm_storage
+
+    Одна строка на ключ: состояние и данные (JSONB) записываются upsert'ом.
+    Записи, не обновлявшиеся дольше ttl, считаются брошенными анкетами
+    и удаляются методом delete_expired().
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+        ttl: Optional[timedelta] = None,
+        key_builder: Optional[KeyBuilder] = None
+    ):
+        self.session_maker = session_maker
+        self.ttl = ttl
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+    def _key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key)
+
+    def _cutoff(self):
+        # Время берется из БД: updated_at пишет now() сервера БД,
+        # а часовой пояс процесса бота может отличаться
+        return func.now() - self.ttl if self.ttl else None
+
+    async def load_record(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Чтение состояния и данных одним запросом"""
+        query = select(FSMRecord.state, FSMRecord.data).where(FSMRecord.key == self._key(key))
+        cutoff = self._cutoff()
+        if cutoff is not None:
+            query = query.where(FSMRecord.updated_at > cutoff)
+
+        async with self.session_maker() as session:
+            row = (await session.execute(query)).first()
+
+        if row is None:
+            return None, {}
+        return row.state, dict(row.data or {})
+
+    async def save_record(self, key: StorageKey, state: Optional[str], data: Mapping[str, Any]) -> None:
+        """Запись состояния и данных одним запросом (пустая запись удаляется)"""
+        db_key = self._key(key)
+
+        async with self.session_maker() as session:
+            if state is None and not data:
+                await session.execute(delete(FSMRecord).where(FSMRecord.key == db_key))
+            else:
+                stmt = insert(FSMRecord).values(key=db_key, state=state, data=dict(data))
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[FSMRecord.key],
+                    set_={"state": stmt.excluded.state, "data": stmt.excluded.data, "updated_at": func.now()}
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    async def _upsert_column(self, key: StorageKey, column: str, value: Any) -> None:
+        values = {"key": self._key(key), "state": None, "data": {}}
+        values[column] = value
+        stmt = insert(FSMRecord).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FSMRecord.key],
+            set_={column: getattr(stmt.excluded, column), "updated_at": func.now()}
+        )
+        async with self.session_maker() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._upsert_column(key, "state", _state_name(state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self.load_record(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        await self._upsert_column(key, "data", data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self.load_record(key)
+        return data
+
+    async def delete_expired(self) -> int:
+        """Удаление брошенных анкет старше ttl"""
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return 0
+
+        async with self.session_maker() as session:
+            result = await session.execute(delete(FSMRecord).where(FSMRecord.updated_at <= cutoff))
+            await session.commit()
+
+        if result.rowcount:
+            logger.info(f"Удалено устаревших FSM-записей: {result.rowcount}")
+        return result.rowcount
+
+    async def run_expiry(self, interval: float) -> None:
+        """Периодическая очистка устаревших записей"""
+        while True:
+            try:
+                await self.delete_expired()
+            except Exception as e:
+                logger.error(f"Ошибка при очистке FSM-хранилища: {e}", exc_info=True)
+            await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        pass
+
+
+@dataclass
+class _PendingRecord:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    dirty: bool = False
+
+
+class CoalescingStorage(BaseStorage):
+    """
+    Слой объединения записей поверх PostgresStorage
+
+    В пределах обработки одного обновления запись читается из БД один раз,
+    все set_state/set_data/update_data применяются в памяти, а в БД
+    уходит одна запись при вызове flush() (см. FSMFlushMiddleware).
+    После flush() запись из памяти удаляется, поэтому несколько
+    экземпляров бота видят согласованные данные.
+
+    Запись в памяти общая для всех обновлений с этим ключом, поэтому
+    хранилище используется только вместе с изоляцией событий
+    (Dispatcher(events_isolation=ChatEventIsolation())): следующее
+    обновление ключа читает запись лишь после flush() предыдущего,
+    который FSMFlushMiddleware выполняет внутри блокировки.
+    """
+
+    def __init__(self, backend: PostgresStorage):
+        self.backend = backend
+        self._records: Dict[StorageKey, _PendingRecord] = {}
+        self.reads = 0
+        self.writes = 0
+        self.coalesced = 0
+
+    async def _record(self, key: StorageKey) -> _PendingRecord:
+        record = self._records.get(key)
+        if record is None:
+            state, data = await self.backend.load_record(key)
+            self.reads += 1
+            record = self._records.setdefault(key, _PendingRecord(state=state, data=data))
+        return record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = _state_name(state)
+        record.dirty = True
+        self.coalesced += 1
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        record = await self._record(key)
+        record.data = data.copy()
+        record.dirty = True
+        self.coalesced += 1
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def flush(self, key: StorageKey) -> None:
+        """Запись накопленных изменений ключа в БД"""
+        record = self._records.pop(key, None)
+        if record is None or not record.dirty:
+            return
+        await self.backend.save_record(key, record.state, record.data)
+        self.writes += 1
+
+    async def flush_all(self) -> None:
+        """Запись всех накопленных изменений"""
+        for key in list(self._records):
+            await self.flush(key)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики чтений, записей и объединенных изменений"""
+        return {"reads": self.reads, "writes": self.writes, "coalesced": self.coalesced}
+
+    async def close(self) -> None:
+        await self.flush_all()
+        await self.backend.close()
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Создание FSM-хранилища согласно config.FSM_STORAGE"""
+    if config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if config.FSM_STORAGE == "postgres":
+        backend = PostgresStorage(ttl=timedelta(hours=config.FSM_STATE_TTL_HOURS))
+        return CoalescingStorage(backend)
+    raise ValueError(f"Неизвестный тип FSM-хранилища: {config.FSM_STORAGE}")
@@ -2,18 +2,23 @@
 """
 Модели базы данных
 """
-from datetime import datetime
+from datetime import date, datetime
 from typing import List
 from enum import Enum as PyEnum
 
 from sqlalchemy import (
-    BigInteger, String, DateTime, Boolean, Text, JSON, Integer,
-    ForeignKey, Enum
+    BigInteger, String, Date, DateTime, Boolean, Text, JSON, Integer,
+    ForeignKey, Enum, Index, UniqueConstraint, text
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
 
+# Условие частичного индекса периодов поездки (см. participants.travel_period_known)
+TRAVEL_PERIOD_PREDICATE = "date_from IS NOT NULL AND date_to IS NOT NULL AND date_from <= date_to"
+
+
 class Base(DeclarativeBase):
     """Базовый класс для моделей"""
     pass
@@ -36,9 +41,25 @@ class ApplicationStatus(PyEnum):
     REJECTED = "rejected"  # Отклонена
 
 
+class DeliveryStatus(PyEnum):
+    """Статусы задания на отправку заявки"""
+    PENDING = "pending"  # Ожидает отправки
+    PROCESSING = "processing"  # Выполняется
+    DONE = "done"  # Отправлено
+    FAILED = "failed"  # Исчерпаны попытки
+
+
 class User(Base):
     """Модель пользователя"""
     __tablename__ = "users"
+    __table_args__ = (
+        # Списки по статусу: WHERE status ORDER BY id DESC (keyset-пагинация /users)
+        Index("ix_users_status_id", "status", "id"),
+        # Поиск по началу username: lower(username) LIKE 'ivan%'
+        Index(
+            "ix_users_username_lower", text("lower(username) varchar_pattern_ops")
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, unique=True, index=True)
@@ -70,6 +91,19 @@ class User(Base):
 class Application(Base):
     """Модель заявки"""
     __tablename__ = "applications"
+    __table_args__ = (
+        # История заявок: WHERE user_id ORDER BY created_at DESC, id DESC
+        Index("ix_applications_user_created", "user_id", "created_at", "id"),
+        # Черновики и заявки по статусу: WHERE user_id AND status ORDER BY updated_at DESC, id DESC
+        Index("ix_applications_user_status_updated", "user_id", "status", "updated_at", "id"),
+        # Поиск по участникам в режиме jsonb: participants_data @> '{"participants": [...]}'
+        Index(
+            "ix_applications_participants_data", "participants_data",
+            postgresql_using="gin", postgresql_ops={"participants_data": "jsonb_path_ops"}
+        ),
+        # Повторное подтверждение той же заявки не создает вторую запись
+        UniqueConstraint("idempotency_key", name="uq_applications_idempotency_key"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.telegram_id"))
@@ -80,8 +114,13 @@ class Application(Base):
     country: Mapped[str] = mapped_column(String(255))  # Страна
     city: Mapped[str] = mapped_column(String(255))  # Город
     
-    # Данные об участниках (JSON)
-    participants_data: Mapped[dict] = mapped_column(JSON)
+    # Участники в режиме PARTICIPANTS_STORAGE=jsonb (в режиме rows - NULL)
+    participants_data: Mapped[dict] = mapped_column(
+        JSON().with_variant(JSONB(), "postgresql"), nullable=True
+    )
+    
+    # Ключ подтверждения: пользователь + сообщение подтверждения + хэш данных FSM
+    idempotency_key: Mapped[str] = mapped_column(String(64), nullable=True)
     
     # Статус
     status: Mapped[ApplicationStatus] = mapped_column(
@@ -109,16 +148,53 @@ class Application(Base):
     )
 
 
+class DeliveryJob(Base):
+    """Задание на генерацию и отправку заявки (outbox)"""
+    __tablename__ = "delivery_jobs"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    application_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.id", ondelete="CASCADE"))
+    chat_id: Mapped[int] = mapped_column(BigInteger)  # Кому сообщить о результате
+    
+    status: Mapped[DeliveryStatus] = mapped_column(
+        Enum(DeliveryStatus),
+        default=DeliveryStatus.PENDING,
+        nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Время следующей попытки; для PROCESSING - срок аренды задания воркером
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), index=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    
+    # Timestamps
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now()
+    )
+    
+    # Relationship
+    application: Mapped["Application"] = relationship("Application")
+
+
 class Participant(Base):
     """Модель участника поездки"""
     __tablename__ = "participants"
+    __table_args__ = (
+        # Кто в поездке в период: daterange(date_from, date_to, '[]') && daterange(:from, :to, '[]')
+        # Частичный: без дат daterange() - неограниченный период, а при date_from > date_to падает
+        Index(
+            "ix_participants_travel_period", text("daterange(date_from, date_to, '[]')"),
+            postgresql_using="gist",
+            postgresql_where=text(TRAVEL_PERIOD_PREDICATE)
+        ).ddl_if(dialect="postgresql"),
+    )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    application_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.id"))
+    application_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.id"), index=True)
     
     full_name: Mapped[str] = mapped_column(String(500))  # ФИО
-    date_from: Mapped[str] = mapped_column(String(20))  # Дата начала (ДД.ММ.ГГГГ)
-    date_to: Mapped[str] = mapped_column(String(20))  # Дата окончания (ДД.ММ.ГГГГ)
+    date_from: Mapped[date] = mapped_column(Date, nullable=True)  # Дата начала
+    date_to: Mapped[date] = mapped_column(Date, nullable=True)  # Дата окончания
     order_num: Mapped[int] = mapped_column(Integer)  # Порядковый номер
     
     # Relationship
@@ -148,3 +224,15 @@ class Draft(Base):
     
     # Relationship
     user: Mapped["User"] = relationship("User", back_populates="drafts")
+
+
+class FSMRecord(Base):
+    """Состояние FSM пользователя (незавершенная заявка)"""
+    __tablename__ = "fsm_storage"
+    
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)  # Ключ StorageKey
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, server_default=func.now(), onupdate=func.now(), index=True
+    )
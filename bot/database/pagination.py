@@ -0,0 +1,134 @@
+"""
+Keyset-пагинация списков
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+# Направления листания: next - к более старым записям, prev - к более новым
+NEXT = "n"
+PREV = "p"
+
+_DATETIME_FORMAT = "%Y%m%d%H%M%S%f"
+
+
+@dataclass
+class Page:
+    """Страница списка и курсоры соседних страниц"""
+    rows: List[Any]
+    prev_cursor: Optional[str] = None
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Компактный курсор для callback_data (лимит Telegram - 64 байта)"""
+    parts = []
+    for value in values:
+        if isinstance(value, datetime):
+            parts.append(value.strftime(_DATETIME_FORMAT))
+        else:
+            parts.append(str(value))
+    return "_".join(parts)
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> Tuple[Any, ...]:
+    """Разбор курсора по типам колонок сортировки"""
+    parts = cursor.split("_")
+    if len(parts) != len(columns):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+
+    values = []
+    for part, column in zip(parts, columns):
+        python_type = column.type.python_type
+        if python_type is datetime:
+            values.append(datetime.strptime(part, _DATETIME_FORMAT))
+        else:
+            values.append(python_type(part))
+    return tuple(values)
+
+
+def keyset_query(
+    query: Select,
+    columns: Sequence[ColumnElement],
+    cursor: Optional[str] = None,
+    direction: str = NEXT,
+    limit: int = 10
+) -> Select:
+    """
+    Запрос страницы: сортировка по убыванию columns, LIMIT limit + 1
+
+    Лишняя строка показывает, есть ли следующая страница. Для PREV
+    строки выбираются по возрастанию и переворачиваются в build_page().
+    """
+    key = tuple_(*columns)
+    if cursor is not None:
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.where(key > values if direction == PREV else key < values)
+
+    if direction == PREV:
+        query = query.order_by(*(column.asc() for column in columns))
+    else:
+        query = query.order_by(*(column.desc() for column in columns))
+    return query.limit(limit + 1)
+
+
+def build_page(
+    rows: Sequence[Any],
+    columns: Sequence[ColumnElement],
+    cursor: Optional[str] = None,
+    direction: str = NEXT,
+    limit: int = 10
+) -> Page:
+    """Страница из результата keyset_query()"""
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == PREV:
+        rows.reverse()
+
+    if not rows:
+        return Page(rows=[])
+
+    def key_of(row) -> str:
+        return encode_cursor([row._mapping[column] for column in columns])
+
+    if direction == PREV:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = cursor is not None, has_more
+
+    return Page(
+        rows=rows,
+        prev_cursor=key_of(rows[0]) if has_prev else None,
+        next_cursor=key_of(rows[-1]) if has_next else None
+    )
+
+
+async def keyset_page(
+    session: AsyncSession,
+    query: Select,
+    columns: Sequence[ColumnElement],
+    cursor: Optional[str] = None,
+    direction: str = NEXT,
+    limit: int = 10
+) -> Page:
+    """
+    Выборка одной страницы без OFFSET
+
+    Args:
+        session: Сессия БД
+        query: Запрос, выбирающий в том числе колонки columns
+        columns: Колонки сортировки (последняя должна быть уникальной, например id)
+        cursor: Курсор из Page.prev_cursor / Page.next_cursor
+        direction: NEXT или PREV
+        limit: Размер страницы
+
+    Returns:
+        Page: Строки страницы и курсоры соседних страниц
+    """
+    result = await session.execute(keyset_query(query, columns, cursor, direction, limit))
+    return build_page(result.all(), columns, cursor, direction, limit)
@@ -0,0 +1,312 @@
+"""
+Хранение участников заявки
+
+Режим задается config.PARTICIPANTS_STORAGE:
+- rows: строки таблицы participants, applications.participants_data пуст (NULL);
+- jsonb: список в applications.participants_data (JSONB с GIN-индексом),
+  таблица participants не используется.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Select, and_, case, delete, func, insert, literal_column, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import config
+from .database import engine
+from .models import Application, ApplicationStatus, Participant
+
+logger = logging.getLogger(__name__)
+
+STORAGE_MODES = ("rows", "jsonb")
+
+# Строк в одном INSERT: 5 параметров на строку, лимит asyncpg - 32767 параметров
+INSERT_BATCH_SIZE = 1000
+
+# Формат дат в данных FSM, Excel и JSON
+DATE_FORMAT = "%d.%m.%Y"
+# Строка даты в JSON, которую можно передать в to_date (пустые и старые значения - нет)
+JSON_DATE_PATTERN = "^[0-9]{2}[.][0-9]{2}[.][0-9]{4}$"
+
+
+def parse_date(value: Optional[str]) -> Optional[date]:
+    """Дата из строки ДД.ММ.ГГГГ (None, если строка некорректна)"""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def format_date(value: Optional[date]) -> str:
+    """Строка ДД.ММ.ГГГГ из даты"""
+    return value.strftime(DATE_FORMAT) if value else ""
+
+
+def participant_rows(application_id: int, participants: Sequence[Dict]) -> List[Dict]:
+    """Строки таблицы participants из данных FSM (порядок задает order_num)"""
+    return [
+        {
+            "application_id": application_id,
+            "full_name": p["full_name"],
+            "date_from": parse_date(p["date_from"]),
+            "date_to": parse_date(p["date_to"]),
+            "order_num": idx
+        }
+        for idx, p in enumerate(participants, 1)
+    ]
+
+
+async def sync_participants(
+    session: AsyncSession,
+    application_id: int,
+    participants: Sequence[Dict],
+    replace: bool = True
+) -> None:
+    """
+    Замена участников заявки
+
+    Один DELETE по application_id и один многострочный INSERT
+    (для очень больших списков - по INSERT_BATCH_SIZE строк), поэтому
+    число запросов не зависит от размера делегации. Изменения идут в
+    транзакции сессии и фиксируются commit вызывающего кода.
+
+    Args:
+        session: Сессия БД
+        application_id: ID заявки
+        participants: Участники из данных FSM
+        replace: Удалить существующих участников (False для новой заявки)
+    """
+    if replace:
+        await session.execute(
+            delete(Participant)
+            .where(Participant.application_id == application_id)
+            .execution_options(synchronize_session=False)
+        )
+
+    rows = participant_rows(application_id, participants)
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        await session.execute(insert(Participant.__table__).values(rows[start:start + INSERT_BATCH_SIZE]))
+
+
+def participants_json(participants: Sequence[Dict]) -> Optional[Dict]:
+    """Значение applications.participants_data для записи"""
+    if config.PARTICIPANTS_STORAGE == "jsonb":
+        return {"participants": list(participants)}
+    return None
+
+
+async def save_participants(
+    session: AsyncSession,
+    application_id: int,
+    participants: Sequence[Dict],
+    replace: bool = True
+) -> None:
+    """
+    Запись строк участников в режиме rows
+
+    В режиме jsonb участники уже записаны в participants_data
+    (см. participants_json), и таблица participants не трогается.
+    """
+    if config.PARTICIPANTS_STORAGE == "rows":
+        await sync_participants(session, application_id, participants, replace)
+
+
+async def load_participants(session: AsyncSession, application: Application) -> List[Dict]:
+    """Участники заявки в формате данных FSM (в порядке ввода)"""
+    if config.PARTICIPANTS_STORAGE == "jsonb":
+        return list((application.participants_data or {}).get("participants", []))
+
+    result = await session.execute(
+        select(Participant.full_name, Participant.date_from, Participant.date_to)
+        .where(Participant.application_id == application.id)
+        .order_by(Participant.order_num)
+    )
+    return [
+        {"full_name": row.full_name, "date_from": format_date(row.date_from), "date_to": format_date(row.date_to)}
+        for row in result
+    ]
+
+
+def with_participants_count(query: Select) -> Select:
+    """
+    Добавление колонки participants_count к запросу по Application
+
+    rows: LEFT JOIN participants + GROUP BY applications.id;
+    jsonb: длина массива participants_data->'participants'.
+    """
+    if config.PARTICIPANTS_STORAGE == "jsonb":
+        count = func.coalesce(func.jsonb_array_length(Application.participants_data["participants"]), 0)
+        return query.add_columns(count.label("participants_count"))
+
+    return (
+        query.add_columns(func.count(Participant.id).label("participants_count"))
+        .outerjoin(Participant, Participant.application_id == Application.id)
+        .group_by(Application.id)
+    )
+
+
+def travel_period(date_from, date_to):
+    """Период поездки как daterange с включенными границами"""
+    return func.daterange(date_from, date_to, literal_column("'[]'"))
+
+
+def travel_period_known(date_from, date_to):
+    """
+    Обе даты заданы и не перепутаны (условие частичного индекса)
+
+    daterange(NULL, NULL) - неограниченный период, а при date_from > date_to
+    daterange() падает, поэтому условие стоит в запросе перед пересечением.
+    """
+    return and_(date_from.is_not(None), date_to.is_not(None), date_from <= date_to)
+
+
+def _json_date(value):
+    """Дата из строки JSON; пустая или некорректная строка - NULL"""
+    return case((value.op("~")(JSON_DATE_PATTERN), func.to_date(value, "DD.MM.YYYY")), else_=None)
+
+
+async def find_travelling(
+    session: AsyncSession,
+    period_from: date,
+    period_to: date,
+    limit: int = 50
+) -> List[Row]:
+    """
+    Участники поданных заявок, чьи даты поездки пересекаются с периодом
+
+    В режиме rows условие daterange(...) && daterange(...) использует
+    частичный GiST-индекс ix_participants_travel_period. В режиме jsonb
+    даты разбираются из JSON, и запрос просматривает все заявки.
+    Участники без дат или с перепутанными датами не попадают в результат.
+
+    Returns:
+        List[Row]: full_name, date_from, date_to, application_id, city, country
+    """
+    period = travel_period(period_from, period_to)
+
+    if config.PARTICIPANTS_STORAGE == "jsonb":
+        item = (
+            func.jsonb_array_elements(Application.participants_data["participants"])
+            .table_valued(literal_column("value", JSONB))
+            .lateral("item")
+        )
+        date_from = _json_date(item.c.value["date_from"].astext)
+        date_to = _json_date(item.c.value["date_to"].astext)
+        query = (
+            select(
+                item.c.value["full_name"].astext.label("full_name"),
+                date_from.label("date_from"),
+                date_to.label("date_to"),
+                Application.id.label("application_id"),
+                Application.city,
+                Application.country
+            )
+            .select_from(Application)
+            .join(item, literal_column("true"))
+            .where(travel_period_known(date_from, date_to))
+            .where(travel_period(date_from, date_to).op("&&")(period))
+        )
+    else:
+        date_from, date_to = Participant.date_from, Participant.date_to
+        query = (
+            select(
+                Participant.full_name,
+                Participant.date_from,
+                Participant.date_to,
+                Application.id.label("application_id"),
+                Application.city,
+                Application.country
+            )
+            .join(Application, Application.id == Participant.application_id)
+            .where(travel_period_known(Participant.date_from, Participant.date_to))
+            .where(travel_period(Participant.date_from, Participant.date_to).op("&&")(period))
+        )
+
+    query = (
+        query.where(Application.status != ApplicationStatus.DRAFT)
+        .order_by(date_from, Application.id)
+        .limit(limit)
+    )
+    return list((await session.execute(query)).all())
+
+
+# Перенос данных между режимами. JSON считается источником, если он заполнен
+# (до введения режимов участники писались и в JSON, и в таблицу).
+TO_ROWS_SQL = (
+    """
+    DELETE FROM participants
+    WHERE application_id IN (SELECT id FROM applications WHERE participants_data IS NOT NULL)
+    """,
+    f"""
+    INSERT INTO participants (application_id, full_name, date_from, date_to, order_num)
+    SELECT a.id, e.item->>'full_name',
+           CASE WHEN e.item->>'date_from' ~ '{JSON_DATE_PATTERN}'
+                THEN to_date(e.item->>'date_from', 'DD.MM.YYYY') END,
+           CASE WHEN e.item->>'date_to' ~ '{JSON_DATE_PATTERN}'
+                THEN to_date(e.item->>'date_to', 'DD.MM.YYYY') END,
+           e.idx
+    FROM applications a
+    CROSS JOIN LATERAL jsonb_array_elements(
+        COALESCE(a.participants_data->'participants', '[]'::jsonb)
+    ) WITH ORDINALITY AS e(item, idx)
+    WHERE a.participants_data IS NOT NULL
+    """,
+    "UPDATE applications SET participants_data = NULL WHERE participants_data IS NOT NULL"
+)
+
+TO_JSONB_SQL = (
+    """
+    UPDATE applications a
+    SET participants_data = jsonb_build_object('participants', p.items)
+    FROM (
+        SELECT application_id,
+               jsonb_agg(
+                   jsonb_build_object(
+                       'full_name', full_name,
+                       'date_from', COALESCE(to_char(date_from, 'DD.MM.YYYY'), ''),
+                       'date_to', COALESCE(to_char(date_to, 'DD.MM.YYYY'), '')
+                   )
+                   ORDER BY order_num
+               ) AS items
+        FROM participants
+        GROUP BY application_id
+    ) p
+    WHERE p.application_id = a.id
+    """,
+    """UPDATE applications SET participants_data = '{"participants": []}'::jsonb WHERE participants_data IS NULL""",
+    "DELETE FROM participants"
+)
+
+
+def convert_storage(connection: Connection, target: str) -> None:
+    """Перенос участников всех заявок в режим target (в транзакции соединения)"""
+    if target not in STORAGE_MODES:
+        raise ValueError(f"Неизвестный режим хранения участников: {target}")
+    for statement in (TO_ROWS_SQL if target == "rows" else TO_JSONB_SQL):
+        connection.execute(text(statement))
+
+
+async def _convert(target: str) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(convert_storage, target)
+    await engine.dispose()
+    logger.info(f"Участники перенесены в режим {target}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Перенос участников между режимами хранения")
+    parser.add_argument("--to", choices=STORAGE_MODES, required=True, help="целевой режим")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_convert(args.to))
+    print(f"Готово. Установите PARTICIPANTS_STORAGE={args.to} и перезапустите бота.")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,54 @@
 Обработчики команд администратора
 """
 import logging
+import os
+import tempfile
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
-from sqlalchemy import select
+from aiogram.types import Message, CallbackQuery, FSInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from sqlalchemy import Select, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.config import config
-from bot.database.models import User, UserStatus, Application
-from bot.keyboards.common import get_user_approval_keyboard, get_main_menu
+from bot.database.models import User, UserStatus, Application, ApplicationStatus
+from bot.database.pagination import NEXT, keyset_page
+from bot.database.participants import find_travelling, format_date, parse_date
+from bot.keyboards.common import get_user_approval_keyboard, get_main_menu, get_pagination_keyboard
+from bot.utils import user_cache, publish_user_change, stats_cache, notifier
+from bot.utils.export import parse_export_args, write_export
+from bot.utils.stats import ApplicationStats
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Строк в ответе /travelling (лимит сообщения Telegram - 4096 символов)
+TRAVELLING_LIMIT = 40
+
+APPLICATION_STATUS_NAMES = {
+    ApplicationStatus.DRAFT: "📝 Черновики",
+    ApplicationStatus.SUBMITTED: "✅ Отправлены",
+    ApplicationStatus.PROCESSING: "⏳ В обработке",
+    ApplicationStatus.APPROVED: "👍 Одобрены",
+    ApplicationStatus.REJECTED: "❌ Отклонены"
+}
+
+USER_STATUS_NAMES = {
+    UserStatus.PENDING: "⏳ Ожидают",
+    UserStatus.APPROVED: "✅ Одобрены",
+    UserStatus.REJECTED: "❌ Отклонены",
+    UserStatus.REVOKED: "⛔ Отозваны"
+}
+
+MONTH_NAMES = (
+    "январь", "февраль", "март", "апрель", "май", "июнь",
+    "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь"
+)
+
 
 def is_admin(user_id: int) -> bool:
     """Проверка, является ли пользователь администратором"""
@@ -55,64 +89,161 @@ async def cmd_pending(message: Message, session: AsyncSession):
         )
 
 
+USERS_FILTER_ALL = "all"
+
+USERS_COMMANDS_HINT = (
+    "\n<b>Команды:</b>\n"
+    "/users <code>username|user_id</code> - поиск\n"
+    "/approve <code>user_id</code> - одобрить\n"
+    "/reject <code>user_id</code> - отклонить\n"
+    "/revoke <code>user_id</code> - отозвать доступ"
+)
+
+
+def _user_line(user, with_status: bool = False) -> str:
+    """Строка пользователя в списке /users"""
+    admin_badge = " 👨‍💼" if user.is_admin else ""
+    status = f"{USER_STATUS_NAMES[user.status].split()[0]} " if with_status else ""
+    line = f"{status}<code>{user.telegram_id}</code> | @{escape(user.username or 'N/A')}{admin_badge}"
+    if user.full_name:
+        line += f" | {escape(user.full_name)}"
+    return line + "\n"
+
+
+async def _user_counts(session: AsyncSession) -> Dict[UserStatus, int]:
+    """Число пользователей по статусам одним GROUP BY"""
+    result = await session.execute(select(User.status, func.count(User.id)).group_by(User.status))
+    return dict(result.all())
+
+
+def _users_filter_rows(counts: Dict[UserStatus, int], current: str) -> List[List[InlineKeyboardButton]]:
+    """Кнопки фильтра по статусу с количеством пользователей"""
+    def button(value: str, title: str, count: int) -> InlineKeyboardButton:
+        mark = "• " if value == current else ""
+        return InlineKeyboardButton(text=f"{mark}{title} ({count})", callback_data=f"users:{value}")
+
+    buttons = [button(USERS_FILTER_ALL, "👥 Все", sum(counts.values()))]
+    buttons += [
+        button(status.value, name, counts.get(status, 0))
+        for status, name in USER_STATUS_NAMES.items()
+    ]
+    return [buttons[idx:idx + 2] for idx in range(0, len(buttons), 2)]
+
+
+async def _users_page(
+    session: AsyncSession,
+    status_filter: str = USERS_FILTER_ALL,
+    cursor: Optional[str] = None,
+    direction: str = NEXT
+) -> Tuple[str, InlineKeyboardMarkup]:
+    """
+    Текст и кнопки одной страницы /users
+
+    Счетчики по статусам - один GROUP BY, список - keyset-страница
+    по id (индексы users_pkey и ix_users_status_id).
+    """
+    counts = await _user_counts(session)
+
+    query = select(User.id, User.telegram_id, User.username, User.full_name, User.status, User.is_admin)
+    if status_filter != USERS_FILTER_ALL:
+        query = query.where(User.status == UserStatus(status_filter))
+
+    page = await keyset_page(session, query, (User.id,), cursor, direction, config.USERS_PAGE_SIZE)
+
+    if status_filter == USERS_FILTER_ALL:
+        title = "Все пользователи"
+    else:
+        title = USER_STATUS_NAMES[UserStatus(status_filter)]
+    response = f"👥 <b>{title}</b>\n\n"
+
+    if page.rows:
+        for user in page.rows:
+            response += _user_line(user, with_status=status_filter == USERS_FILTER_ALL)
+    else:
+        response += "📋 Список пуст\n"
+    response += USERS_COMMANDS_HINT
+
+    keyboard = _users_filter_rows(counts, status_filter)
+    pagination = get_pagination_keyboard(f"users:{status_filter}", page.prev_cursor, page.next_cursor)
+    if pagination:
+        keyboard.extend(pagination.inline_keyboard)
+
+    return response, InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def _user_search_query(text: str) -> Select:
+    """
+    Поиск по Telegram ID (точное совпадение) или началу username
+
+    lower(username) LIKE 'префикс%' использует индекс ix_users_username_lower.
+    """
+    term = text.strip().lstrip("@")
+    if term.isdigit():
+        return select(User).where(User.telegram_id == int(term))
+
+    pattern = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return select(User).where(func.lower(User.username).like(pattern, escape="\\"))
+
+
 @router.message(Command("users"))
 @router.message(F.text == "👥 Пользователи")
 async def cmd_users(message: Message, session: AsyncSession):
-    """Список всех пользователей"""
+    """Список пользователей по страницам или поиск"""
     if not is_admin(message.from_user.id):
         await message.answer("❌ У вас нет прав администратора")
         return
     
-    # Получаем всех пользователей
-    result = await session.execute(select(User))
-    users = result.scalars().all()
-    
-    if not users:
-        await message.answer("📋 Список пользователей пуст")
-        return
-    
-    # Группируем по статусам
-    status_emoji = {
-        UserStatus.PENDING: "⏳",
-        UserStatus.APPROVED: "✅",
-        UserStatus.REJECTED: "❌",
-        UserStatus.REVOKED: "⛔"
-    }
-    
-    status_name = {
-        UserStatus.PENDING: "Ожидают",
-        UserStatus.APPROVED: "Одобрены",
-        UserStatus.REJECTED: "Отклонены",
-        UserStatus.REVOKED: "Отозваны"
-    }
-    
-    users_by_status = {}
-    for user in users:
-        if user.status not in users_by_status:
-            users_by_status[user.status] = []
-        users_by_status[user.status].append(user)
-    
-    response = "👥 <b>Список пользователей</b>\n\n"
-    
-    for status in [UserStatus.APPROVED, UserStatus.PENDING, UserStatus.REJECTED, UserStatus.REVOKED]:
-        if status in users_by_status:
-            response += f"{status_emoji[status]} <b>{status_name[status]}:</b>\n"
-            for user in users_by_status[status]:
-                admin_badge = " 👨‍💼" if user.is_admin else ""
-                response += (
-                    f"  • ID: <code>{user.telegram_id}</code> | "
-                    f"@{user.username or 'N/A'}{admin_badge}\n"
-                )
-            response += "\n"
-    
-    response += (
-        "\n<b>Команды:</b>\n"
-        "/approve <code>user_id</code> - одобрить\n"
-        "/reject <code>user_id</code> - отклонить\n"
-        "/revoke <code>user_id</code> - отозвать доступ"
-    )
+    args = message.text.split(maxsplit=1)
+    if args[0].startswith("/users") and len(args) > 1:
+        # Поиск: одна страница результатов
+        result = await session.execute(
+            _user_search_query(args[1]).order_by(User.id.desc()).limit(config.USERS_PAGE_SIZE + 1)
+        )
+        users = result.scalars().all()
+        
+        if not users:
+            await message.answer("🔍 Пользователи не найдены")
+            return
+        
+        response = f"🔍 <b>Найдено по запросу «{escape(args[1])}»:</b>\n\n"
+        for user in users[:config.USERS_PAGE_SIZE]:
+            response += _user_line(user, with_status=True)
+        if len(users) > config.USERS_PAGE_SIZE:
+            response += f"\n<i>Показаны первые {config.USERS_PAGE_SIZE}, уточните запрос</i>\n"
+        response += USERS_COMMANDS_HINT
+        
+        await message.answer(response, parse_mode="HTML")
+        return
     
-    await message.answer(response, parse_mode="HTML")
+    response, keyboard = await _users_page(session)
+    await message.answer(response, parse_mode="HTML", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("users:"))
+async def show_users_page(callback: CallbackQuery, session: AsyncSession):
+    """Фильтр по статусу и листание списка пользователей"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ У вас нет прав администратора", show_alert=True)
+        return
+    
+    # users:<фильтр> или users:<фильтр>:<направление>:<курсор>
+    parts = callback.data.split(":")
+    status_filter = parts[1]
+    direction, cursor = (parts[2], parts[3]) if len(parts) == 4 else (NEXT, None)
+    
+    try:
+        response, keyboard = await _users_page(session, status_filter, cursor, direction)
+    except ValueError:
+        await callback.answer("❌ Некорректная страница", show_alert=True)
+        return
+    
+    try:
+        await callback.message.edit_text(response, parse_mode="HTML", reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Повторное нажатие выбранного фильтра: страница не изменилась
+        if "message is not modified" not in str(e):
+            raise
+    await callback.answer()
 
 
 @router.message(F.text == "⏳ На одобрении")
@@ -200,7 +331,9 @@ async def cmd_revoke(message: Message, session: AsyncSession):
     
     # Отзываем доступ
     user.status = UserStatus.REVOKED
+    await publish_user_change(session, target_user_id)
     await session.commit()
+    user_cache.invalidate(target_user_id)
     
     # Уведомляем пользователя
     try:
@@ -215,6 +348,187 @@ async def cmd_revoke(message: Message, session: AsyncSession):
     await message.answer(f"⛔ Доступ пользователя {target_user_id} отозван")
 
 
+@router.message(Command("travelling"))
+async def cmd_travelling(message: Message, session: AsyncSession):
+    """Участники поданных заявок, находящиеся в поездке в заданный период"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав администратора")
+        return
+    
+    # Парсим период
+    args = message.text.split()
+    if len(args) < 2:
+        await message.answer("❌ Использование: /travelling <ДД.ММ.ГГГГ> [ДД.ММ.ГГГГ]")
+        return
+    
+    period_from = parse_date(args[1])
+    period_to = parse_date(args[2]) if len(args) > 2 else period_from
+    if period_from is None or period_to is None:
+        await message.answer("❌ Неверный формат даты. Используйте ДД.ММ.ГГГГ")
+        return
+    if period_from > period_to:
+        await message.answer("❌ Дата начала периода позже даты окончания")
+        return
+    
+    rows = await find_travelling(session, period_from, period_to, limit=TRAVELLING_LIMIT + 1)
+    period = f"{format_date(period_from)} - {format_date(period_to)}"
+    
+    if not rows:
+        await message.answer(f"✅ В период {period} никто не в поездке")
+        return
+    
+    response = f"🧳 <b>В поездке {period}:</b>\n\n"
+    for row in rows[:TRAVELLING_LIMIT]:
+        response += (
+            f"• {escape(row.full_name)} | {format_date(row.date_from)} - {format_date(row.date_to)} | "
+            f"{escape(row.city)}, {escape(row.country)} (заявка #{row.application_id})\n"
+        )
+    if len(rows) > TRAVELLING_LIMIT:
+        response += f"\n<i>Показаны первые {TRAVELLING_LIMIT}, сузьте период</i>"
+    
+    await message.answer(response, parse_mode="HTML")
+
+
+def _stats_text(stats: ApplicationStats) -> str:
+    """Текст ответа /stats"""
+    response = f"📊 <b>Заявки</b> (подано: {stats.submitted_total})\n"
+    for status, name in APPLICATION_STATUS_NAMES.items():
+        response += f"  {name}: {stats.by_status.get(status, 0)}\n"
+    
+    response += "\n👥 <b>Пользователи</b>\n"
+    for status, name in USER_STATUS_NAMES.items():
+        response += f"  {name}: {stats.users_by_status.get(status, 0)}\n"
+    
+    if stats.by_month:
+        response += "\n📅 <b>Подано по месяцам</b>\n"
+        for year, month, count in stats.by_month:
+            response += f"  {MONTH_NAMES[month - 1]} {year}: {count}\n"
+    
+    return response
+
+
+def _apps_text(stats: ApplicationStats) -> str:
+    """Текст ответа /apps"""
+    if not stats.submitted_total:
+        return "📋 Поданных заявок пока нет"
+    
+    response = f"📋 <b>Поданные заявки:</b> {stats.submitted_total}\n"
+    
+    response += "\n🏅 <b>Виды спорта</b>\n"
+    for sport_type, count in stats.by_sport:
+        response += f"  • {escape(sport_type)}: {count}\n"
+    
+    response += "\n🌍 <b>Страны</b>\n"
+    for country, count in stats.by_country:
+        response += f"  • {escape(country)}: {count}\n"
+    
+    response += "\n📍 <b>Популярные направления</b>\n"
+    for idx, (country, city, count) in enumerate(stats.top_destinations, 1):
+        response += f"  {idx}. {escape(city)}, {escape(country)}: {count}\n"
+    
+    return response
+
+
+@router.message(Command("stats"))
+@router.message(F.text == "📊 Статистика")
+async def cmd_stats(message: Message, session: AsyncSession):
+    """Сводка по заявкам и пользователям"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав администратора")
+        return
+    
+    stats = await stats_cache.get(session)
+    await message.answer(_stats_text(stats), parse_mode="HTML")
+
+
+@router.message(Command("apps"))
+async def cmd_apps(message: Message, session: AsyncSession):
+    """Поданные заявки по видам спорта, странам и направлениям"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав администратора")
+        return
+    
+    stats = await stats_cache.get(session)
+    await message.answer(_apps_text(stats), parse_mode="HTML")
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, session: AsyncSession):
+    """Выгрузка заявок и участников одним файлом"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав администратора")
+        return
+    
+    try:
+        export_filter = parse_export_args(message.text.split()[1:])
+    except ValueError as e:
+        await message.answer(
+            f"❌ {e}\n"
+            "Использование: /export [ДД.ММ.ГГГГ [ДД.ММ.ГГГГ]] [статус ...] [xlsx|csv]\n"
+            f"Статусы: {', '.join(status.value for status in ApplicationStatus)}"
+        )
+        return
+    
+    # Файл пишется на диск по мере чтения курсора и удаляется после отправки
+    fd, path = tempfile.mkstemp(suffix=f".{export_filter.fmt}")
+    try:
+        with os.fdopen(fd, "wb") as output:
+            count = await write_export(session, export_filter, output)
+        
+        if not count:
+            await message.answer("📋 Нет заявок, подходящих под условия")
+            return
+        
+        await message.answer_document(
+            FSInputFile(path, filename=export_filter.filename),
+            caption=f"📦 Выгрузка: {count} строк"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки заявок: {e}", exc_info=True)
+        await message.answer("❌ Не удалось сформировать выгрузку")
+    finally:
+        os.unlink(path)
+
+
+async def _run_broadcast(bot, admin_id: int, chat_ids: List[int], text: str) -> None:
+    """Рассылка в фоне и отчет администратору"""
+    result = await notifier.broadcast(bot, chat_ids, text, parse_mode=None)
+    logger.info(f"Рассылка от {admin_id}: {result}")
+    await notifier.send(
+        bot,
+        admin_id,
+        f"📣 Рассылка завершена\n"
+        f"Доставлено: {result.sent}\n"
+        f"Заблокировали бота: {result.blocked}\n"
+        f"Ошибки: {result.failed}"
+    )
+
+
+@router.message(Command("broadcast"))
+async def cmd_broadcast(message: Message, session: AsyncSession):
+    """Рассылка сообщения всем одобренным пользователям"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав администратора")
+        return
+    
+    args = message.text.split(maxsplit=1)
+    if len(args) < 2 or not args[1].strip():
+        await message.answer("❌ Использование: /broadcast <текст сообщения>")
+        return
+    
+    result = await session.execute(
+        select(User.telegram_id).where(User.status == UserStatus.APPROVED)
+    )
+    chat_ids = list(result.scalars())
+    if not chat_ids:
+        await message.answer("📋 Нет одобренных пользователей")
+        return
+    
+    # Рассылка идет в фоне в пределах лимитов Telegram, отчет придет отдельным сообщением
+    notifier.spawn(_run_broadcast(message.bot, message.from_user.id, chat_ids, args[1]))
+    await message.answer(f"📣 Рассылка запущена: {len(chat_ids)} получателей")
+
+
 @router.callback_query(F.data.startswith("user_approve_"))
 async def callback_approve_user(callback: CallbackQuery, session: AsyncSession):
     """Callback для одобрения пользователя"""
@@ -260,7 +574,9 @@ async def approve_user(user_id: int, session: AsyncSession, bot):
         return
     
     user.status = UserStatus.APPROVED
+    await publish_user_change(session, user_id)
     await session.commit()
+    user_cache.invalidate(user_id)
     
     # Уведомляем пользователя
     try:
@@ -285,7 +601,9 @@ async def reject_user(user_id: int, session: AsyncSession, bot):
         return
     
     user.status = UserStatus.REJECTED
+    await publish_user_change(session, user_id)
     await session.commit()
+    user_cache.invalidate(user_id)
     
     # Уведомляем пользователя
     try:
@@ -1,34 +1,47 @@
 """
 Обработчики для подачи заявок
 """
+import io
 import logging
 import os
 import asyncio
 from datetime import datetime
+from html import escape
+from typing import Dict, List, Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.config import config
-from bot.database.models import User, UserStatus, Application, ApplicationStatus, Participant
+from bot.database.models import Application, ApplicationStatus
+from bot.database.pagination import NEXT, keyset_page
+from bot.database.participants import participants_json, save_participants, with_participants_count
 from bot.keyboards import (
     get_cancel_keyboard,
     get_participants_menu,
     get_confirmation_keyboard,
     get_main_menu,
-    get_admin_menu
+    get_admin_menu,
+    get_pagination_keyboard
 )
 from bot.states import ApplicationStates
+from bot.utils.idempotency import submission_key, submit_guard
+from bot.utils.participant_import import IMPORT_EXTENSIONS, parse_participants_file
+from bot.utils.validators import PARTICIPANT_FIELDS_SEPARATOR
 from bot.utils import (
     validate_date,
     validate_date_range,
     validate_full_name,
     validate_text,
-    generate_excel,
-    send_email
+    parse_participants_batch,
+    check_user_access,
+    delivery_queue,
+    enqueue_delivery
     # send_to_telegram  # ОТКЛЮЧЕНО: не используется после отключения отправки в Telegram чат
 )
 
@@ -36,18 +49,10 @@ logger = logging.getLogger(__name__)
 
 router = Router()
 
-
-async def check_user_access(user_id: int, session: AsyncSession) -> tuple[bool, User | None]:
-    """Проверка доступа пользователя"""
-    result = await session.execute(
-        select(User).where(User.telegram_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user or user.status != UserStatus.APPROVED:
-        return False, user
-    
-    return True, user
+NO_ACCESS_TEXT = (
+    "❌ У вас нет доступа к подаче заявок.\n"
+    "Дождитесь одобрения администратора или обратитесь к нему."
+)
 
 
 @router.message(F.text == "📝 Подать заявку")
@@ -56,10 +61,7 @@ async def start_application(message: Message, state: FSMContext, session: AsyncS
     has_access, user = await check_user_access(message.from_user.id, session)
     
     if not has_access:
-        await message.answer(
-            "❌ У вас нет доступа к подаче заявок.\n"
-            "Дождитесь одобрения администратора или обратитесь к нему."
-        )
+        await message.answer(NO_ACCESS_TEXT)
         return
     
     # Очищаем предыдущее состояние
@@ -172,7 +174,107 @@ async def process_city(message: Message, state: FSMContext):
         "✅ Город сохранен\n\n"
         "Шаг 5 из 5: <b>Добавление участников поездки</b>\n\n"
         f"Участников добавлено: {len(participants)}\n\n"
-        "Добавьте минимум одного участника:",
+        "Добавьте минимум одного участника по одному или сразу списком:",
+        parse_mode="HTML",
+        reply_markup=get_participants_menu(has_participants=len(participants) > 0)
+    )
+
+
+# Ошибочных строк в ответе на список участников
+BATCH_ERRORS_SHOWN = 20
+
+BATCH_HELP = (
+    "📝 <b>Добавление участников списком</b>\n\n"
+    "Отправьте одним сообщением по участнику на строку:\n"
+    "<code>ФИО; ДД.ММ.ГГГГ; ДД.ММ.ГГГГ</code>\n\n"
+    "Например:\n"
+    "<code>Иванов Иван Иванович; 01.06.2025; 10.06.2025\n"
+    "Петрова Анна Сергеевна; 02.06.2025; 10.06.2025</code>\n\n"
+    "Или пришлите файл .xlsx / .csv с колонками ФИО, дата начала, дата окончания."
+)
+
+
+def _added_report(
+    added: int,
+    total: int,
+    errors: List[Tuple[int, str, str]],
+    position: str = "строки",
+    note: str = ""
+) -> str:
+    """Ответ на добавление участников списком или файлом"""
+    response = ""
+    if added:
+        response += (
+            f"✅ Добавлено участников: {added}\n"
+            f"Всего участников: {total}\n"
+        )
+    if note:
+        response += f"\n⚠️ {note}\n"
+    
+    if errors:
+        response += f"\n❌ <b>Не добавлены {position} ({len(errors)}):</b>\n"
+        for line_num, line, error_msg in errors[:BATCH_ERRORS_SHOWN]:
+            response += f"{line_num}. <code>{escape(line[:100])}</code>\n   {error_msg}\n"
+        if len(errors) > BATCH_ERRORS_SHOWN:
+            response += f"...и еще {len(errors) - BATCH_ERRORS_SHOWN}\n"
+        response += "\nИсправьте эти строки и отправьте только их."
+    
+    return response or "❌ Участники не найдены"
+
+
+async def add_participants_batch(message: Message, state: FSMContext, participants: List[Dict]):
+    """Добавление участников из списка: корректные строки добавляются, об ошибочных - один ответ"""
+    new_participants, errors = parse_participants_batch(message.text)
+    
+    if new_participants:
+        participants.extend(new_participants)
+        await state.update_data(participants=participants)
+    
+    await message.answer(
+        _added_report(len(new_participants), len(participants), errors),
+        parse_mode="HTML",
+        reply_markup=get_participants_menu(has_participants=len(participants) > 0)
+    )
+
+
+@router.message(StateFilter(ApplicationStates.participants_menu), F.document)
+async def process_participants_file(message: Message, state: FSMContext):
+    """Импорт участников из файла XLSX или CSV"""
+    document = message.document
+    filename = document.file_name or ""
+    
+    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+        await message.answer("❌ Поддерживаются файлы .xlsx и .csv")
+        return
+    
+    if document.file_size and document.file_size > config.PARTICIPANTS_IMPORT_MAX_KB * 1024:
+        await message.answer(f"❌ Файл больше {config.PARTICIPANTS_IMPORT_MAX_KB} КБ")
+        return
+    
+    buffer = io.BytesIO()
+    await message.bot.download(document, destination=buffer)
+    
+    # Разбор занимает CPU: выполняется в потоке, event loop продолжает обслуживать других
+    try:
+        result = await asyncio.to_thread(
+            parse_participants_file, buffer.getvalue(), filename, config.PARTICIPANTS_IMPORT_MAX_ROWS
+        )
+    except ValueError as e:
+        await message.answer(f"❌ {e}")
+        return
+    
+    data = await state.get_data()
+    participants = data.get("participants", [])
+    if result.participants:
+        participants.extend(result.participants)
+        await state.update_data(participants=participants)
+    
+    note = ""
+    if result.truncated:
+        note = f"Разобраны первые {config.PARTICIPANTS_IMPORT_MAX_ROWS} строк файла, остальные пропущены"
+    
+    await message.answer(
+        _added_report(len(result.participants), len(participants), result.errors, "строки файла", note),
         parse_mode="HTML",
         reply_markup=get_participants_menu(has_participants=len(participants) > 0)
     )
@@ -192,6 +294,9 @@ async def process_participants_menu(message: Message, state: FSMContext):
             reply_markup=get_cancel_keyboard()
         )
     
+    elif message.text == "📝 Добавить списком":
+        await message.answer(BATCH_HELP, parse_mode="HTML")
+    
     elif message.text == "📋 Список участников":
         if not participants:
             await message.answer("📋 Список участников пуст")
@@ -229,6 +334,10 @@ async def process_participants_menu(message: Message, state: FSMContext):
     
     elif message.text == "❌ Отменить":
         await cancel_application(message, state)
+    
+    elif message.text and PARTICIPANT_FIELDS_SEPARATOR in message.text:
+        # Список участников одним сообщением
+        await add_participants_batch(message, state, participants)
 
 
 @router.message(StateFilter(ApplicationStates.participant_name))
@@ -340,25 +449,31 @@ async def show_confirmation(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data == "confirm_yes", StateFilter(ApplicationStates.confirm))
-async def confirm_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
-    """Подтверждение и отправка заявки"""
-    await callback.answer()
-    await callback.message.edit_reply_markup(reply_markup=None)
+async def _submit_application(
+    session: AsyncSession,
+    user_id: int,
+    chat_id: int,
+    data: Dict,
+    idempotency_key: str
+) -> Tuple[int, bool]:
+    """
+    Сохранение заявки и постановка в очередь на отправку (один раз на ключ)
+    
+    Returns:
+        Tuple[int, bool]: ID заявки и признак, что она создана этим вызовом
+        (False - заявка с этим ключом уже была принята)
+    """
+    existing = await session.execute(
+        select(Application.id).where(Application.idempotency_key == idempotency_key)
+    )
+    application_id = existing.scalar_one_or_none()
+    if application_id is not None:
+        return application_id, False
     
-    processing_msg = await callback.message.answer("⏳ Обработка заявки...")
+    draft_id = data.get("draft_id")  # Проверяем, продолжаем ли мы черновик
+    participants = data.get("participants", [])
     
     try:
-        data = await state.get_data()
-        user_id = callback.from_user.id
-        draft_id = data.get("draft_id")  # Проверяем, продолжаем ли мы черновик
-        
-        # Получаем пользователя
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one()
-        
         # Если это черновик, обновляем его, иначе создаем новую заявку
         if draft_id:
             # Обновляем существующий черновик
@@ -372,25 +487,14 @@ async def confirm_application(callback: CallbackQuery, state: FSMContext, sessio
             application.event_rank = data.get("event_rank")
             application.country = data.get("country")
             application.city = data.get("city")
-            application.participants_data = {"participants": data.get("participants", [])}
+            application.participants_data = participants_json(participants)
             application.status = ApplicationStatus.SUBMITTED
             application.submitted_at = datetime.now()
-            
-            # Удаляем старых участников
-            for p in application.participants:
-                await session.delete(p)
+            application.idempotency_key = idempotency_key
             await session.flush()
             
-            # Добавляем новых участников
-            for idx, p in enumerate(data.get("participants", []), 1):
-                participant = Participant(
-                    application_id=application.id,
-                    full_name=p["full_name"],
-                    date_from=p["date_from"],
-                    date_to=p["date_to"],
-                    order_num=idx
-                )
-                session.add(participant)
+            # Заменяем участников: один DELETE и один INSERT
+            await save_participants(session, application.id, participants)
         else:
             # Создаем новую заявку
             application = Application(
@@ -399,109 +503,105 @@ async def confirm_application(callback: CallbackQuery, state: FSMContext, sessio
                 event_rank=data.get("event_rank"),
                 country=data.get("country"),
                 city=data.get("city"),
-                participants_data={"participants": data.get("participants", [])},
+                participants_data=participants_json(participants),
                 status=ApplicationStatus.SUBMITTED,
-                submitted_at=datetime.now()
+                submitted_at=datetime.now(),
+                idempotency_key=idempotency_key
             )
             session.add(application)
             await session.flush()
             
-            # Добавляем участников
-            for idx, p in enumerate(data.get("participants", []), 1):
-                participant = Participant(
-                    application_id=application.id,
-                    full_name=p["full_name"],
-                    date_from=p["date_from"],
-                    date_to=p["date_to"],
-                    order_num=idx
-                )
-                session.add(participant)
+            # Добавляем участников одним INSERT
+            await save_participants(session, application.id, participants, replace=False)
         
+        # Генерация Excel и отправка email выполняются в фоне (см. bot/utils/delivery.py)
+        await enqueue_delivery(session, application.id, chat_id)
         await session.commit()
-        
-        # Генерируем Excel (в отдельном потоке для безопасности)
-        excel_data = {
-            "sport_type": data.get("sport_type"),
-            "event_rank": data.get("event_rank"),
-            "country": data.get("country"),
-            "city": data.get("city"),
-            "participants": data.get("participants", [])
-        }
-        
-        excel_path = await asyncio.to_thread(generate_excel, excel_data)
-        application.excel_file_path = excel_path
-        
-        # Отправляем Email
-        email_subject = f"Заявка на служебную поездку — {user.full_name or user.first_name} — {data.get('city')}/{datetime.now().strftime('%d.%m.%Y')}"
-        email_body = (
-            f"Заявка на служебную поездку\n\n"
-            f"От: {user.full_name or user.first_name} {user.last_name or ''}\n"
-            f"Организация: {user.organization or 'Не указана'}\n\n"
-            f"Вид спорта: {data.get('sport_type')}\n"
-            f"Ранг мероприятия: {data.get('event_rank')}\n"
-            f"Страна: {data.get('country')}\n"
-            f"Город: {data.get('city')}\n\n"
-            f"Количество участников: {len(data.get('participants', []))}\n\n"
-            f"Подробности в прикрепленном файле."
-        )
-        
-        email_sent = await send_email(
-            subject=email_subject,
-            body=email_body,
-            attachment_path=excel_path
+    except IntegrityError:
+        # Тот же ключ одновременно записал другой процесс бота
+        await session.rollback()
+        existing = await session.execute(
+            select(Application.id).where(Application.idempotency_key == idempotency_key)
         )
-        application.email_sent = email_sent
-        
-        # # ОТКЛЮЧЕНО: Отправка в Telegram чат (TARGET_CHAT_ID)
-        # # Оставлена только отправка на email
-        # telegram_message = (
-        #     f"📝 Новая заявка на служебную поездку\n\n"
-        #     f"От: {user.full_name or user.first_name} {user.last_name or ''}\n"
-        #     f"Username: @{user.username or 'N/A'}\n\n"
-        #     f"Вид спорта: {data.get('sport_type')}\n"
-        #     f"Ранг: {data.get('event_rank')}\n"
-        #     f"Направление: {data.get('country')}, {data.get('city')}\n"
-        #     f"Участников: {len(data.get('participants', []))}"
-        # )
-        # 
-        # telegram_sent = await send_to_telegram(
-        #     bot=callback.bot,
-        #     message=telegram_message,
-        #     attachment_path=excel_path
-        # )
-        # application.telegram_sent = telegram_sent
-        telegram_sent = False  # Отправка в Telegram отключена
-        
-        await session.commit()
-        
-        # Очищаем состояние
-        await state.clear()
-        
-        # Определяем клавиатуру
-        keyboard = get_admin_menu() if user.is_admin else get_main_menu()
+        application_id = existing.scalar_one_or_none()
+        if application_id is None:
+            raise
+        return application_id, False
+    
+    return application.id, True
+
+
+@router.callback_query(F.data == "confirm_yes", StateFilter(ApplicationStates.confirm))
+async def confirm_application(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """Подтверждение и отправка заявки"""
+    user_id = callback.from_user.id
+    
+    # Повторное нажатие, пока заявка обрабатывается
+    if not submit_guard.acquire(user_id):
+        await callback.answer("⏳ Заявка уже обрабатывается")
+        return
+    
+    try:
+        await callback.answer()
+        await callback.message.edit_reply_markup(reply_markup=None)
         
-        await processing_msg.edit_text(
-            "✅ <b>Заявка успешно отправлена!</b>\n\n"
-            f"ID заявки: {application.id}\n"
-            f"Email: {'✅' if email_sent else '❌'}\n\n"
-            "Вы можете посмотреть историю заявок в меню.",
-            parse_mode="HTML"
-        )
+        # Статус - из БД, а не из кэша: доступ мог быть отозван в другом процессе бота
+        has_access, user = await check_user_access(user_id, session, fresh=True)
+        if not has_access:
+            await state.clear()
+            await callback.message.answer(NO_ACCESS_TEXT)
+            return
         
-        await callback.message.answer(
-            "Выберите действие:",
-            reply_markup=keyboard
-        )
+        processing_msg = await callback.message.answer("⏳ Обработка заявки...")
         
-    except Exception as e:
-        logger.error(f"Ошибка при создании заявки: {e}", exc_info=True)
-        await processing_msg.edit_text(
-            "❌ Произошла ошибка при отправке заявки.\n"
-            "Попробуйте еще раз или обратитесь к администратору."
-        )
-        
-        keyboard = get_admin_menu() if callback.from_user.id in config.ADMIN_IDS else get_main_menu()
-        await callback.message.answer("Выберите действие:", reply_markup=keyboard)
+        try:
+            data = await state.get_data()
+            idempotency_key = submission_key(user_id, callback.message.message_id, data)
+            
+            application_id, created = await _submit_application(
+                session, user_id, callback.message.chat.id, data, idempotency_key
+            )
+            if created:
+                delivery_queue.notify()
+            else:
+                logger.info(f"Повторное подтверждение заявки {application_id} пользователем {user_id}")
+            
+            # Очищаем состояние
+            await state.clear()
+            
+            keyboard = get_admin_menu() if user.is_admin else get_main_menu()
+            
+            await processing_msg.edit_text(
+                "✅ <b>Заявка принята!</b>\n\n"
+                f"ID заявки: {application_id}\n\n"
+                "Файл заявки формируется и будет отправлен на email, "
+                "о результате придет отдельное сообщение.\n"
+                "Вы можете посмотреть историю заявок в меню.",
+                parse_mode="HTML"
+            )
+            
+            await callback.message.answer(
+                "Выберите действие:",
+                reply_markup=keyboard
+            )
+            
+        except Exception as e:
+            logger.error(f"Ошибка при создании заявки: {e}", exc_info=True)
+            await processing_msg.edit_text(
+                "❌ Произошла ошибка при отправке заявки.\n"
+                "Попробуйте еще раз или обратитесь к администратору."
+            )
+            
+            keyboard = get_admin_menu() if callback.from_user.id in config.ADMIN_IDS else get_main_menu()
+            await callback.message.answer("Выберите действие:", reply_markup=keyboard)
+    finally:
+        submit_guard.release(user_id)
+
+
+@router.callback_query(F.data == "confirm_yes")
+async def confirm_already_done(callback: CallbackQuery):
+    """Повторное подтверждение после того, как заявка принята (состояние уже очищено)"""
+    await callback.answer("✅ Заявка уже принята")
 
 
 @router.callback_query(F.data == "confirm_edit", StateFilter(ApplicationStates.confirm))
@@ -521,11 +621,12 @@ async def save_draft(callback: CallbackQuery, state: FSMContext, session: AsyncS
         data = await state.get_data()
         user_id = callback.from_user.id
         
-        # Получаем пользователя
-        result = await session.execute(
-            select(User).where(User.telegram_id == user_id)
-        )
-        user = result.scalar_one()
+        # Статус - из БД, а не из кэша: доступ мог быть отозван в другом процессе бота
+        has_access, user = await check_user_access(user_id, session, fresh=True)
+        if not has_access:
+            await state.clear()
+            await callback.message.answer(NO_ACCESS_TEXT)
+            return
         
         # Проверяем, обновляем ли мы существующий черновик
         draft_id = data.get("draft_id")
@@ -547,24 +648,10 @@ async def save_draft(callback: CallbackQuery, state: FSMContext, session: AsyncS
                 draft.event_rank = data.get("event_rank")
                 draft.country = data.get("country")
                 draft.city = data.get("city")
-                draft.participants_data = {"participants": data.get("participants", [])}
-                
-                # Удаляем старых участников
-                for participant in draft.participants:
-                    await session.delete(participant)
-                
-                await session.flush()
+                draft.participants_data = participants_json(data.get("participants", []))
                 
-                # Добавляем новых участников
-                for idx, p in enumerate(data.get("participants", []), 1):
-                    participant = Participant(
-                        application_id=draft.id,
-                        full_name=p["full_name"],
-                        date_from=p["date_from"],
-                        date_to=p["date_to"],
-                        order_num=idx
-                    )
-                    session.add(participant)
+                # Заменяем участников: один DELETE и один INSERT
+                await save_participants(session, draft.id, data.get("participants", []))
             else:
                 draft_id = None  # Черновик не найден, создадим новый
         
@@ -576,23 +663,15 @@ async def save_draft(callback: CallbackQuery, state: FSMContext, session: AsyncS
                 event_rank=data.get("event_rank"),
                 country=data.get("country"),
                 city=data.get("city"),
-                participants_data={"participants": data.get("participants", [])},
+                participants_data=participants_json(data.get("participants", [])),
                 status=ApplicationStatus.DRAFT,  # Статус черновика
                 submitted_at=None
             )
             session.add(draft)
             await session.flush()  # ВАЖНО: Flush чтобы получить draft.id
             
-            # Добавляем участников
-            for idx, p in enumerate(data.get("participants", []), 1):
-                participant = Participant(
-                    application_id=draft.id,
-                    full_name=p["full_name"],
-                    date_from=p["date_from"],
-                    date_to=p["date_to"],
-                    order_num=idx
-                )
-                session.add(participant)
+            # Добавляем участников одним INSERT
+            await save_participants(session, draft.id, data.get("participants", []), replace=False)
         
         await session.commit()
         
@@ -634,6 +713,48 @@ async def cancel_application(message: Message, state: FSMContext):
     )
 
 
+async def _history_page(
+    session: AsyncSession,
+    user_id: int,
+    cursor: Optional[str] = None,
+    direction: str = NEXT
+) -> Tuple[Optional[str], Optional[InlineKeyboardMarkup]]:
+    """Текст и кнопки одной страницы истории заявок"""
+    # Число участников считается в том же запросе, строки Participant не загружаются
+    query = with_participants_count(
+        select(
+            Application.id,
+            Application.status,
+            Application.city,
+            Application.country,
+            Application.created_at
+        ).where(Application.user_id == user_id)
+    )
+
+    page = await keyset_page(
+        session,
+        query,
+        (Application.created_at, Application.id),
+        cursor=cursor,
+        direction=direction,
+        limit=config.HISTORY_PAGE_SIZE
+    )
+    if not page.rows:
+        return None, None
+
+    response = "📋 <b>Ваши заявки:</b>\n\n"
+    for app in page.rows:
+        status_emoji = "✅" if app.status == ApplicationStatus.SUBMITTED else "⏳"
+        response += (
+            f"{status_emoji} <b>Заявка #{app.id}</b>\n"
+            f"Направление: {app.city}, {app.country}\n"
+            f"Дата: {app.created_at.strftime('%d.%m.%Y %H:%M')}\n"
+            f"Участников: {app.participants_count}\n\n"
+        )
+
+    return response, get_pagination_keyboard("history", page.prev_cursor, page.next_cursor)
+
+
 @router.message(F.text == "📋 История заявок")
 async def show_history(message: Message, session: AsyncSession):
     """Показ истории заявок"""
@@ -643,27 +764,34 @@ async def show_history(message: Message, session: AsyncSession):
         await message.answer("❌ У вас нет доступа")
         return
     
-    # Получаем заявки пользователя
-    result = await session.execute(
-        select(Application)
-        .where(Application.user_id == message.from_user.id)
-        .order_by(Application.created_at.desc())
-    )
-    applications = result.scalars().all()
+    response, keyboard = await _history_page(session, message.from_user.id)
     
-    if not applications:
+    if response is None:
         await message.answer("📋 У вас пока нет поданных заявок")
         return
     
-    response = "📋 <b>Ваши заявки:</b>\n\n"
+    await message.answer(response, parse_mode="HTML", reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("history:"))
+async def show_history_page(callback: CallbackQuery, session: AsyncSession):
+    """Листание истории заявок"""
+    has_access, user = await check_user_access(callback.from_user.id, session)
     
-    for app in applications[:10]:  # Показываем последние 10
-        status_emoji = "✅" if app.status == ApplicationStatus.SUBMITTED else "⏳"
-        response += (
-            f"{status_emoji} <b>Заявка #{app.id}</b>\n"
-            f"Направление: {app.city}, {app.country}\n"
-            f"Дата: {app.created_at.strftime('%d.%m.%Y %H:%M')}\n"
-            f"Участников: {len(app.participants)}\n\n"
-        )
+    if not has_access:
+        await callback.answer("❌ У вас нет доступа", show_alert=True)
+        return
     
-    await message.answer(response, parse_mode="HTML")
+    _, direction, cursor = callback.data.split(":", 2)
+    try:
+        response, keyboard = await _history_page(session, callback.from_user.id, cursor, direction)
+    except ValueError:
+        await callback.answer("❌ Некорректная страница", show_alert=True)
+        return
+    
+    if response is None:
+        await callback.answer("Больше заявок нет")
+        return
+    
+    await callback.message.edit_text(response, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
@@ -2,73 +2,68 @@
 Обработчики для работы с черновиками
 """
 import logging
+from typing import Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.database.models import User, UserStatus, Application, ApplicationStatus
-from bot.keyboards import get_participants_menu, get_admin_menu, get_main_menu
+from bot.config import config
+from bot.database.models import Application, ApplicationStatus
+from bot.database.pagination import NEXT, keyset_page
+from bot.database.participants import load_participants, with_participants_count
+from bot.keyboards import get_participants_menu, get_admin_menu, get_main_menu, get_pagination_keyboard
 from bot.states import ApplicationStates
+from bot.utils import check_user_access
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 
-async def check_user_access(user_id: int, session: AsyncSession) -> tuple[bool, User | None]:
-    """Проверка доступа пользователя"""
-    result = await session.execute(
-        select(User).where(User.telegram_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user or user.status != UserStatus.APPROVED:
-        return False, user
-    
-    return True, user
-
-
-@router.message(F.text == "💾 Мои черновики")
-async def show_drafts(message: Message, session: AsyncSession):
-    """Показ списка черновиков"""
-    has_access, user = await check_user_access(message.from_user.id, session)
-    
-    if not has_access:
-        await message.answer("❌ У вас нет доступа")
-        return
-    
-    # Получаем черновики пользователя (сохранены как заявки со статусом DRAFT)
-    result = await session.execute(
-        select(Application)
-        .where(
-            Application.user_id == message.from_user.id,
+async def _drafts_page(
+    session: AsyncSession,
+    user_id: int,
+    cursor: Optional[str] = None,
+    direction: str = NEXT
+) -> Tuple[Optional[str], Optional[InlineKeyboardMarkup]]:
+    """Текст и кнопки одной страницы черновиков"""
+    # Черновики и число участников одним запросом (GROUP BY в режиме rows)
+    query = with_participants_count(
+        select(
+            Application.id,
+            Application.city,
+            Application.country,
+            Application.updated_at
+        ).where(
+            Application.user_id == user_id,
             Application.status == ApplicationStatus.DRAFT
         )
-        .order_by(Application.updated_at.desc())
     )
-    drafts = result.scalars().all()
-    
-    if not drafts:
-        await message.answer(
-            "💾 У вас пока нет сохраненных черновиков\n\n"
-            "Вы можете сохранить черновик при заполнении заявки, "
-            "нажав кнопку '💾 Сохранить черновик' на этапе подтверждения."
-        )
-        return
-    
+
+    page = await keyset_page(
+        session,
+        query,
+        (Application.updated_at, Application.id),
+        cursor=cursor,
+        direction=direction,
+        limit=config.DRAFTS_PAGE_SIZE
+    )
+    if not page.rows:
+        return None, None
+
     response = "💾 <b>Ваши черновики:</b>\n\n"
     
     # Создаем инлайн клавиатуру для выбора черновика
     keyboard_buttons = []
     
-    for draft in drafts:
-        participants_count = len(draft.participants)
+    for draft in page.rows:
         response += (
             f"📄 <b>Черновик #{draft.id}</b>\n"
             f"Город: {draft.city or 'Не указан'}, {draft.country or 'Не указана'}\n"
-            f"Участников: {participants_count}\n"
+            f"Участников: {draft.participants_count}\n"
             f"Последнее изменение: {draft.updated_at.strftime('%d.%m.%Y %H:%M')}\n\n"
         )
         
@@ -84,13 +79,61 @@ async def show_drafts(message: Message, session: AsyncSession):
             )
         ])
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+    pagination = get_pagination_keyboard("drafts", page.prev_cursor, page.next_cursor)
+    if pagination:
+        keyboard_buttons.extend(pagination.inline_keyboard)
     
     response += "\n<i>Выберите черновик для продолжения работы или удаления:</i>"
     
+    return response, InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+
+
+@router.message(F.text == "💾 Мои черновики")
+async def show_drafts(message: Message, session: AsyncSession):
+    """Показ списка черновиков"""
+    has_access, user = await check_user_access(message.from_user.id, session)
+    
+    if not has_access:
+        await message.answer("❌ У вас нет доступа")
+        return
+    
+    response, keyboard = await _drafts_page(session, message.from_user.id)
+    
+    if response is None:
+        await message.answer(
+            "💾 У вас пока нет сохраненных черновиков\n\n"
+            "Вы можете сохранить черновик при заполнении заявки, "
+            "нажав кнопку '💾 Сохранить черновик' на этапе подтверждения."
+        )
+        return
+    
     await message.answer(response, parse_mode="HTML", reply_markup=keyboard)
 
 
+@router.callback_query(F.data.startswith("drafts:"))
+async def show_drafts_page(callback: CallbackQuery, session: AsyncSession):
+    """Листание списка черновиков"""
+    has_access, user = await check_user_access(callback.from_user.id, session)
+    
+    if not has_access:
+        await callback.answer("❌ У вас нет доступа", show_alert=True)
+        return
+    
+    _, direction, cursor = callback.data.split(":", 2)
+    try:
+        response, keyboard = await _drafts_page(session, callback.from_user.id, cursor, direction)
+    except ValueError:
+        await callback.answer("❌ Некорректная страница", show_alert=True)
+        return
+    
+    if response is None:
+        await callback.answer("Больше черновиков нет")
+        return
+    
+    await callback.message.edit_text(response, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
+
+
 @router.callback_query(F.data.startswith("load_draft:"))
 async def load_draft(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Загрузка черновика для продолжения работы"""
@@ -99,7 +142,7 @@ async def load_draft(callback: CallbackQuery, state: FSMContext, session: AsyncS
     try:
         draft_id = int(callback.data.split(":")[1])
         
-        # Получаем черновик
+        # Получаем черновик; участники загружаются одним запросом (или из JSON)
         result = await session.execute(
             select(Application)
             .where(
@@ -115,13 +158,7 @@ async def load_draft(callback: CallbackQuery, state: FSMContext, session: AsyncS
             return
         
         # Восстанавливаем данные в состояние
-        participants_data = []
-        for p in draft.participants:
-            participants_data.append({
-                "full_name": p.full_name,
-                "date_from": p.date_from,
-                "date_to": p.date_to
-            })
+        participants_data = await load_participants(session, draft)
         
         await state.update_data(
             sport_type=draft.sport_type,
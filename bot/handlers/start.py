@@ -12,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from bot.config import config
 from bot.database.models import User, UserStatus
 from bot.keyboards import get_main_menu, get_admin_menu
+from bot.utils import check_user_access, notify_admins
 
 logger = logging.getLogger(__name__)
 
@@ -62,20 +63,16 @@ async def cmd_start(message: Message, session: AsyncSession):
             )
             
             # Уведомляем админов о новом пользователе
-            for admin_id in config.ADMIN_IDS:
-                try:
-                    user_info = (
-                        f"👤 Новый пользователь:\n"
-                        f"ID: {user_id}\n"
-                        f"Username: @{message.from_user.username or 'не указан'}\n"
-                        f"Имя: {message.from_user.first_name or ''} "
-                        f"{message.from_user.last_name or ''}\n\n"
-                        f"Для одобрения: /approve {user_id}\n"
-                        f"Для отклонения: /reject {user_id}"
-                    )
-                    await message.bot.send_message(admin_id, user_info)
-                except Exception as e:
-                    logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+            user_info = (
+                f"👤 Новый пользователь:\n"
+                f"ID: {user_id}\n"
+                f"Username: @{message.from_user.username or 'не указан'}\n"
+                f"Имя: {message.from_user.first_name or ''} "
+                f"{message.from_user.last_name or ''}\n\n"
+                f"Для одобрения: /approve {user_id}\n"
+                f"Для отклонения: /reject {user_id}"
+            )
+            await notify_admins(message.bot, user_info)
     else:
         # Пользователь уже существует
         if user.status == UserStatus.PENDING:
@@ -111,12 +108,9 @@ async def cmd_help(message: Message, session: AsyncSession):
     user_id = message.from_user.id
     
     # Проверяем статус пользователя
-    result = await session.execute(
-        select(User).where(User.telegram_id == user_id)
-    )
-    user = result.scalar_one_or_none()
+    has_access, user = await check_user_access(user_id, session)
     
-    if not user or user.status != UserStatus.APPROVED:
+    if not has_access:
         await message.answer(
             "⏳ Ваш доступ еще не одобрен администратором.\n"
             "Пожалуйста, дождитесь одобрения."
@@ -154,10 +148,15 @@ async def cmd_help(message: Message, session: AsyncSession):
         help_text += (
             "<b>Команды администратора:</b>\n"
             "• /pending - список ожидающих одобрения\n"
-            "• /users - список всех пользователей\n"
+            "• /users [username|user_id] - пользователи по статусам, поиск\n"
             "• /approve <user_id> - одобрить пользователя\n"
             "• /reject <user_id> - отклонить пользователя\n"
             "• /revoke <user_id> - отозвать доступ\n"
+            "• /travelling ДД.ММ.ГГГГ [ДД.ММ.ГГГГ] - кто в поездке в период\n"
+            "• /stats - сводка по заявкам и пользователям\n"
+            "• /apps - заявки по видам спорта, странам и направлениям\n"
+            "• /export [ДД.ММ.ГГГГ [ДД.ММ.ГГГГ]] [статус] [xlsx|csv] - выгрузка заявок\n"
+            "• /broadcast текст - сообщение всем одобренным пользователям\n"
         )
     
     await message.answer(help_text, parse_mode="HTML")
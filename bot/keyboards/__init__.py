@@ -8,7 +8,8 @@ from .common import (
     get_cancel_keyboard,
     get_confirmation_keyboard,
     get_participants_menu,
-    get_back_keyboard
+    get_back_keyboard,
+    get_pagination_keyboard
 )
 
 __all__ = [
@@ -17,5 +18,6 @@ __all__ = [
     "get_cancel_keyboard",
     "get_confirmation_keyboard",
     "get_participants_menu",
-    "get_back_keyboard"
+    "get_back_keyboard",
+    "get_pagination_keyboard"
 ]
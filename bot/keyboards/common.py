@@ -2,6 +2,8 @@
 """
 Общие клавиатуры
 """
+from typing import Optional
+
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 
 
@@ -21,6 +23,7 @@ def get_admin_menu() -> ReplyKeyboardMarkup:
         [KeyboardButton(text="📝 Подать заявку")],
         [KeyboardButton(text="💾 Мои черновики"), KeyboardButton(text="📋 История заявок")],
         [KeyboardButton(text="👥 Пользователи"), KeyboardButton(text="⏳ На одобрении")],
+        [KeyboardButton(text="📊 Статистика")],
         [KeyboardButton(text="ℹ️ Помощь")]
     ]
     return ReplyKeyboardMarkup(keyboard=keyboard, resize_keyboard=True)
@@ -61,12 +64,12 @@ def get_participants_menu(has_participants: bool = False) -> ReplyKeyboardMarkup
     keyboard = []
     
     if has_participants:
-        keyboard.append([KeyboardButton(text="➕ Добавить участника")])
+        keyboard.append([KeyboardButton(text="➕ Добавить участника"), KeyboardButton(text="📝 Добавить списком")])
         keyboard.append([KeyboardButton(text="📋 Список участников")])
         keyboard.append([KeyboardButton(text="🗑️ Удалить участника")])
         keyboard.append([KeyboardButton(text="✅ Завершить ввод участников")])
     else:
-        keyboard.append([KeyboardButton(text="➕ Добавить участника")])
+        keyboard.append([KeyboardButton(text="➕ Добавить участника"), KeyboardButton(text="📝 Добавить списком")])
     
     keyboard.append([KeyboardButton(text="❌ Отменить")])
     
@@ -107,3 +110,24 @@ def get_user_approval_keyboard(user_id: int) -> InlineKeyboardMarkup:
         ]
     ]
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def get_pagination_keyboard(
+    prefix: str,
+    prev_cursor: Optional[str] = None,
+    next_cursor: Optional[str] = None
+) -> Optional[InlineKeyboardMarkup]:
+    """
+    Кнопки листания списка
+
+    callback_data имеет вид "<prefix>:p:<курсор>" / "<prefix>:n:<курсор>".
+    Если листать некуда, возвращает None.
+    """
+    buttons = []
+    if prev_cursor:
+        buttons.append(InlineKeyboardButton(text="⬅️ Новее", callback_data=f"{prefix}:p:{prev_cursor}"))
+    if next_cursor:
+        buttons.append(InlineKeyboardButton(text="Старее ➡️", callback_data=f"{prefix}:n:{next_cursor}"))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -8,11 +8,17 @@ import sys
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot.config import config
-from bot.database import init_db, get_session
+from bot.database import init_db
+from bot.database.fsm_storage import create_fsm_storage, CoalescingStorage
 from bot.handlers import start, admin, application, drafts
+from bot.utils import delivery_queue, excel_executor, notifier, notify_admins, user_cache_listener
+from bot.utils.email_sender import smtp_pool
+from bot.middlewares import (
+    AdmissionMiddleware, ChatEventIsolation, DbSessionMiddleware, FSMFlushMiddleware, ThrottlingMiddleware
+)
+from bot.webhook import run_webhook
 
 
 # Настройка логирования
@@ -34,15 +40,15 @@ async def on_startup(bot: Bot):
     # Инициализация базы данных
     await init_db()
     
+    # Прогрев пула генерации Excel и запуск фоновой отправки заявок
+    await excel_executor.start()
+    await delivery_queue.start(bot)
+    
+    # Инвалидация кэша пользователей по изменениям из других процессов бота
+    await user_cache_listener.start()
+    
     # Уведомление админов о запуске
-    for admin_id in config.ADMIN_IDS:
-        try:
-            await bot.send_message(
-                admin_id,
-                "🚀 Бот запущен и готов к работе!"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+    await notify_admins(bot, "🚀 Бот запущен и готов к работе!")
     
     logger.info("Бот успешно запущен")
 
@@ -51,15 +57,19 @@ async def on_shutdown(bot: Bot):
     """Действия при остановке бота"""
     logger.info("Остановка бота...")
     
-    # Уведомление админов об остановке
-    for admin_id in config.ADMIN_IDS:
-        try:
-            await bot.send_message(
-                admin_id,
-                "⛔ Бот остановлен"
-            )
-        except Exception as e:
-            logger.error(f"Не удалось отправить уведомление админу {admin_id}: {e}")
+    # Незавершенные задания останутся в delivery_jobs и будут обработаны после запуска
+    await delivery_queue.stop()
+    logger.info(f"Статистика отправки заявок: {delivery_queue.get_stats()}")
+    await user_cache_listener.stop()
+    logger.info(f"Статистика инвалидации кэша пользователей: {user_cache_listener.get_stats()}")
+    await excel_executor.shutdown()
+    logger.info(f"Статистика генерации Excel: {excel_executor.get_stats()}")
+    await smtp_pool.close()
+    
+    # Уведомление админов об остановке (после завершения начатых рассылок)
+    await notifier.shutdown()
+    await notify_admins(bot, "⛔ Бот остановлен")
+    logger.info(f"Статистика уведомлений: {notifier.get_stats()}")
     
     logger.info("Бот остановлен")
 
@@ -76,14 +86,37 @@ async def main():
             default=DefaultBotProperties(parse_mode=ParseMode.HTML)
         )
         
-        dp = Dispatcher(storage=MemoryStorage())
+        storage = create_fsm_storage()
         
-        # Middleware для добавления сессии БД
-        @dp.update.middleware()
-        async def db_session_middleware(handler, event, data):
-            async for session in get_session():
-                data["session"] = session
-                return await handler(event, data)
+        # Обновления одного чата обрабатываются по очереди: блокировка ключа FSM
+        # берется до чтения состояния, поэтому следующее обновление видит
+        # состояние и данные, записанные предыдущим (без нее CoalescingStorage
+        # отдал бы второму обновлению еще не записанную запись первого)
+        chat_isolation = ChatEventIsolation()
+        # FSM-middleware регистрируется ниже вручную, после ограничения нагрузки
+        dp = Dispatcher(storage=storage, events_isolation=chat_isolation, disable_fsm=True)
+        
+        # Ограничение частоты от пользователя: до чтения состояния FSM,
+        # поэтому отброшенное обновление не обращается к БД
+        throttling_middleware = ThrottlingMiddleware(rate=config.THROTTLE_RATE, burst=config.THROTTLE_BURST)
+        dp.update.outer_middleware(throttling_middleware)
+        dp.update.outer_middleware(dp.fsm)
+        
+        # Ограничение одновременных обработок (каждая может занять соединение из пула БД):
+        # место занимается после блокировки чата, ожидающие своей очереди его не держат
+        admission_middleware = AdmissionMiddleware(
+            max_in_flight=config.THROTTLE_MAX_IN_FLIGHT or config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW,
+            admission_timeout=config.THROTTLE_ADMISSION_TIMEOUT
+        )
+        dp.update.middleware(admission_middleware)
+        
+        # Объединение записей FSM: одна запись в БД на обновление
+        if isinstance(storage, CoalescingStorage):
+            dp.update.middleware(FSMFlushMiddleware(storage))
+        
+        # Middleware для добавления сессии БД (создается при первом обращении)
+        db_session_middleware = DbSessionMiddleware()
+        dp.update.middleware(db_session_middleware)
         
         # Регистрация роутеров
         dp.include_router(start.router)
@@ -94,11 +127,29 @@ async def main():
         # Запуск
         await on_startup(bot)
         
+        # Очистка брошенных анкет
+        expiry_task = None
+        if isinstance(storage, CoalescingStorage):
+            expiry_task = asyncio.create_task(
+                storage.backend.run_expiry(config.FSM_CLEANUP_INTERVAL)
+            )
+        
         try:
-            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+            if config.BOT_MODE == "webhook":
+                await run_webhook(dp, bot, allowed_updates=dp.resolve_used_update_types())
+            else:
+                await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
         finally:
+            if expiry_task:
+                expiry_task.cancel()
             await on_shutdown(bot)
             await bot.session.close()
+            logger.info(f"Статистика использования БД: {db_session_middleware.get_stats()}")
+            logger.info(f"Статистика очередей чатов: {chat_isolation.get_stats()}")
+            logger.info(
+                f"Статистика ограничения нагрузки: {throttling_middleware.get_stats()}, "
+                f"{admission_middleware.get_stats()}"
+            )
             
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}", exc_info=True)
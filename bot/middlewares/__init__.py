@@ -0,0 +1,15 @@
+"""
+Middlewares module
+"""
+from .chat_order import ChatEventIsolation
+from .db_session import DbSessionMiddleware
+from .fsm_flush import FSMFlushMiddleware
+from .throttling import AdmissionMiddleware, ThrottlingMiddleware
+
+__all__ = [
+    "AdmissionMiddleware",
+    "ChatEventIsolation",
+    "DbSessionMiddleware",
+    "FSMFlushMiddleware",
+    "ThrottlingMiddleware"
+]
@@ -0,0 +1,77 @@
+"""
+Последовательная обработка обновлений одного чата
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Dict, Hashable
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+
+class _ChatQueue:
+    """Блокировка ключа и число обновлений, которые ее держат или ждут"""
+
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class ChatEventIsolation(BaseEventIsolation):
+    """
+    Изоляция событий FSM: обновления одного ключа по очереди, разных - параллельно
+
+    aiogram обрабатывает обновления конкурентно, и два быстрых сообщения
+    могут одновременно прочитать и перезаписать данные FSM (например,
+    список участников). Передается в Dispatcher(events_isolation=...):
+    FSMContextMiddleware берет блокировку ключа FSM (чат и пользователь)
+    до чтения состояния, так что следующее обновление видит состояние,
+    записанное предыдущим. asyncio.Lock отдает блокировку ожидающим в
+    порядке прихода. В отличие от SimpleEventIsolation, блокировка
+    удаляется, как только очередь ключа опустела, поэтому число
+    блокировок не растет с числом чатов.
+    """
+
+    def __init__(self):
+        self._queues: Dict[Hashable, _ChatQueue] = {}
+        self.updates_total = 0
+        self.waited = 0
+        self.max_depth = 0
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _ChatQueue()
+        queue.depth += 1
+        self.updates_total += 1
+        if queue.depth > 1:
+            self.waited += 1
+            self.max_depth = max(self.max_depth, queue.depth)
+
+        try:
+            async with queue.lock:
+                yield
+        finally:
+            queue.depth -= 1
+            if queue.depth == 0:
+                del self._queues[key]
+
+    def queue_depth(self, key: StorageKey) -> int:
+        """Число обновлений ключа в обработке и в ожидании"""
+        queue = self._queues.get(key)
+        return queue.depth if queue else 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики очередей чатов"""
+        return {
+            "updates_total": self.updates_total,
+            "waited": self.waited,
+            "max_depth": self.max_depth,
+            "active_chats": len(self._queues),
+            "queued": sum(queue.depth - 1 for queue in self._queues.values())
+        }
+
+    async def close(self) -> None:
+        pass
@@ -0,0 +1,54 @@
+"""
+Middleware для предоставления сессии БД обработчикам
+"""
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database import LazySession
+
+logger = logging.getLogger(__name__)
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    """
+    Передает в обработчик ленивую сессию БД
+
+    Считает, сколько обновлений обработано, для скольких была создана
+    сессия и сколько из них действительно обратились к БД.
+    """
+
+    def __init__(self, session_factory: Callable[[], LazySession] = LazySession):
+        self.session_factory = session_factory
+        self.updates_total = 0
+        self.sessions_created = 0
+        self.db_used = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.updates_total += 1
+        session = self.session_factory()
+        data["session"] = session
+
+        try:
+            return await handler(event, data)
+        finally:
+            if session.created:
+                self.sessions_created += 1
+            if session.db_used:
+                self.db_used += 1
+            await session.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики использования БД"""
+        return {
+            "updates_total": self.updates_total,
+            "sessions_created": self.sessions_created,
+            "db_used": self.db_used
+        }
@@ -0,0 +1,29 @@
+"""
+Middleware для записи накопленных изменений FSM
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.database.fsm_storage import CoalescingStorage
+
+
+class FSMFlushMiddleware(BaseMiddleware):
+    """Сбрасывает изменения FSM в хранилище одной записью после обработки обновления"""
+
+    def __init__(self, storage: CoalescingStorage):
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            context = data.get("state")
+            if context is not None:
+                await self.storage.flush(context.key)
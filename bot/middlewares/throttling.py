@@ -0,0 +1,161 @@
+"""
+Middleware ограничения частоты обновлений и числа одновременных обработок
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+from bot.utils.rate_limit import KeyedBuckets
+
+logger = logging.getLogger(__name__)
+
+THROTTLED_TEXT = "⏳ Слишком много запросов. Подождите несколько секунд."
+BUSY_TEXT = "⏳ Бот сейчас перегружен. Повторите, пожалуйста, через минуту."
+
+# Не чаще одного ответа «подождите» пользователю за столько секунд
+NOTICE_INTERVAL = 10.0
+
+
+def _user_id(data: Dict[str, Any]) -> Optional[int]:
+    # event_from_user заполняет UserContextMiddleware aiogram
+    user = data.get("event_from_user")
+    return user.id if user is not None else None
+
+
+class _RejectingMiddleware(BaseMiddleware):
+    """Ответ пользователю на отброшенное обновление"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.notices = KeyedBuckets(1 / NOTICE_INTERVAL, capacity=1.0, clock=clock)
+
+    async def _reject(self, event: TelegramObject, user_id: Optional[int], text: str) -> None:
+        """
+        Текст «подождите» - не чаще раза в NOTICE_INTERVAL на пользователя;
+        callback отвечается всегда, иначе у клиента крутится индикатор загрузки
+        """
+        notify = user_id is not None and self.notices.get(user_id).try_acquire()
+        # На уровне dp.update событие - Update, ответ идет во вложенное сообщение
+        inner = getattr(event, "event", event)
+        try:
+            if isinstance(inner, CallbackQuery):
+                await inner.answer(text if notify else None)
+            elif isinstance(inner, Message) and notify:
+                await inner.answer(text)
+        except TelegramAPIError as e:
+            logger.warning(f"Не удалось ответить пользователю {user_id}: {e}")
+
+
+class ThrottlingMiddleware(_RejectingMiddleware):
+    """
+    Ограничение частоты обновлений от пользователя
+
+    Каждому пользователю - корзина токенов (rate обновлений в секунду,
+    не больше burst подряд); обновления сверх нее отбрасываются.
+    Регистрируется как outer-middleware dp.update перед FSMContextMiddleware
+    (см. bot/main.py), чтобы отброшенное обновление не читало состояние
+    FSM из БД.
+    """
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        super().__init__(clock)
+        self.buckets = KeyedBuckets(rate, capacity=burst, clock=clock)
+        self.updates_total = 0
+        self.throttled = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.updates_total += 1
+        user_id = _user_id(data)
+        if user_id is not None and not self.buckets.get(user_id).try_acquire():
+            self.throttled += 1
+            await self._reject(event, user_id, THROTTLED_TEXT)
+            return None
+        return await handler(event, data)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики ограничения частоты"""
+        return {"updates_total": self.updates_total, "throttled": self.throttled}
+
+
+class AdmissionMiddleware(_RejectingMiddleware):
+    """
+    Ограничение числа одновременно обрабатываемых обновлений
+
+    Одновременно обрабатывается не больше max_in_flight обновлений
+    (по числу соединений пула БД): остальные ждут свободного места до
+    admission_timeout секунд и затем отбрасываются. Регистрируется
+    inner-middleware dp.update, то есть после блокировки чата: обновления,
+    ждущие своей очереди в чате, места не занимают.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        admission_timeout: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        super().__init__(clock)
+        self.max_in_flight = max_in_flight
+        self.admission_timeout = admission_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.deferred = 0
+        self.shed = 0
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Создается в работающем event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def _admit(self) -> bool:
+        """Занятие места для обработки; False, если его не дождались"""
+        if not self.semaphore.locked():
+            await self.semaphore.acquire()
+            return True
+        self.deferred += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.admission_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        if not await self._admit():
+            self.shed += 1
+            logger.warning(f"Обновление отброшено: занято {self.max_in_flight} мест обработки")
+            await self._reject(event, _user_id(data), BUSY_TEXT)
+            return None
+
+        self.in_flight += 1
+        self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+        try:
+            return await handler(event, data)
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики ограничения одновременных обработок"""
+        return {
+            "deferred": self.deferred,
+            "shed": self.shed,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight_seen
+        }
@@ -1,17 +1,39 @@
-
 """
 Utils module
 """
-from .validators import validate_date, validate_full_name, validate_text
-from .excel_generator import generate_excel
-from .email_sender import send_email
+from .validators import (
+    validate_date, validate_date_range, validate_full_name, validate_text, parse_participants_batch
+)
+from .excel_generator import generate_excel, generate_excel_bytes
+from .email_sender import send_email, send_messages, build_message
 from .telegram_sender import send_to_telegram
+from .user_cache import user_cache, user_cache_listener, publish_user_change, check_user_access, get_cached_user
+from .excel_executor import excel_executor
+from .stats import stats_cache
+from .notifier import notifier, notify_admins
+from .delivery import delivery_queue, enqueue_delivery
 
 __all__ = [
     "validate_date",
+    "validate_date_range",
     "validate_full_name",
     "validate_text",
+    "parse_participants_batch",
     "generate_excel",
+    "generate_excel_bytes",
+    "excel_executor",
     "send_email",
-    "send_to_telegram"
+    "send_messages",
+    "build_message",
+    "send_to_telegram",
+    "user_cache",
+    "user_cache_listener",
+    "publish_user_change",
+    "check_user_access",
+    "get_cached_user",
+    "stats_cache",
+    "notifier",
+    "notify_admins",
+    "delivery_queue",
+    "enqueue_delivery"
 ]
@@ -0,0 +1,252 @@
+"""
+Фоновая отправка поданных заявок (outbox)
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.config import config
+from bot.database.database import async_session_maker
+from bot.database.models import Application, DeliveryJob, DeliveryStatus, User
+from bot.database.participants import load_participants
+from .email_sender import send_email
+from .excel_executor import excel_executor
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts: int, base_delay: float, max_delay: float = 3600.0) -> float:
+    """Экспоненциальная задержка перед следующей попыткой"""
+    return min(base_delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+def build_email(application: Application, user: User, participants: Optional[List[Dict]] = None) -> Tuple[str, str]:
+    """
+    Формирование темы и текста письма по заявке
+
+    Returns:
+        Tuple[str, str]: (тема, текст)
+    """
+    if participants is None:
+        participants = (application.participants_data or {}).get("participants", [])
+    submitted_at = application.submitted_at or datetime.now()
+
+    subject = f"Заявка на служебную поездку — {user.full_name or user.first_name} — {application.city}/{submitted_at.strftime('%d.%m.%Y')}"
+    body = (
+        f"Заявка на служебную поездку\n\n"
+        f"От: {user.full_name or user.first_name} {user.last_name or ''}\n"
+        f"Организация: {user.organization or 'Не указана'}\n\n"
+        f"Вид спорта: {application.sport_type}\n"
+        f"Ранг мероприятия: {application.event_rank}\n"
+        f"Страна: {application.country}\n"
+        f"Город: {application.city}\n\n"
+        f"Количество участников: {len(participants)}\n\n"
+        f"Подробности в прикрепленном файле."
+    )
+    return subject, body
+
+
+async def enqueue_delivery(session: AsyncSession, application_id: int, chat_id: int) -> DeliveryJob:
+    """
+    Постановка заявки в очередь на отправку
+
+    Задание добавляется в сессию вызывающего кода и фиксируется
+    тем же commit, что и сама заявка.
+    """
+    job = DeliveryJob(application_id=application_id, chat_id=chat_id, status=DeliveryStatus.PENDING)
+    session.add(job)
+    return job
+
+
+class DeliveryQueue:
+    """
+    Пул воркеров, обрабатывающих таблицу delivery_jobs
+
+    Воркер забирает задание через SELECT ... FOR UPDATE SKIP LOCKED,
+    поэтому несколько экземпляров бота не обработают одно задание дважды.
+    Взятое задание арендуется на lease секунд: если процесс упал,
+    задание снова станет доступным после истечения аренды.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession] = async_session_maker,
+        workers: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 30.0,
+        poll_interval: float = 10.0,
+        lease: float = 600.0
+    ):
+        self.session_maker = session_maker
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.bot: Optional[Bot] = None
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+
+    def notify(self) -> None:
+        """Разбудить воркеры после постановки задания"""
+        self._wakeup.set()
+
+    async def start(self, bot: Bot) -> None:
+        """Запуск воркеров"""
+        self.bot = bot
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Запущено воркеров отправки заявок: {self.workers}")
+
+    async def stop(self) -> None:
+        """Остановка воркеров (незавершенные задания останутся в таблице)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            # Сбрасываем событие до выборки, чтобы не пропустить notify()
+            self._wakeup.clear()
+            try:
+                job_id = await self._claim()
+            except Exception as e:
+                logger.error(f"Ошибка при выборке задания отправки: {e}", exc_info=True)
+                job_id = None
+
+            if job_id is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._process(job_id)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке задания {job_id}: {e}", exc_info=True)
+
+    async def _claim(self) -> Optional[int]:
+        """Захват следующего готового задания"""
+        # Время берется из БД: default next_attempt_at - now() сервера БД,
+        # а часовой пояс контейнера бота может отличаться
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(DeliveryJob)
+                .where(
+                    or_(
+                        DeliveryJob.status == DeliveryStatus.PENDING,
+                        DeliveryJob.status == DeliveryStatus.PROCESSING
+                    ),
+                    DeliveryJob.next_attempt_at <= func.now()
+                )
+                .order_by(DeliveryJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job = result.scalar_one_or_none()
+            if job is None:
+                return None
+
+            job.status = DeliveryStatus.PROCESSING
+            job.attempts += 1
+            job.next_attempt_at = func.now() + timedelta(seconds=self.lease)
+            await session.commit()
+            return job.id
+
+    async def _process(self, job_id: int) -> None:
+        """Генерация файла, отправка email и уведомление пользователя"""
+        # Читаем данные и сразу освобождаем соединение: генерация и SMTP идут без сессии
+        async with self.session_maker() as session:
+            job = await session.get(DeliveryJob, job_id)
+            application = await session.get(Application, job.application_id)
+            result = await session.execute(
+                select(User).where(User.telegram_id == application.user_id)
+            )
+            user = result.scalar_one()
+            participants = await load_participants(session, application)
+
+        error = None
+        try:
+            excel_data = {
+                "sport_type": application.sport_type,
+                "event_rank": application.event_rank,
+                "country": application.country,
+                "city": application.city,
+                "participants": participants,
+                "applicant": user.full_name or f"{user.first_name or ''} {user.last_name or ''}".strip()
+            }
+            content, filename = await excel_executor.render(excel_data)
+
+            subject, body = build_email(application, user, participants)
+            if not await send_email(subject=subject, body=body, attachment=content, attachment_name=filename):
+                error = "SMTP: письмо не отправлено"
+        except Exception as e:
+            logger.error(f"Ошибка при подготовке заявки #{application.id}: {e}", exc_info=True)
+            error = str(e)
+
+        async with self.session_maker() as session:
+            job = await session.get(DeliveryJob, job_id)
+            application = await session.get(Application, job.application_id)
+
+            if error is None:
+                job.status = DeliveryStatus.DONE
+                job.last_error = None
+                application.email_sent = True
+                await session.commit()
+                self.delivered += 1
+                await self._notify_user(
+                    job.chat_id,
+                    f"📧 Заявка #{application.id} отправлена на email."
+                )
+                return
+
+            job.last_error = error
+            if job.attempts >= self.max_attempts:
+                job.status = DeliveryStatus.FAILED
+                await session.commit()
+                self.failed += 1
+                logger.error(f"Заявка #{application.id} не отправлена после {job.attempts} попыток: {error}")
+                await self._notify_user(
+                    job.chat_id,
+                    f"❌ Не удалось отправить заявку #{application.id} на email.\n"
+                    "Обратитесь к администратору."
+                )
+                return
+
+            delay = retry_delay(job.attempts, self.base_delay)
+            job.status = DeliveryStatus.PENDING
+            job.next_attempt_at = func.now() + timedelta(seconds=delay)
+            await session.commit()
+            self.retried += 1
+            logger.warning(
+                f"Заявка #{application.id}: попытка {job.attempts} неудачна, повтор через {delay:.0f} с"
+            )
+
+    async def _notify_user(self, chat_id: int, text: str) -> None:
+        if self.bot is None:
+            return
+        try:
+            await self.bot.send_message(chat_id, text)
+        except Exception as e:
+            logger.error(f"Не удалось отправить уведомление пользователю {chat_id}: {e}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики отправки"""
+        return {"delivered": self.delivered, "retried": self.retried, "failed": self.failed}
+
+
+delivery_queue = DeliveryQueue(
+    workers=config.DELIVERY_WORKERS,
+    max_attempts=config.DELIVERY_MAX_ATTEMPTS,
+    base_delay=config.DELIVERY_RETRY_DELAY,
+    poll_interval=config.DELIVERY_POLL_INTERVAL
+)
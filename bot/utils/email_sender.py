@@ -1,88 +1,280 @@
-
 """
 Отправка Email
 """
+import asyncio
 import logging
 import os
+import time
+from contextlib import suppress
+from dataclasses import dataclass, field
+from email.message import Message
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
-from typing import Optional
+from typing import BinaryIO, List, Optional, Sequence, Union
 
 import aiosmtplib
+from aiosmtplib.errors import SMTPConnectError, SMTPServerDisconnected, SMTPTimeoutError
 
 from bot.config import config
 
 logger = logging.getLogger(__name__)
 
+# Ошибки, после которых соединение считается потерянным и стоит переподключиться
+RECONNECT_ERRORS = (SMTPServerDisconnected, SMTPConnectError, SMTPTimeoutError, ConnectionError)
+
+
+@dataclass
+class _PooledConnection:
+    client: aiosmtplib.SMTP
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SMTPPool:
+    """
+    Пул постоянных SMTP-соединений
+
+    Соединение после отправки возвращается в пул, и следующее письмо не
+    платит за TCP + TLS + AUTH. Перед повторным использованием соединение,
+    простоявшее дольше noop_interval, проверяется командой NOOP; соединения
+    старше max_age закрываются. При обрыве во время отправки письмо
+    повторяется один раз через новое соединение.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        max_size: int = 2,
+        max_age: float = 300.0,
+        noop_interval: float = 30.0,
+        timeout: float = 30.0
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.max_age = max_age
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._idle: List[_PooledConnection] = []
+        self.connects = 0
+        self.reuses = 0
+
+    async def _connect(self) -> _PooledConnection:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        self.connects += 1
+        return _PooledConnection(client)
+
+    async def _discard(self, conn: _PooledConnection) -> None:
+        with suppress(Exception):
+            if conn.client.is_connected:
+                await conn.client.quit()
+        conn.client.close()
+
+    async def _acquire(self) -> _PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            now = time.monotonic()
+
+            if now - conn.created_at > self.max_age or not conn.client.is_connected:
+                await self._discard(conn)
+                continue
+
+            if now - conn.last_used > self.noop_interval:
+                try:
+                    await conn.client.noop()
+                except Exception:
+                    await self._discard(conn)
+                    continue
+
+            self.reuses += 1
+            return conn
+
+        return await self._connect()
+
+    def _release(self, conn: _PooledConnection) -> None:
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    async def send(self, messages: Sequence[Message], recipients: Optional[Sequence[str]] = None) -> None:
+        """
+        Отправка одного или нескольких писем через одно соединение
+
+        Args:
+            messages: Письма
+            recipients: Получатели (если None, берутся из заголовков письма)
+        """
+        sent = 0
+        for attempt in range(2):
+            async with self._semaphore:
+                conn = await self._acquire()
+                try:
+                    while sent < len(messages):
+                        await conn.client.send_message(messages[sent], recipients=recipients)
+                        sent += 1
+                except RECONNECT_ERRORS as e:
+                    await self._discard(conn)
+                    if attempt:
+                        raise
+                    logger.warning(f"SMTP-соединение потеряно ({e}), переподключаемся")
+                    continue
+                except Exception:
+                    await self._discard(conn)
+                    raise
+
+                self._release(conn)
+                return
+
+    async def close(self) -> None:
+        """Закрытие всех соединений пула"""
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+
+smtp_pool = SMTPPool(
+    hostname=config.SMTP_HOST,
+    port=config.SMTP_PORT,
+    username=config.SMTP_USER,
+    password=config.SMTP_PASSWORD,
+    use_tls=config.SMTP_PORT == 465,  # SSL
+    start_tls=config.SMTP_PORT != 465 and config.SMTP_TLS,  # STARTTLS
+    max_size=config.SMTP_POOL_SIZE,
+    max_age=config.SMTP_MAX_AGE,
+    noop_interval=config.SMTP_NOOP_INTERVAL
+)
+
+
+Attachment = Union[bytes, BinaryIO]
+
+
+def _read_attachment(attachment: Attachment) -> bytes:
+    if isinstance(attachment, (bytes, bytearray)):
+        return bytes(attachment)
+    attachment.seek(0)
+    return attachment.read()
+
+
+def build_message(
+    subject: str,
+    body: str,
+    attachment_path: Optional[str] = None,
+    to_email: Optional[Union[str, Sequence[str]]] = None,
+    attachment: Optional[Attachment] = None,
+    attachment_name: Optional[str] = None
+) -> MIMEMultipart:
+    """
+    Формирование письма
+
+    Args:
+        subject: Тема письма
+        body: Текст письма
+        attachment_path: Путь к файлу для прикрепления
+        to_email: Email получателя или список получателей (если None, берется из конфига)
+        attachment: Содержимое вложения (bytes или BytesIO) вместо файла на диске
+        attachment_name: Имя вложения для attachment
+
+    Returns:
+        MIMEMultipart: Письмо
+    """
+    if to_email and not isinstance(to_email, str):
+        to_email = ", ".join(to_email)
+
+    message = MIMEMultipart()
+    message["From"] = config.SMTP_FROM
+    message["To"] = to_email or config.EMAIL_TO
+    message["Subject"] = subject
+
+    # Добавляем текст
+    message.attach(MIMEText(body, "plain", "utf-8"))
+
+    # Добавляем вложение
+    content = None
+    if attachment is not None:
+        content = _read_attachment(attachment)
+        filename = attachment_name or "attachment"
+    elif attachment_path and os.path.exists(attachment_path):
+        with open(attachment_path, "rb") as f:
+            content = f.read()
+        filename = os.path.basename(attachment_path)
+
+    if content is not None:
+        part = MIMEApplication(content)
+        part.add_header(
+            "Content-Disposition",
+            "attachment",
+            filename=filename
+        )
+        message.attach(part)
+
+    return message
+
+
+async def send_messages(messages: Sequence[Message], pool: Optional[SMTPPool] = None) -> bool:
+    """
+    Пакетная отправка писем через одну SMTP-сессию
+
+    Args:
+        messages: Письма (получатели берутся из заголовков To/Cc/Bcc)
+        pool: Пул соединений (по умолчанию общий для процесса)
+
+    Returns:
+        bool: Успешно ли отправлены все письма
+    """
+    try:
+        await (pool or smtp_pool).send(messages)
+        logger.info(f"Отправлено писем: {len(messages)}")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при отправке email: {e}", exc_info=True)
+        return False
+
 
 async def send_email(
     subject: str,
     body: str,
     attachment_path: Optional[str] = None,
-    to_email: Optional[str] = None
+    to_email: Optional[Union[str, Sequence[str]]] = None,
+    attachment: Optional[Attachment] = None,
+    attachment_name: Optional[str] = None
 ) -> bool:
     """
     Отправка email
-    
+
     Args:
         subject: Тема письма
         body: Текст письма
         attachment_path: Путь к файлу для прикрепления
-        to_email: Email получателя (если None, берется из конфига)
-        
+        to_email: Email получателя или список получателей (если None, берется из конфига)
+        attachment: Содержимое вложения (bytes или BytesIO) вместо файла на диске
+        attachment_name: Имя вложения для attachment
+
     Returns:
         bool: Успешно ли отправлено
     """
+    logger.info(f"Отправка email: {subject}")
+
     try:
-        logger.info(f"Отправка email: {subject}")
-        
-        # Создаем сообщение
-        message = MIMEMultipart()
-        message["From"] = config.SMTP_FROM
-        message["To"] = to_email or config.EMAIL_TO
-        message["Subject"] = subject
-        
-        # Добавляем текст
-        message.attach(MIMEText(body, "plain", "utf-8"))
-        
-        # Добавляем вложение
-        if attachment_path and os.path.exists(attachment_path):
-            with open(attachment_path, "rb") as f:
-                attachment = MIMEApplication(f.read())
-                filename = os.path.basename(attachment_path)
-                attachment.add_header(
-                    "Content-Disposition",
-                    "attachment",
-                    filename=filename
-                )
-                message.attach(attachment)
-        
-        # Отправляем
-        if config.SMTP_PORT == 465:
-            # SSL
-            await aiosmtplib.send(
-                message,
-                hostname=config.SMTP_HOST,
-                port=config.SMTP_PORT,
-                username=config.SMTP_USER,
-                password=config.SMTP_PASSWORD,
-                use_tls=True
-            )
-        else:
-            # STARTTLS
-            await aiosmtplib.send(
-                message,
-                hostname=config.SMTP_HOST,
-                port=config.SMTP_PORT,
-                username=config.SMTP_USER,
-                password=config.SMTP_PASSWORD,
-                start_tls=True
-            )
-        
-        logger.info("Email успешно отправлен")
-        return True
-        
+        message = build_message(subject, body, attachment_path, to_email, attachment, attachment_name)
     except Exception as e:
-        logger.error(f"Ошибка при отправке email: {e}", exc_info=True)
+        logger.error(f"Ошибка при формировании email: {e}", exc_info=True)
         return False
+
+    return await send_messages([message])
@@ -0,0 +1,161 @@
+"""
+Исполнитель генерации Excel вне event loop
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+from bot.config import config
+from .excel_generator import generate_excel_bytes, template_renderer
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_worker() -> None:
+    """Инициализация процесса: шаблон разбирается до первой заявки"""
+    if config.EXCEL_RENDERER == "template":
+        template_renderer.snapshot
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class ExcelRenderExecutor:
+    """
+    Генерация Excel в пуле процессов или потоков
+
+    openpyxl занимает CPU и держит GIL, поэтому в режиме process книги
+    собираются в отдельных процессах и параллельно используют ядра.
+    Процессы запускаются заранее (start) и разбирают шаблон при старте.
+    Семафор ограничивает число одновременных генераций; заявки сверх
+    лимита ждут своей очереди, глубина очереди видна в get_stats().
+    Если процесс пула аварийно завершился, пул пересоздается, а
+    генерация повторяется один раз.
+    """
+
+    def __init__(self, mode: str = "process", workers: int = 2, max_concurrent: Optional[int] = None):
+        self.mode = mode
+        self.workers = workers
+        self.max_concurrent = max_concurrent or workers
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.active = 0
+        self.max_waiting = 0
+        self.rendered = 0
+        self.failed = 0
+        self.restarts = 0
+        self.wait_time = 0.0
+        self.render_time = 0.0
+
+    def _create_executor(self) -> Executor:
+        if self.mode == "process":
+            # spawn: дочерний процесс не наследует потоки и состояние event loop
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+            )
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="excel")
+
+    async def start(self) -> None:
+        """Запуск пула и прогрев всех воркеров"""
+        if self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        await asyncio.gather(*(loop.run_in_executor(self._executor, _ping) for _ in range(self.workers)))
+        logger.info(
+            f"Пул генерации Excel ({self.mode}, воркеров: {self.workers}) "
+            f"запущен за {(time.perf_counter() - start) * 1000:.0f} мс"
+        )
+
+    def _restart(self, broken: Executor) -> None:
+        """Замена сломанного пула (одна на все генерации, получившие ошибку)"""
+        if self._executor is not broken:
+            return
+        logger.warning("Процесс пула генерации Excel аварийно завершился, пул пересоздается")
+        self._executor = self._create_executor()
+        self.restarts += 1
+        broken.shutdown(wait=False)
+
+    async def render(self, application_data: Dict) -> Tuple[bytes, str]:
+        """
+        Генерация книги заявки
+
+        Returns:
+            Tuple[bytes, str]: Содержимое файла и имя для вложения
+        """
+        if self._executor is None:
+            await self.start()
+
+        queued_at = time.perf_counter()
+        if self._semaphore.locked():
+            # Все слоты заняты: заявка встает в очередь
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await self._semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        started_at = time.perf_counter()
+        self.wait_time += started_at - queued_at
+        self.active += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._executor
+            try:
+                result = await loop.run_in_executor(executor, generate_excel_bytes, application_data)
+            except BrokenProcessPool:
+                self._restart(executor)
+                result = await loop.run_in_executor(self._executor, generate_excel_bytes, application_data)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+            self.render_time += time.perf_counter() - started_at
+            self._semaphore.release()
+
+        self.rendered += 1
+        return result
+
+    async def shutdown(self) -> None:
+        """Остановка пула (ожидает завершения начатых генераций)"""
+        if self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Глубина очереди и счетчики генерации"""
+        done = self.rendered + self.failed
+        return {
+            "waiting": self.waiting,
+            "active": self.active,
+            "max_waiting": self.max_waiting,
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "restarts": self.restarts,
+            "avg_wait_ms": round(self.wait_time / done * 1000, 1) if done else 0.0,
+            "avg_render_ms": round(self.render_time / done * 1000, 1) if done else 0.0
+        }
+
+
+excel_executor = ExcelRenderExecutor(
+    mode=config.EXCEL_EXECUTOR,
+    workers=config.EXCEL_WORKERS,
+    max_concurrent=config.EXCEL_MAX_CONCURRENT
+)
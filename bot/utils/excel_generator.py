@@ -1,169 +1,465 @@
 """
-Генератор Excel файлов (упрощенная версия)
+Генератор Excel файлов
 """
+import io
 import logging
 import os
-from typing import Dict, List
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import Cell, MergedCell
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
+from openpyxl.styles.cell_style import StyleArray
+from openpyxl.utils.indexed_list import IndexedList
+from openpyxl.worksheet.merge import MergedCellRange
+from openpyxl.workbook.workbook import Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 
+from bot.config import config
+
 logger = logging.getLogger(__name__)
 
+# Стили создаются один раз и используются всеми ячейками всех файлов
+HEADER_FONT = Font(name='Arial', size=12, bold=True)
+NORMAL_FONT = Font(name='Arial', size=11)
+TITLE_FONT = Font(name='Arial', size=14, bold=True)
+HEADER_FILL = PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid")
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+CENTER = Alignment(horizontal='center', vertical='center')
 
-def generate_excel(application_data: Dict, output_dir: str = "/tmp") -> str:
-    """
-    Генерация Excel файла с упрощенной структурой
-    
-    Args:
-        application_data: Данные заявки
-        output_dir: Директория для сохранения файла
-        
-    Returns:
-        str: Путь к сгенерированному файлу
-    """
-    logger.info("Начинаем генерацию Excel файла (упрощенная версия)")
-    
-    # Генерируем имя выходного файла
+PARTICIPANT_HEADERS = ['№', 'ФИО участника', 'Дата начала', 'Дата окончания']
+COLUMN_WIDTHS = {'A': 8, 'B': 40, 'C': 15, 'D': 15, 'E': 12, 'F': 12}
+APPLICATION_FIELDS = (
+    ("Вид спорта:", "sport_type"),
+    ("Ранг мероприятия:", "event_rank"),
+    ("Страна:", "country"),
+    ("Город:", "city")
+)
+
+
+def excel_filename(application_data: Dict) -> str:
+    """Имя файла заявки"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     city = application_data.get('city', 'Unknown').replace('/', '_')
-    output_filename = f"Заявка_{city}_{timestamp}.xlsx"
-    output_path = os.path.join(output_dir, output_filename)
-    
-    # Создаем новую книгу
+    return f"Заявка_{city}_{timestamp}.xlsx"
+
+
+def _write_participants_table(ws: Worksheet, participants: List[Dict], current_row: int) -> int:
+    """Таблица участников упрощенного формата, возвращает следующую свободную строку"""
+    for col_idx, header in enumerate(PARTICIPANT_HEADERS, start=1):
+        cell = ws.cell(row=current_row, column=col_idx, value=header)
+        cell.font = HEADER_FONT
+        cell.fill = HEADER_FILL
+        cell.alignment = CENTER
+        cell.border = THIN_BORDER
+
+    current_row += 1
+
+    for idx, participant in enumerate(participants, start=1):
+        values = (
+            idx,
+            participant.get("full_name", ""),
+            participant.get("date_from", ""),
+            participant.get("date_to", "")
+        )
+        for col_idx, value in enumerate(values, start=1):
+            cell = ws.cell(row=current_row, column=col_idx, value=value)
+            cell.font = NORMAL_FONT
+            cell.border = THIN_BORDER
+            if col_idx != 2:
+                cell.alignment = CENTER
+        current_row += 1
+
+    return current_row
+
+
+def build_simple_workbook(application_data: Dict) -> Workbook:
+    """Книга упрощенного формата (заголовок, поля заявки, таблица участников)"""
     wb = openpyxl.Workbook()
     ws: Worksheet = wb.active
     ws.title = "Заявка на СМ"
-    
-    # Настройка стилей
-    header_font = Font(name='Arial', size=12, bold=True)
-    normal_font = Font(name='Arial', size=11)
-    title_font = Font(name='Arial', size=14, bold=True)
-    
-    header_fill = PatternFill(start_color="CCE5FF", end_color="CCE5FF", fill_type="solid")
-    
-    thin_border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
+
     # Заголовок
     ws['A1'] = "ЗАЯВКА НА СЛУЖЕБНУЮ ПОЕЗДКУ"
-    ws['A1'].font = title_font
-    ws['A1'].alignment = Alignment(horizontal='center', vertical='center')
+    ws['A1'].font = TITLE_FONT
+    ws['A1'].alignment = CENTER
     ws.merge_cells('A1:F1')
-    
+
     # Дата создания
     current_row = 2
     ws[f'A{current_row}'] = f"Дата подачи: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-    ws[f'A{current_row}'].font = normal_font
-    
+    ws[f'A{current_row}'].font = NORMAL_FONT
+
     # Основная информация
     current_row += 2
-    
-    # Вид спорта
-    ws[f'A{current_row}'] = "Вид спорта:"
-    ws[f'A{current_row}'].font = header_font
-    ws[f'A{current_row}'].fill = header_fill
-    ws[f'B{current_row}'] = application_data.get("sport_type", "")
-    ws[f'B{current_row}'].font = normal_font
-    ws.merge_cells(f'B{current_row}:F{current_row}')
-    current_row += 1
-    
-    # Ранг мероприятия
-    ws[f'A{current_row}'] = "Ранг мероприятия:"
-    ws[f'A{current_row}'].font = header_font
-    ws[f'A{current_row}'].fill = header_fill
-    ws[f'B{current_row}'] = application_data.get("event_rank", "")
-    ws[f'B{current_row}'].font = normal_font
-    ws.merge_cells(f'B{current_row}:F{current_row}')
-    current_row += 1
-    
-    # Страна
-    ws[f'A{current_row}'] = "Страна:"
-    ws[f'A{current_row}'].font = header_font
-    ws[f'A{current_row}'].fill = header_fill
-    ws[f'B{current_row}'] = application_data.get("country", "")
-    ws[f'B{current_row}'].font = normal_font
-    ws.merge_cells(f'B{current_row}:F{current_row}')
+    for label, key in APPLICATION_FIELDS:
+        ws[f'A{current_row}'] = label
+        ws[f'A{current_row}'].font = HEADER_FONT
+        ws[f'A{current_row}'].fill = HEADER_FILL
+        ws[f'B{current_row}'] = application_data.get(key, "")
+        ws[f'B{current_row}'].font = NORMAL_FONT
+        ws.merge_cells(f'B{current_row}:F{current_row}')
+        current_row += 1
     current_row += 1
-    
-    # Город
-    ws[f'A{current_row}'] = "Город:"
-    ws[f'A{current_row}'].font = header_font
-    ws[f'A{current_row}'].fill = header_fill
-    ws[f'B{current_row}'] = application_data.get("city", "")
-    ws[f'B{current_row}'].font = normal_font
-    ws.merge_cells(f'B{current_row}:F{current_row}')
-    current_row += 2
-    
+
     # Таблица участников
     ws[f'A{current_row}'] = "СПИСОК УЧАСТНИКОВ"
-    ws[f'A{current_row}'].font = header_font
-    ws[f'A{current_row}'].alignment = Alignment(horizontal='center', vertical='center')
+    ws[f'A{current_row}'].font = HEADER_FONT
+    ws[f'A{current_row}'].alignment = CENTER
     ws.merge_cells(f'A{current_row}:F{current_row}')
     current_row += 1
-    
-    # Заголовки таблицы
-    headers = ['№', 'ФИО участника', 'Дата начала', 'Дата окончания']
-    for col_idx, header in enumerate(headers, start=1):
-        cell = ws.cell(row=current_row, column=col_idx)
-        cell.value = header
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = thin_border
-    
-    current_row += 1
-    
-    # Заполняем участников
-    participants: List[Dict] = application_data.get("participants", [])
-    
-    for idx, participant in enumerate(participants, start=1):
-        # Номер
-        cell = ws.cell(row=current_row, column=1)
-        cell.value = idx
-        cell.font = normal_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = thin_border
-        
-        # ФИО
-        cell = ws.cell(row=current_row, column=2)
-        cell.value = participant.get("full_name", "")
-        cell.font = normal_font
-        cell.border = thin_border
-        
-        # Дата начала
-        cell = ws.cell(row=current_row, column=3)
-        cell.value = participant.get("date_from", "")
-        cell.font = normal_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = thin_border
-        
-        # Дата окончания
-        cell = ws.cell(row=current_row, column=4)
-        cell.value = participant.get("date_to", "")
-        cell.font = normal_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = thin_border
-        
-        current_row += 1
-    
+
+    _write_participants_table(ws, application_data.get("participants", []), current_row)
+
     # Настройка ширины колонок
-    ws.column_dimensions['A'].width = 8
-    ws.column_dimensions['B'].width = 40
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 12
-    
-    # Сохраняем файл
-    wb.save(output_path)
+    for letter, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[letter].width = width
+
+    return wb
+
+
+def _styled_cell(ws, value: Any, font=None, fill=None, alignment=None, border=None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    if alignment is not None:
+        cell.alignment = alignment
+    if border is not None:
+        cell.border = border
+    return cell
+
+
+def iter_participant_rows(ws, participants: Iterable[Dict], start: int = 1) -> Iterator[List[WriteOnlyCell]]:
+    """Строки таблицы участников для write-only листа (формат build_simple_workbook)"""
+    for idx, participant in enumerate(participants, start=start):
+        yield [
+            _styled_cell(ws, idx, NORMAL_FONT, alignment=CENTER, border=THIN_BORDER),
+            _styled_cell(ws, participant.get("full_name", ""), NORMAL_FONT, border=THIN_BORDER),
+            _styled_cell(ws, participant.get("date_from", ""), NORMAL_FONT, alignment=CENTER, border=THIN_BORDER),
+            _styled_cell(ws, participant.get("date_to", ""), NORMAL_FONT, alignment=CENTER, border=THIN_BORDER)
+        ]
+
+
+def participant_header_row(ws) -> List[WriteOnlyCell]:
+    """Заголовок таблицы участников для write-only листа"""
+    return [
+        _styled_cell(ws, header, HEADER_FONT, HEADER_FILL, CENTER, THIN_BORDER)
+        for header in PARTICIPANT_HEADERS
+    ]
+
+
+def stream_simple_workbook(
+    application_data: Dict,
+    participants: Iterable[Dict],
+    output: Union[str, BinaryIO]
+) -> int:
+    """
+    Потоковая запись книги упрощенного формата
+
+    Используется write-only режим openpyxl: строки записываются во
+    временный файл по мере получения из итератора, поэтому память не
+    растет с числом участников. Разметка совпадает с build_simple_workbook.
+
+    Args:
+        application_data: Данные заявки (поле participants игнорируется)
+        participants: Итератор участников
+        output: Путь или файловый объект для сохранения
+
+    Returns:
+        int: Количество записанных участников
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Заявка на СМ")
+
+    # Ширина колонок задается до первой строки
+    for letter, width in COLUMN_WIDTHS.items():
+        ws.column_dimensions[letter].width = width
+
+    ws.append([_styled_cell(ws, "ЗАЯВКА НА СЛУЖЕБНУЮ ПОЕЗДКУ", TITLE_FONT, alignment=CENTER)])
+    ws.merged_cells.add("A1:F1")
+    ws.append([_styled_cell(ws, f"Дата подачи: {datetime.now().strftime('%d.%m.%Y %H:%M')}", NORMAL_FONT)])
+    ws.append([])
+
+    current_row = 4
+    for label, key in APPLICATION_FIELDS:
+        ws.append([
+            _styled_cell(ws, label, HEADER_FONT, HEADER_FILL),
+            _styled_cell(ws, application_data.get(key, ""), NORMAL_FONT)
+        ])
+        ws.merged_cells.add(f"B{current_row}:F{current_row}")
+        current_row += 1
+    ws.append([])
+    current_row += 1
+
+    ws.append([_styled_cell(ws, "СПИСОК УЧАСТНИКОВ", HEADER_FONT, alignment=CENTER)])
+    ws.merged_cells.add(f"A{current_row}:F{current_row}")
+
+    ws.append(participant_header_row(ws))
+
+    count = 0
+    for row in iter_participant_rows(ws, participants):
+        ws.append(row)
+        count += 1
+
+    wb.save(output)
     wb.close()
-    
-    logger.info(f"Excel файл успешно создан (упрощенная версия): {output_path}")
+    return count
+
+
+@dataclass(frozen=True)
+class _CellSpec:
+    row: int
+    column: int
+    value: Any
+    style: Optional[Tuple[int, ...]]  # Индексы в таблицах стилей снимка
+    merged: bool
+
+
+@dataclass(frozen=True)
+class TemplateSnapshot:
+    """Неизменяемый разобранный лист шаблона"""
+    title: str
+    cells: Tuple[_CellSpec, ...]
+    merged: Tuple[str, ...]
+    columns: Tuple[Tuple[str, int, int, Optional[float]], ...]
+    rows: Tuple[Tuple[int, float], ...]
+    orientation: Optional[str]
+    paper_size: Optional[int]
+    print_area: Optional[str]
+    # Таблицы стилей книги шаблона
+    fonts: Tuple[Any, ...]
+    fills: Tuple[Any, ...]
+    borders: Tuple[Any, ...]
+    alignments: Tuple[Any, ...]
+    protections: Tuple[Any, ...]
+    number_formats: Tuple[Any, ...]
+
+
+class TemplateRenderer:
+    """
+    Заполнение шаблона config.TEMPLATE_FILE ("Версия для печати")
+
+    Шаблон читается и разбирается один раз в неизменяемый снимок: значения
+    ячеек, индексы стилей и сами таблицы стилей книги. Для каждой заявки
+    новая книга собирается из снимка: таблицы стилей подставляются целиком,
+    а ячейкам присваиваются готовые индексы, так что объекты стилей не
+    создаются и не хешируются заново. Повторная загрузка xlsx или
+    copy.deepcopy книги заметно медленнее (и deepcopy теряет таблицы стилей).
+    Снимок опирается на внутреннее устройство openpyxl 3.1 (см. requirements.txt).
+
+    В форме 30 строк для участников (две колонки по 15). Если участников
+    больше, полный список добавляется отдельным листом.
+    """
+
+    SHEET_NAME = "Версия для печати"
+    SLOTS_PER_COLUMN = 15
+    FIRST_SLOT_ROW = 10
+    # (номер, ФИО, дата с, дата по) для левой и правой половины формы
+    SLOT_COLUMNS = ((1, 2, 4, 5), (6, 7, 9, 10))
+    FIELD_CELLS = {
+        "sport_type": "D5",
+        "city": "I5",
+        "event_rank": "D7",
+        "country": "I7",
+        "applicant": "E50",
+        "date": "I50"
+    }
+
+    def __init__(self, template_path: str):
+        self.template_path = template_path
+        self._snapshot: Optional[TemplateSnapshot] = None
+
+    @property
+    def capacity(self) -> int:
+        """Количество участников, помещающихся в форму"""
+        return self.SLOTS_PER_COLUMN * len(self.SLOT_COLUMNS)
+
+    @property
+    def snapshot(self) -> TemplateSnapshot:
+        """Разобранный шаблон (загружается при первом обращении)"""
+        if self._snapshot is None:
+            self._snapshot = self._parse()
+        return self._snapshot
+
+    def _parse(self) -> TemplateSnapshot:
+        logger.info(f"Загрузка шаблона Excel: {self.template_path}")
+        wb = openpyxl.load_workbook(self.template_path)
+        ws = wb[self.SHEET_NAME]
+
+        cells = tuple(
+            _CellSpec(
+                row=cell.row,
+                column=cell.column,
+                value=None if isinstance(cell, MergedCell) else cell.value,
+                style=tuple(cell._style) if cell._style is not None else None,
+                merged=isinstance(cell, MergedCell)
+            )
+            for row in ws.iter_rows()
+            for cell in row
+        )
+        snapshot = TemplateSnapshot(
+            title=ws.title,
+            cells=cells,
+            merged=tuple(str(rng) for rng in ws.merged_cells.ranges),
+            columns=tuple(
+                (letter, dim.min, dim.max, dim.width)
+                for letter, dim in ws.column_dimensions.items()
+            ),
+            rows=tuple(
+                (idx, dim.height)
+                for idx, dim in ws.row_dimensions.items()
+                if dim.height
+            ),
+            orientation=ws.page_setup.orientation,
+            paper_size=ws.page_setup.paperSize,
+            print_area=ws.print_area.split("!")[-1] if ws.print_area else None,
+            fonts=tuple(wb._fonts),
+            fills=tuple(wb._fills),
+            borders=tuple(wb._borders),
+            alignments=tuple(wb._alignments),
+            protections=tuple(wb._protections),
+            number_formats=tuple(wb._number_formats)
+        )
+        wb.close()
+        return snapshot
+
+    def _clone(self) -> Tuple[Workbook, Worksheet]:
+        snapshot = self.snapshot
+        wb = openpyxl.Workbook()
+        wb._fonts = IndexedList(snapshot.fonts)
+        wb._fills = IndexedList(snapshot.fills)
+        wb._borders = IndexedList(snapshot.borders)
+        wb._alignments = IndexedList(snapshot.alignments)
+        wb._protections = IndexedList(snapshot.protections)
+        wb._number_formats = IndexedList(snapshot.number_formats)
+
+        ws: Worksheet = wb.active
+        ws.title = snapshot.title
+
+        for spec in snapshot.cells:
+            if spec.merged:
+                cell = MergedCell(ws, row=spec.row, column=spec.column)
+            else:
+                cell = Cell(ws, row=spec.row, column=spec.column, value=spec.value)
+            if spec.style is not None:
+                cell._style = StyleArray(spec.style)
+            ws._cells[(spec.row, spec.column)] = cell
+
+        for rng in snapshot.merged:
+            ws.merged_cells.add(MergedCellRange(ws, rng))
+        for letter, min_col, max_col, width in snapshot.columns:
+            dim = ws.column_dimensions[letter]
+            dim.min, dim.max = min_col, max_col
+            if width:
+                dim.width = width
+        for idx, height in snapshot.rows:
+            ws.row_dimensions[idx].height = height
+
+        ws.page_setup.orientation = snapshot.orientation
+        ws.page_setup.paperSize = snapshot.paper_size
+        if snapshot.print_area:
+            ws.print_area = snapshot.print_area
+
+        return wb, ws
+
+    def build_workbook(self, application_data: Dict) -> Workbook:
+        """Книга по шаблону с подставленными данными заявки"""
+        wb, ws = self._clone()
+
+        values = dict(application_data)
+        values.setdefault("date", datetime.now().strftime('%d.%m.%Y'))
+        for key, coordinate in self.FIELD_CELLS.items():
+            if values.get(key):
+                ws[coordinate] = values[key]
+
+        participants: List[Dict] = application_data.get("participants", [])
+        for idx, participant in enumerate(participants[:self.capacity]):
+            half, slot = divmod(idx, self.SLOTS_PER_COLUMN)
+            _, name_col, from_col, to_col = self.SLOT_COLUMNS[half]
+            row = self.FIRST_SLOT_ROW + slot
+            ws.cell(row=row, column=name_col, value=participant.get("full_name", ""))
+            ws.cell(row=row, column=from_col, value=participant.get("date_from", ""))
+            ws.cell(row=row, column=to_col, value=participant.get("date_to", ""))
+
+        if len(participants) > self.capacity:
+            extra = wb.create_sheet("Список участников")
+            _write_participants_table(extra, participants, 1)
+            for letter, width in COLUMN_WIDTHS.items():
+                extra.column_dimensions[letter].width = width
+
+        return wb
+
+
+template_renderer = TemplateRenderer(config.TEMPLATE_FILE)
+
+
+def build_workbook(application_data: Dict) -> Workbook:
+    """Книга заявки в формате, выбранном config.EXCEL_RENDERER"""
+    if config.EXCEL_RENDERER == "template":
+        return template_renderer.build_workbook(application_data)
+    return build_simple_workbook(application_data)
+
+
+def write_excel(application_data: Dict, output: Union[str, BinaryIO]) -> None:
+    """
+    Запись книги заявки в файл или файловый объект
+
+    Args:
+        application_data: Данные заявки
+        output: Путь или файловый объект (например, BytesIO)
+    """
+    participants = application_data.get("participants", [])
+
+    if config.EXCEL_RENDERER == "simple" and len(participants) >= config.EXCEL_STREAMING_THRESHOLD:
+        # Большие делегации пишем потоково, чтобы не держать всю книгу в памяти
+        logger.info(f"Начинаем потоковую генерацию Excel файла ({len(participants)} участников)")
+        stream_simple_workbook(application_data, participants, output)
+    else:
+        logger.info(f"Начинаем генерацию Excel файла ({config.EXCEL_RENDERER})")
+        wb = build_workbook(application_data)
+        wb.save(output)
+        wb.close()
+
+
+def generate_excel_bytes(application_data: Dict) -> Tuple[bytes, str]:
+    """
+    Генерация Excel файла в памяти, без записи на диск
+
+    Args:
+        application_data: Данные заявки
+
+    Returns:
+        Tuple[bytes, str]: Содержимое файла и имя для вложения
+    """
+    buffer = io.BytesIO()
+    write_excel(application_data, buffer)
+    filename = excel_filename(application_data)
+    logger.info(f"Excel файл сформирован в памяти: {filename} ({buffer.tell()} байт)")
+    return buffer.getvalue(), filename
+
+
+def generate_excel(application_data: Dict, output_dir: str = "/tmp") -> str:
+    """
+    Генерация Excel файла на диске
+
+    Args:
+        application_data: Данные заявки
+        output_dir: Директория для сохранения файла
+
+    Returns:
+        str: Путь к сгенерированному файлу
+    """
+    output_path = os.path.join(output_dir, excel_filename(application_data))
+    write_excel(application_data, output_path)
+    logger.info(f"Excel файл успешно создан: {output_path}")
     return output_path
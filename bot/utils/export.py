@@ -0,0 +1,256 @@
+"""
+Выгрузка заявок и участников в XLSX или CSV для администраторов
+"""
+import asyncio
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, BinaryIO, List, Optional, Sequence, Tuple
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import config
+from bot.database.models import Application, ApplicationStatus, Participant
+from bot.database.participants import format_date, parse_date
+from .excel_generator import CENTER, COLUMN_WIDTHS, HEADER_FILL, HEADER_FONT, NORMAL_FONT, THIN_BORDER, _styled_cell
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("xlsx", "csv")
+
+# Строк, получаемых с сервера за одну выборку курсора
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_HEADERS = (
+    "№ заявки", "Статус", "Дата подачи", "Вид спорта", "Ранг мероприятия", "Страна", "Город",
+    "№", "ФИО участника", "Дата начала", "Дата окончания"
+)
+EXPORT_COLUMN_WIDTHS = (10, 12, 17, 25, 25, 18, 18, 6, COLUMN_WIDTHS['B'], 14, 14)
+# Колонки, выравниваемые по центру (остальные - текст)
+_CENTERED = {0, 1, 2, 7, 9, 10}
+
+
+@dataclass(frozen=True)
+class ExportFilter:
+    """Условия выгрузки: период подачи (включительно), статусы и формат файла"""
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    statuses: Tuple[ApplicationStatus, ...] = ()
+    fmt: str = "xlsx"
+
+    @property
+    def filename(self) -> str:
+        """Имя файла выгрузки"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return f"Заявки_{timestamp}.{self.fmt}"
+
+
+def parse_export_args(args: Sequence[str]) -> ExportFilter:
+    """
+    Разбор аргументов /export в любом порядке
+
+    Даты ДД.ММ.ГГГГ (первая - начало периода, вторая - конец),
+    статусы (submitted, approved, ...) и формат (xlsx или csv).
+
+    Raises:
+        ValueError: Нераспознанный аргумент (текст для пользователя)
+    """
+    dates: List[date] = []
+    statuses: List[ApplicationStatus] = []
+    fmt = "xlsx"
+
+    for arg in args:
+        value = arg.lower()
+        if value in EXPORT_FORMATS:
+            fmt = value
+        elif value in ApplicationStatus._value2member_map_:
+            statuses.append(ApplicationStatus(value))
+        elif parse_date(arg) is not None and len(dates) < 2:
+            dates.append(parse_date(arg))
+        else:
+            raise ValueError(f"Не удалось разобрать аргумент: {arg}")
+
+    date_from = dates[0] if dates else None
+    date_to = dates[1] if len(dates) > 1 else None
+    if date_from and date_to and date_from > date_to:
+        raise ValueError("Дата начала периода позже даты окончания")
+
+    return ExportFilter(date_from=date_from, date_to=date_to, statuses=tuple(statuses), fmt=fmt)
+
+
+def _filtered(query: Select, export_filter: ExportFilter) -> Select:
+    """Условия фильтра; без статусов выгружаются все заявки, кроме черновиков"""
+    submitted_at = func.coalesce(Application.submitted_at, Application.created_at)
+    if export_filter.statuses:
+        query = query.where(Application.status.in_(export_filter.statuses))
+    else:
+        query = query.where(Application.status != ApplicationStatus.DRAFT)
+    if export_filter.date_from:
+        query = query.where(submitted_at >= export_filter.date_from)
+    if export_filter.date_to:
+        query = query.where(submitted_at < export_filter.date_to + timedelta(days=1))
+    return query
+
+
+def _application_columns() -> Tuple:
+    return (
+        Application.id,
+        Application.status,
+        func.coalesce(Application.submitted_at, Application.created_at).label("submitted_at"),
+        Application.sport_type,
+        Application.event_rank,
+        Application.country,
+        Application.city
+    )
+
+
+def _application_values(row) -> Tuple:
+    return (
+        row.id,
+        row.status.value,
+        row.submitted_at.strftime("%d.%m.%Y %H:%M") if row.submitted_at else "",
+        row.sport_type,
+        row.event_rank,
+        row.country,
+        row.city
+    )
+
+
+async def iter_export_rows(session: AsyncSession, export_filter: ExportFilter) -> AsyncIterator[Tuple]:
+    """
+    Строки выгрузки: по строке на участника (заявка без участников - одна строка)
+
+    Результат читается серверным курсором порциями по EXPORT_BATCH_SIZE,
+    поэтому память не зависит от числа заявок.
+    """
+    if config.PARTICIPANTS_STORAGE == "jsonb":
+        query = _filtered(select(*_application_columns(), Application.participants_data), export_filter)
+        query = query.order_by(Application.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        result = await session.stream(query)
+        async for row in result:
+            values = _application_values(row)
+            participants = (row.participants_data or {}).get("participants", [])
+            if not participants:
+                yield values + (None, "", "", "")
+            for idx, participant in enumerate(participants, start=1):
+                yield values + (
+                    idx,
+                    participant.get("full_name", ""),
+                    participant.get("date_from", ""),
+                    participant.get("date_to", "")
+                )
+        return
+
+    query = _filtered(
+        select(
+            *_application_columns(),
+            Participant.order_num,
+            Participant.full_name,
+            Participant.date_from,
+            Participant.date_to
+        ).outerjoin(Participant, Participant.application_id == Application.id),
+        export_filter
+    )
+    query = query.order_by(Application.id, Participant.order_num).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    result = await session.stream(query)
+    async for row in result:
+        yield _application_values(row) + (
+            row.order_num,
+            row.full_name or "",
+            format_date(row.date_from),
+            format_date(row.date_to)
+        )
+
+
+async def _batches(rows: AsyncIterator[Tuple]) -> AsyncIterator[List[Tuple]]:
+    """Строки выгрузки порциями по EXPORT_BATCH_SIZE"""
+    batch: List[Tuple] = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _append_xlsx(ws, batch: List[Tuple]) -> None:
+    for row in batch:
+        ws.append([
+            _styled_cell(ws, value, NORMAL_FONT, alignment=CENTER if idx in _CENTERED else None, border=THIN_BORDER)
+            for idx, value in enumerate(row)
+        ])
+
+
+def _save_xlsx(wb, output: BinaryIO) -> None:
+    wb.save(output)
+    wb.close()
+
+
+async def _write_xlsx(rows: AsyncIterator[Tuple], output: BinaryIO) -> int:
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Заявки")
+    for idx, width in enumerate(EXPORT_COLUMN_WIDTHS):
+        ws.column_dimensions[get_column_letter(idx + 1)].width = width
+
+    ws.append([_styled_cell(ws, header, HEADER_FONT, HEADER_FILL, CENTER, THIN_BORDER) for header in EXPORT_HEADERS])
+
+    count = 0
+    async for batch in _batches(rows):
+        await asyncio.to_thread(_append_xlsx, ws, batch)
+        count += len(batch)
+
+    # Сборка zip-архива книги - самая долгая часть, тоже вне event loop
+    await asyncio.to_thread(_save_xlsx, wb, output)
+    return count
+
+
+def _append_csv(writer, batch: List[Tuple]) -> None:
+    writer.writerows(["" if value is None else value for value in row] for row in batch)
+
+
+async def _write_csv(rows: AsyncIterator[Tuple], output: BinaryIO) -> int:
+    # utf-8-sig и ";" - чтобы Excel открывал файл без мастера импорта
+    text = io.TextIOWrapper(output, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text, delimiter=";")
+    writer.writerow(EXPORT_HEADERS)
+
+    count = 0
+    async for batch in _batches(rows):
+        await asyncio.to_thread(_append_csv, writer, batch)
+        count += len(batch)
+
+    await asyncio.to_thread(text.flush)
+    text.detach()
+    return count
+
+
+async def write_export(session: AsyncSession, export_filter: ExportFilter, output: BinaryIO) -> int:
+    """
+    Потоковая запись выгрузки в файловый объект
+
+    XLSX пишется в write-only режиме openpyxl, CSV - построчно,
+    так что ни результат запроса, ни книга целиком в памяти не держатся.
+    Форматирование и запись строк идут порциями в отдельном потоке
+    (asyncio.to_thread), чтобы большая выгрузка не блокировала event loop.
+
+    Args:
+        session: Сессия БД
+        export_filter: Условия выгрузки
+        output: Двоичный файловый объект (временный файл или BytesIO)
+
+    Returns:
+        int: Количество записанных строк (без заголовка)
+    """
+    rows = iter_export_rows(session, export_filter)
+    if export_filter.fmt == "csv":
+        count = await _write_csv(rows, output)
+    else:
+        count = await _write_xlsx(rows, output)
+    logger.info(f"Выгрузка {export_filter.fmt}: {count} строк")
+    return count
@@ -0,0 +1,59 @@
+"""
+Защита от повторной обработки одного и того же действия
+"""
+import hashlib
+import json
+from typing import Dict, Hashable, Set
+
+# Поля данных FSM, определяющие содержание заявки
+SUBMISSION_FIELDS = ("draft_id", "sport_type", "event_rank", "country", "city", "participants")
+
+
+def submission_key(user_id: int, message_id: int, data: Dict) -> str:
+    """
+    Ключ идемпотентности подтверждения заявки
+
+    Повторное нажатие кнопки и повтор callback от Telegram приходят с
+    тем же сообщением подтверждения и теми же данными FSM, а значит с
+    тем же ключом. Новая подача тех же данных проходит через новое
+    сообщение подтверждения и получает другой ключ.
+
+    Returns:
+        str: sha256 в hex (64 символа)
+    """
+    snapshot = {field: data.get(field) for field in SUBMISSION_FIELDS}
+    payload = json.dumps([user_id, message_id, snapshot], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class InFlightGuard:
+    """
+    Ключи действий, которые сейчас выполняются в этом процессе
+
+    Проверка и захват идут без await, поэтому из двух одновременных
+    обработчиков ключ получит только один. Между процессами дубликаты
+    отсекает уникальное ограничение в БД.
+    """
+
+    def __init__(self):
+        self._keys: Set[Hashable] = set()
+
+    def acquire(self, key: Hashable) -> bool:
+        """Захват ключа; False, если действие с этим ключом уже выполняется"""
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        return True
+
+    def release(self, key: Hashable) -> None:
+        self._keys.discard(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# Подтверждения заявок, обрабатываемые сейчас (ключ - Telegram ID пользователя)
+submit_guard = InFlightGuard()
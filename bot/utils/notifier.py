@@ -0,0 +1,176 @@
+"""
+Рассылка уведомлений с учетом лимитов Telegram
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+)
+
+from bot.config import config
+from .rate_limit import KeyedBuckets, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BroadcastResult:
+    """Итог рассылки"""
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0  # Пользователь заблокировал бота или удалил чат
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+
+class NotificationDispatcher:
+    """
+    Параллельная отправка сообщений в пределах лимитов Telegram
+
+    Две корзины токенов: общая (global_rate сообщений в секунду на бота)
+    и отдельная на каждый чат (chat_rate). Семафор ограничивает число
+    одновременных запросов. На TelegramRetryAfter обе корзины ставятся
+    на паузу на указанное время и отправка повторяется; сетевые и
+    серверные ошибки повторяются с нарастающей паузой.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 25.0,
+        chat_rate: float = 1.0,
+        max_concurrent: int = 10,
+        max_retries: int = 3
+    ):
+        self.global_bucket = TokenBucket(global_rate, capacity=global_rate)
+        self.chat_buckets = KeyedBuckets(chat_rate, capacity=1.0)
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.sent = 0
+        self.failed = 0
+        self.blocked = 0
+        self.retried = 0
+        self.flood_waits = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Создается в работающем event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def _send_once(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> None:
+        await self.chat_buckets.get(chat_id).acquire()
+        await self.global_bucket.acquire()
+        async with self.semaphore:
+            await bot.send_message(chat_id, text, **kwargs)
+
+    async def send(self, bot: Bot, chat_id: int, text: str, **kwargs: Any) -> Optional[bool]:
+        """
+        Отправка одного сообщения с повторами
+
+        Returns:
+            Optional[bool]: True - отправлено, False - ошибка,
+            None - бот заблокирован пользователем
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._send_once(bot, chat_id, text, **kwargs)
+                self.sent += 1
+                return True
+            except TelegramRetryAfter as e:
+                self.flood_waits += 1
+                logger.warning(f"Flood wait {e.retry_after} с при отправке в чат {chat_id}")
+                self.global_bucket.pause(e.retry_after)
+                self.chat_buckets.get(chat_id).pause(e.retry_after)
+            except TelegramForbiddenError:
+                self.blocked += 1
+                logger.info(f"Чат {chat_id} недоступен: бот заблокирован или удален")
+                return None
+            except TelegramBadRequest as e:
+                self.failed += 1
+                logger.error(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                return False
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Ошибка отправки в чат {chat_id} (попытка {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+            if attempt < self.max_retries:
+                self.retried += 1
+
+        self.failed += 1
+        logger.error(f"Сообщение в чат {chat_id} не отправлено за {self.max_retries + 1} попыток")
+        return False
+
+    async def broadcast(self, bot: Bot, chat_ids: Iterable[int], text: str, **kwargs: Any) -> BroadcastResult:
+        """
+        Отправка сообщения во все чаты (в пределах лимитов)
+
+        Чаты разбирают max_concurrent воркеров: каждый берет следующий чат,
+        только отправив предыдущий, поэтому токены списываются перед самым
+        запросом, и flood wait задерживает все еще не отправленные сообщения.
+        """
+        result = BroadcastResult()
+        pending = iter(set(chat_ids))
+
+        async def worker() -> None:
+            for chat_id in pending:
+                sent = await self.send(bot, chat_id, text, **kwargs)
+                if sent is True:
+                    result.sent += 1
+                elif sent is None:
+                    result.blocked += 1
+                else:
+                    result.failed += 1
+
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrent)))
+        self.chat_buckets.prune()
+        return result
+
+    def spawn(self, coro) -> asyncio.Task:
+        """Фоновая задача рассылки; ссылка хранится до завершения"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def shutdown(self, timeout: float = 10.0) -> None:
+        """Ожидание фоновых рассылок, незавершенные за timeout отменяются"""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"Отменено незавершенных рассылок: {len(pending)}")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики отправки"""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "retried": self.retried,
+            "flood_waits": self.flood_waits,
+            "background": len(self._tasks)
+        }
+
+
+notifier = NotificationDispatcher(
+    global_rate=config.NOTIFY_GLOBAL_RATE,
+    chat_rate=config.NOTIFY_CHAT_RATE,
+    max_concurrent=config.NOTIFY_MAX_CONCURRENT
+)
+
+
+async def notify_admins(bot: Bot, text: str, **kwargs: Any) -> BroadcastResult:
+    """Уведомление всех администраторов"""
+    return await notifier.broadcast(bot, config.ADMIN_IDS, text, **kwargs)
@@ -0,0 +1,158 @@
+"""
+Импорт участников из файла XLSX или CSV
+"""
+import csv
+import io
+import logging
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import openpyxl
+
+from .validators import validate_participant
+
+logger = logging.getLogger(__name__)
+
+IMPORT_EXTENSIONS = (".xlsx", ".csv")
+
+# В скольких первых строках искать заголовок таблицы (в форме заявки он в 10-й строке)
+HEADER_SEARCH_ROWS = 15
+
+# Подстроки заголовков колонок (в нижнем регистре)
+COLUMN_KEYWORDS = {
+    "full_name": ("фио", "участник", "full_name", "name"),
+    "date_from": ("начал", "date_from", "from", "дата с"),
+    "date_to": ("оконч", "date_to", "дата по")
+}
+
+
+@dataclass
+class ImportResult:
+    """Итог разбора файла"""
+    participants: List[Dict] = field(default_factory=list)
+    errors: List[Tuple[int, str, str]] = field(default_factory=list)  # (строка файла, значения, ошибка)
+    truncated: bool = False  # Строки после max_rows не разбирались
+
+
+def _cell_text(value: Any) -> str:
+    """Значение ячейки как строка (даты Excel - в ДД.ММ.ГГГГ)"""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%d.%m.%Y")
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _find_columns(row: Sequence[str]) -> Optional[Dict[str, int]]:
+    """Номера колонок по заголовку; None, если строка не похожа на заголовок"""
+    columns = {}
+    for idx, title in enumerate(row):
+        title = title.lower()
+        for key, keywords in COLUMN_KEYWORDS.items():
+            if key not in columns and any(keyword in title for keyword in keywords):
+                columns[key] = idx
+                break
+    return columns if len(columns) == 3 else None
+
+
+def _xlsx_rows(content: bytes) -> Iterator[List[str]]:
+    # read_only: строки читаются из XML по мере обхода, книга целиком в памяти не строится
+    wb = openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(values_only=True):
+            yield [_cell_text(value) for value in row]
+    finally:
+        wb.close()
+
+
+def _csv_rows(content: bytes) -> Iterator[List[str]]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        # Excel под Windows сохраняет CSV в cp1251
+        text = content.decode("cp1251")
+
+    try:
+        delimiter = csv.Sniffer().sniff(text[:4096], delimiters=";,\t").delimiter
+    except csv.Error:
+        delimiter = ";"
+
+    for row in csv.reader(io.StringIO(text), delimiter=delimiter):
+        yield [value.strip() for value in row]
+
+
+def parse_rows(rows: Iterable[List[str]], max_rows: int) -> ImportResult:
+    """
+    Разбор строк таблицы в участников
+
+    Колонки определяются по заголовку среди первых HEADER_SEARCH_ROWS
+    непустых строк (строки над ним - шапка документа); если заголовка
+    нет, колонки идут в порядке ФИО, дата начала, дата окончания.
+    После max_rows строк с участниками разбор останавливается.
+    """
+    result = ImportResult()
+    numbered = ((row_num, row) for row_num, row in enumerate(rows, 1) if any(row))
+
+    head = list(islice(numbered, HEADER_SEARCH_ROWS))
+    columns = {"full_name": 0, "date_from": 1, "date_to": 2}
+    for idx, (_, row) in enumerate(head):
+        header = _find_columns(row)
+        if header is not None:
+            columns = header
+            head = head[idx + 1:]
+            break
+
+    for count, (row_num, row) in enumerate(chain(head, numbered)):
+        if count >= max_rows:
+            result.truncated = True
+            break
+
+        values = [row[columns[key]] if columns[key] < len(row) else "" for key in ("full_name", "date_from", "date_to")]
+        participant, error_msg = validate_participant(*values)
+        if participant is None:
+            result.errors.append((row_num, "; ".join(values), error_msg))
+        else:
+            result.participants.append(participant)
+
+    return result
+
+
+def parse_participants_file(content: bytes, filename: str, max_rows: int) -> ImportResult:
+    """
+    Разбор файла участников (синхронно, вызывается вне event loop)
+
+    Args:
+        content: Содержимое файла
+        filename: Имя файла (формат определяется по расширению)
+        max_rows: Максимум строк с участниками
+
+    Raises:
+        ValueError: Неподдерживаемый или поврежденный файл
+    """
+    name = filename.lower()
+    if name.endswith(".csv"):
+        rows = _csv_rows(content)
+    elif name.endswith(".xlsx"):
+        rows = _xlsx_rows(content)
+    else:
+        raise ValueError("Поддерживаются файлы .xlsx и .csv")
+
+    try:
+        result = parse_rows(rows, max_rows)
+    except Exception as e:
+        # openpyxl, zipfile и csv бросают разные исключения на поврежденных файлах
+        logger.warning(f"Ошибка разбора файла {filename}: {e}")
+        raise ValueError("Не удалось прочитать файл") from e
+    finally:
+        # Освобождаем книгу, даже если разбор остановлен на max_rows
+        rows.close()
+
+    logger.info(
+        f"Импорт участников из {filename}: {len(result.participants)} добавлено, "
+        f"{len(result.errors)} с ошибками{', обрезан' if result.truncated else ''}"
+    )
+    return result
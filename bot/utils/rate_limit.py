@@ -0,0 +1,93 @@
+"""
+Ограничение частоты: token bucket
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Hashable
+
+
+class TokenBucket:
+    """
+    Token bucket: rate токенов в секунду, не больше capacity подряд
+
+    Токен списывается только тогда, когда он есть: ожидающий acquire()
+    после сна проверяет корзину заново, поэтому пауза (pause), наступившая
+    во время ожидания, задерживает и его. Проверка и списание идут без
+    await, поэтому корутины одного event loop не гонятся за токены.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def wait_time(self) -> float:
+        """Сколько секунд до появления токена (токен не списывается)"""
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """Списание токена, только если он есть сейчас"""
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Пауза: следующий токен появится не раньше чем через seconds"""
+        self._refill()
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+    @property
+    def idle(self) -> bool:
+        """Корзина полна: ее состояние можно забыть без потери ограничения"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        """Ожидание токена"""
+        while not self.try_acquire():
+            await asyncio.sleep(self.wait_time())
+
+
+class KeyedBuckets:
+    """
+    Отдельная корзина на ключ (чат, пользователь)
+
+    Полные корзины удаляются при превышении max_size: для ключа без
+    корзины создается новая полная, что ничем не отличается.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, max_size: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        self._clock = clock
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+
+    def get(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_size:
+                self.prune()
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity, self._clock)
+        return bucket
+
+    def prune(self) -> int:
+        """Удаление полных корзин, возвращает число удаленных"""
+        idle = [key for key, bucket in self._buckets.items() if bucket.idle]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
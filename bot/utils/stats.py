@@ -0,0 +1,148 @@
+"""
+Сводная статистика заявок для администраторов
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import extract, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import config
+from bot.database.models import Application, ApplicationStatus, User, UserStatus
+
+logger = logging.getLogger(__name__)
+
+# Строк в разбивках по виду спорта, стране и направлениям
+TOP_LIMIT = 10
+# Месяцев в разбивке по подаче
+MONTHS_LIMIT = 12
+
+
+@dataclass(frozen=True)
+class ApplicationStats:
+    """Снимок агрегатов по заявкам и пользователям"""
+    by_status: Dict[ApplicationStatus, int] = field(default_factory=dict)
+    users_by_status: Dict[UserStatus, int] = field(default_factory=dict)
+    by_sport: List[Tuple[str, int]] = field(default_factory=list)
+    by_country: List[Tuple[str, int]] = field(default_factory=list)
+    by_month: List[Tuple[int, int, int]] = field(default_factory=list)  # (год, месяц, заявок)
+    top_destinations: List[Tuple[str, str, int]] = field(default_factory=list)  # (страна, город, заявок)
+    collected_at: float = 0.0
+
+    @property
+    def submitted_total(self) -> int:
+        """Поданных заявок (все, кроме черновиков)"""
+        return sum(count for status, count in self.by_status.items() if status != ApplicationStatus.DRAFT)
+
+
+async def collect_stats(session: AsyncSession) -> ApplicationStats:
+    """
+    Подсчет статистики запросами GROUP BY
+
+    ORM-объекты не загружаются: каждый запрос возвращает не более
+    TOP_LIMIT / MONTHS_LIMIT строк. Разбивки, кроме разбивки по
+    статусам, учитывают только поданные заявки.
+    """
+    count = func.count(Application.id).label("count")
+    submitted = Application.status != ApplicationStatus.DRAFT
+
+    by_status = await session.execute(select(Application.status, count).group_by(Application.status))
+    users_by_status = await session.execute(
+        select(User.status, func.count(User.id)).group_by(User.status)
+    )
+    by_sport = await session.execute(
+        select(Application.sport_type, count)
+        .where(submitted)
+        .group_by(Application.sport_type)
+        .order_by(count.desc(), Application.sport_type)
+        .limit(TOP_LIMIT)
+    )
+    by_country = await session.execute(
+        select(Application.country, count)
+        .where(submitted)
+        .group_by(Application.country)
+        .order_by(count.desc(), Application.country)
+        .limit(TOP_LIMIT)
+    )
+
+    submitted_at = func.coalesce(Application.submitted_at, Application.created_at)
+    year = extract("year", submitted_at).label("year")
+    month = extract("month", submitted_at).label("month")
+    by_month = await session.execute(
+        select(year, month, count)
+        .where(submitted)
+        .group_by(year, month)
+        .order_by(year.desc(), month.desc())
+        .limit(MONTHS_LIMIT)
+    )
+    top_destinations = await session.execute(
+        select(Application.country, Application.city, count)
+        .where(submitted)
+        .group_by(Application.country, Application.city)
+        .order_by(count.desc(), Application.country, Application.city)
+        .limit(TOP_LIMIT)
+    )
+
+    return ApplicationStats(
+        by_status=dict(by_status.all()),
+        users_by_status=dict(users_by_status.all()),
+        by_sport=[tuple(row) for row in by_sport],
+        by_country=[tuple(row) for row in by_country],
+        by_month=[(int(row.year), int(row.month), row.count) for row in by_month],
+        top_destinations=[tuple(row) for row in top_destinations],
+        collected_at=time.monotonic()
+    )
+
+
+class StatsCache:
+    """
+    Кэш статистики с коротким временем жизни
+
+    Повторные нажатия администраторов в пределах ttl не пересчитывают
+    агрегаты, а одновременные запросы после истечения ttl ждут один
+    общий пересчет.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self._stats: Optional[ApplicationStats] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self) -> Optional[ApplicationStats]:
+        if self._stats is not None and time.monotonic() - self._stats.collected_at < self.ttl:
+            return self._stats
+        return None
+
+    async def get(self, session: AsyncSession) -> ApplicationStats:
+        """Статистика из кэша или пересчитанная"""
+        stats = self._fresh()
+        if stats is not None:
+            self.hits += 1
+            return stats
+
+        async with self._lock:
+            # Пока ждали блокировку, статистику мог пересчитать другой запрос
+            stats = self._fresh()
+            if stats is not None:
+                self.hits += 1
+                return stats
+
+            self.misses += 1
+            started = time.perf_counter()
+            stats = await collect_stats(session)
+            logger.debug(f"Статистика заявок пересчитана за {(time.perf_counter() - started) * 1000:.1f} мс")
+            if self.ttl > 0:
+                self._stats = stats
+            return stats
+
+    def clear(self) -> None:
+        """Сброс кэша"""
+        self._stats = None
+
+
+stats_cache = StatsCache(ttl=config.STATS_CACHE_TTL)
@@ -3,10 +3,10 @@
 Отправка в Telegram чат
 """
 import logging
-from typing import Optional
+from typing import BinaryIO, Optional, Union
 
 from aiogram import Bot
-from aiogram.types import FSInputFile
+from aiogram.types import BufferedInputFile, FSInputFile
 
 from bot.config import config
 
@@ -17,7 +17,9 @@ async def send_to_telegram(
     bot: Bot,
     message: str,
     attachment_path: Optional[str] = None,
-    chat_id: Optional[int] = None
+    chat_id: Optional[int] = None,
+    attachment: Optional[Union[bytes, BinaryIO]] = None,
+    attachment_name: Optional[str] = None
 ) -> bool:
     """
     Отправка сообщения в Telegram чат
@@ -27,6 +29,8 @@ async def send_to_telegram(
         message: Текст сообщения
         attachment_path: Путь к файлу для прикрепления
         chat_id: ID чата (если None, берется из конфига)
+        attachment: Содержимое файла (bytes или BytesIO) вместо файла на диске
+        attachment_name: Имя файла для attachment
         
     Returns:
         bool: Успешно ли отправлено
@@ -35,9 +39,15 @@ async def send_to_telegram(
         target_chat_id = chat_id or config.TARGET_CHAT_ID
         logger.info(f"Отправка сообщения в Telegram чат: {target_chat_id}")
         
-        if attachment_path:
+        if attachment is not None or attachment_path:
             # Отправляем с файлом
-            document = FSInputFile(attachment_path)
+            if attachment is not None:
+                if not isinstance(attachment, (bytes, bytearray)):
+                    attachment.seek(0)
+                    attachment = attachment.read()
+                document = BufferedInputFile(bytes(attachment), filename=attachment_name or "attachment")
+            else:
+                document = FSInputFile(attachment_path)
             await bot.send_document(
                 chat_id=target_chat_id,
                 document=document,
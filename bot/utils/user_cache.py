@@ -0,0 +1,242 @@
+"""
+Кэш статусов пользователей для проверки доступа
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import config
+from bot.database.models import User, UserStatus
+
+logger = logging.getLogger(__name__)
+
+# Канал PostgreSQL, в который пишутся ID пользователей с измененным статусом
+USER_CACHE_CHANNEL = "user_cache_invalidate"
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Снимок данных пользователя, необходимых обработчикам"""
+    telegram_id: int
+    status: UserStatus
+    is_admin: bool
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    full_name: Optional[str] = None
+    organization: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, user: User) -> "CachedUser":
+        """Создание снимка из ORM-модели"""
+        return cls(
+            telegram_id=user.telegram_id,
+            status=user.status,
+            is_admin=bool(user.is_admin),
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            full_name=user.full_name,
+            organization=user.organization
+        )
+
+
+class UserAccessCache:
+    """
+    In-process кэш пользователей с ограничением по времени жизни и размеру
+
+    Записи вытесняются по принципу LRU при превышении max_size.
+    Каждая инвалидация увеличивает поколение кэша: загрузка, начатая
+    до инвалидации, не сможет записать устаревшие данные. Изменения,
+    сделанные другими процессами бота, доставляет UserCacheListener.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[float, CachedUser]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        """Текущее поколение кэша"""
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        """Получение пользователя из кэша (None, если нет или устарел)"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: CachedUser, generation: Optional[int] = None) -> None:
+        """Сохранение пользователя в кэш"""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        if generation is not None and generation != self._generation:
+            # Пока шла загрузка, запись была инвалидирована
+            return
+
+        self._entries[user.telegram_id] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(user.telegram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Удаление пользователя из кэша"""
+        self._generation += 1
+        self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        """Полная очистка кэша"""
+        self._generation += 1
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserCacheListener:
+    """
+    Инвалидация кэша по изменениям из других процессов бота
+
+    Слушает канал USER_CACHE_CHANNEL (LISTEN/NOTIFY PostgreSQL) на
+    отдельном соединении asyncpg, не занимая соединение из пула.
+    Уведомления, отправленные, пока соединения не было, теряются,
+    поэтому при каждом (пере)подключении кэш очищается целиком.
+    """
+
+    def __init__(self, cache: UserAccessCache, dsn: str, reconnect_delay: float = 5.0):
+        self.cache = cache
+        self.dsn = dsn
+        self.reconnect_delay = reconnect_delay
+        self._task: Optional[asyncio.Task] = None
+        self.received = 0
+        self.reconnects = 0
+
+    async def start(self) -> None:
+        """Запуск прослушивания канала"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка прослушивания"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        self.received += 1
+        try:
+            self.cache.invalidate(int(payload))
+        except ValueError:
+            self.cache.clear()
+
+    async def _run(self) -> None:
+        while True:
+            closed = asyncio.Event()
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(USER_CACHE_CHANNEL, self._on_notify)
+                # Все, что изменилось до подписки, могло быть пропущено
+                self.cache.clear()
+                await closed.wait()
+                logger.warning("Соединение инвалидации кэша пользователей потеряно")
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning(f"Нет соединения для инвалидации кэша пользователей: {e}")
+            finally:
+                if connection is not None:
+                    await connection.close()
+
+            self.reconnects += 1
+            await asyncio.sleep(self.reconnect_delay)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики уведомлений"""
+        return {"received": self.received, "reconnects": self.reconnects}
+
+
+user_cache = UserAccessCache(
+    ttl=config.USER_CACHE_TTL,
+    max_size=config.USER_CACHE_MAX_SIZE
+)
+
+user_cache_listener = UserCacheListener(user_cache, config.DATABASE_URL)
+
+
+async def publish_user_change(session: AsyncSession, user_id: int) -> None:
+    """
+    Оповещение всех процессов бота об изменении пользователя
+
+    Вызывается до commit: NOTIFY транзакционный и уходит только при
+    фиксации изменений, так что другой процесс не перечитает старый статус.
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        await session.execute(select(func.pg_notify(USER_CACHE_CHANNEL, str(user_id))))
+
+
+async def get_cached_user(user_id: int, session: AsyncSession, fresh: bool = False) -> Optional[CachedUser]:
+    """
+    Получение пользователя через кэш
+
+    Args:
+        user_id: Telegram ID пользователя
+        session: Сессия БД (используется только при промахе кэша)
+        fresh: Прочитать из БД в обход кэша (перед записью в БД)
+
+    Returns:
+        Optional[CachedUser]: Снимок пользователя или None, если не найден
+    """
+    if not fresh:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+    generation = user_cache.generation
+    result = await session.execute(
+        select(User).where(User.telegram_id == user_id)
+    )
+    user = result.scalar_one_or_none()
+
+    if not user:
+        # Незарегистрированных не кэшируем: /start должен сразу увидеть нового пользователя
+        return None
+
+    cached = CachedUser.from_model(user)
+    user_cache.put(cached, generation)
+    return cached
+
+
+async def check_user_access(
+    user_id: int,
+    session: AsyncSession,
+    fresh: bool = False
+) -> Tuple[bool, Optional[CachedUser]]:
+    """Проверка доступа пользователя (fresh - по текущему статусу в БД)"""
+    user = await get_cached_user(user_id, session, fresh)
+
+    if not user or user.status != UserStatus.APPROVED:
+        return False, user
+
+    return True, user
@@ -4,7 +4,10 @@
 """
 import re
 from datetime import datetime
-from typing import Tuple
+from typing import Dict, List, Optional, Tuple
+
+# Разделитель полей в строке списка участников: ФИО; ДД.ММ.ГГГГ; ДД.ММ.ГГГГ
+PARTICIPANT_FIELDS_SEPARATOR = ";"
 
 
 def validate_date(date_str: str) -> Tuple[bool, str]:
@@ -125,3 +128,74 @@ def validate_text(text: str, min_length: int = 1, max_length: int = 500) -> Tupl
         return False, f"Текст не должен превышать {max_length} символов"
     
     return True, ""
+
+
+def parse_participant_line(line: str) -> Tuple[Optional[Dict], str]:
+    """
+    Разбор строки «ФИО; ДД.ММ.ГГГГ; ДД.ММ.ГГГГ»
+    
+    Args:
+        line: Строка списка участников
+        
+    Returns:
+        Tuple[Optional[Dict], str]: (участник в формате данных FSM или None, сообщение об ошибке)
+    """
+    parts = [part.strip() for part in line.split(PARTICIPANT_FIELDS_SEPARATOR)]
+    if len(parts) != 3:
+        return None, "Нужно три поля через «;»: ФИО; дата начала; дата окончания"
+    
+    return validate_participant(*parts)
+
+
+def validate_participant(full_name: str, date_from: str, date_to: str) -> Tuple[Optional[Dict], str]:
+    """
+    Валидация участника из списка или файла
+    
+    Args:
+        full_name: ФИО
+        date_from: Дата начала (ДД.ММ.ГГГГ)
+        date_to: Дата окончания (ДД.ММ.ГГГГ)
+        
+    Returns:
+        Tuple[Optional[Dict], str]: (участник в формате данных FSM или None, сообщение об ошибке)
+    """
+    date_from, date_to = date_from.strip(), date_to.strip()
+    
+    is_valid, error_msg = validate_full_name(full_name)
+    if not is_valid:
+        return None, error_msg
+    
+    is_valid, error_msg = validate_date_range(date_from, date_to)
+    if not is_valid:
+        return None, error_msg
+    
+    return {"full_name": ' '.join(full_name.split()), "date_from": date_from, "date_to": date_to}, ""
+
+
+def parse_participants_batch(text: str) -> Tuple[List[Dict], List[Tuple[int, str, str]]]:
+    """
+    Разбор списка участников, по одному на строку
+    
+    Все строки проверяются за один проход, пустые строки пропускаются.
+    
+    Args:
+        text: Текст сообщения
+        
+    Returns:
+        Tuple[List[Dict], List[Tuple[int, str, str]]]: (корректные участники,
+        ошибки в виде (номер строки, строка, сообщение об ошибке))
+    """
+    participants = []
+    errors = []
+    
+    for line_num, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        
+        participant, error_msg = parse_participant_line(line)
+        if participant is None:
+            errors.append((line_num, line.strip(), error_msg))
+        else:
+            participants.append(participant)
+    
+    return participants, errors
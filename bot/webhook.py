@@ -0,0 +1,193 @@
+"""
+Режим webhook: aiohttp-сервер с ограниченной очередью обновлений
+"""
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Прием обновлений от Telegram через webhook
+
+    Запрос проверяется по секретному токену и ставится в ограниченную
+    очередь, ответ 200 отдается сразу. Обновления обрабатывают workers
+    воркеров. При переполнении очереди отвечаем 503, и Telegram
+    повторит доставку позже. При остановке новые обновления не
+    принимаются, а уже принятые дообрабатываются (не дольше drain_timeout).
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: str = "",
+        queue_size: int = 1000,
+        workers: int = 20,
+        drain_timeout: float = 30.0
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.workers = workers
+        self.drain_timeout = drain_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self._accepting = False
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def create_app(self) -> web.Application:
+        """Создание aiohttp-приложения"""
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Прием обновления"""
+        if self.secret_token:
+            received_token = request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received_token, self.secret_token):
+                return web.Response(status=401)
+
+        if not self._accepting:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Некорректное обновление в webhook: {e}")
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Очередь обновлений переполнена, Telegram повторит доставку")
+            return web.Response(status=503)
+
+        self.received += 1
+        return web.Response()
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка при обработке обновления {update.update_id}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    async def start(self) -> None:
+        """Запуск воркеров"""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._accepting = True
+
+    async def stop(self) -> None:
+        """Остановка с дообработкой очереди"""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Не дообработано обновлений при остановке: {self.queue.qsize()}")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _on_startup(self, app: web.Application) -> None:
+        await self.start()
+
+    async def _on_shutdown(self, app: web.Application) -> None:
+        await self.stop()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Счетчики webhook-сервера"""
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "queue_depth": self.queue.qsize()
+        }
+
+
+async def wait_for_stop_signal(signals=(signal.SIGTERM, signal.SIGINT)) -> None:
+    """Ожидание сигнала остановки (docker stop шлет SIGTERM)"""
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    registered = []
+    for sig in signals:
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+            registered.append(sig)
+        except NotImplementedError:
+            # Windows: остается остановка по KeyboardInterrupt
+            pass
+
+    try:
+        await stop_event.wait()
+        logger.info("Получен сигнал остановки")
+    finally:
+        for sig in registered:
+            loop.remove_signal_handler(sig)
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, allowed_updates: Optional[List[str]] = None) -> None:
+    """Запуск бота в режиме webhook"""
+    server = WebhookServer(
+        dp,
+        bot,
+        path=config.WEBHOOK_PATH,
+        secret_token=config.WEBHOOK_SECRET,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+        workers=config.WEBHOOK_WORKERS,
+        drain_timeout=config.WEBHOOK_DRAIN_TIMEOUT
+    )
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+
+    await dp.emit_startup(bot=bot)
+    try:
+        await site.start()
+        logger.info(f"Webhook-сервер слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+
+        if config.WEBHOOK_URL:
+            await bot.set_webhook(
+                url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                secret_token=config.WEBHOOK_SECRET or None,
+                allowed_updates=allowed_updates
+            )
+        else:
+            # Локальный режим: обновления можно отправлять POST-запросами вручную
+            logger.warning("WEBHOOK_URL не задан, webhook в Telegram не регистрируется")
+
+        # По сигналу runner.cleanup() вызовет WebhookServer.stop(): принятые
+        # обновления (уже подтвержденные Telegram ответом 200) дообрабатываются
+        await wait_for_stop_signal()
+    finally:
+        # Webhook не удаляем: другие экземпляры продолжают принимать обновления,
+        # а при рестарте Telegram дождется возврата сервера
+        await runner.cleanup()
+        logger.info(f"Статистика webhook: {server.get_stats()}")
+        await dp.emit_shutdown(bot=bot)
@@ -0,0 +1,125 @@
+"""initial schema
+
+Базовая схема, которую раньше создавал Base.metadata.create_all.
+Таблицы, уже существующие в БД, пропускаются, поэтому миграция
+применяется и к новой, и к ранее развернутой базе.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 10:57:11
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'fsm_storage' not in existing:
+        op.create_table('fsm_storage',
+            sa.Column('key', sa.String(length=255), nullable=False),
+            sa.Column('state', sa.String(length=255), nullable=True),
+            sa.Column('data', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('key')
+        )
+        op.create_index(op.f('ix_fsm_storage_updated_at'), 'fsm_storage', ['updated_at'], unique=False)
+
+    if 'users' not in existing:
+        op.create_table('users',
+            sa.Column('id', sa.BigInteger(), nullable=False),
+            sa.Column('telegram_id', sa.BigInteger(), nullable=False),
+            sa.Column('username', sa.String(length=255), nullable=True),
+            sa.Column('first_name', sa.String(length=255), nullable=True),
+            sa.Column('last_name', sa.String(length=255), nullable=True),
+            sa.Column('full_name', sa.String(length=500), nullable=True),
+            sa.Column('organization', sa.String(length=500), nullable=True),
+            sa.Column('status', sa.Enum('PENDING', 'APPROVED', 'REJECTED', 'REVOKED', name='userstatus'), nullable=False),
+            sa.Column('is_admin', sa.Boolean(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_users_telegram_id'), 'users', ['telegram_id'], unique=True)
+
+    if 'applications' not in existing:
+        op.create_table('applications',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('sport_type', sa.String(length=255), nullable=False),
+            sa.Column('event_rank', sa.String(length=255), nullable=False),
+            sa.Column('country', sa.String(length=255), nullable=False),
+            sa.Column('city', sa.String(length=255), nullable=False),
+            sa.Column('participants_data', sa.JSON(), nullable=False),
+            sa.Column('status', sa.Enum('DRAFT', 'SUBMITTED', 'PROCESSING', 'APPROVED', 'REJECTED', name='applicationstatus'), nullable=False),
+            sa.Column('excel_file_path', sa.String(length=500), nullable=True),
+            sa.Column('email_sent', sa.Boolean(), nullable=False),
+            sa.Column('telegram_sent', sa.Boolean(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('submitted_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'drafts' not in existing:
+        op.create_table('drafts',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.BigInteger(), nullable=False),
+            sa.Column('draft_data', sa.JSON(), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=True),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.telegram_id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'delivery_jobs' not in existing:
+        op.create_table('delivery_jobs',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('application_id', sa.Integer(), nullable=False),
+            sa.Column('chat_id', sa.BigInteger(), nullable=False),
+            sa.Column('status', sa.Enum('PENDING', 'PROCESSING', 'DONE', 'FAILED', name='deliverystatus'), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+            sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_delivery_jobs_next_attempt_at'), 'delivery_jobs', ['next_attempt_at'], unique=False)
+
+    if 'participants' not in existing:
+        op.create_table('participants',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('application_id', sa.Integer(), nullable=False),
+            sa.Column('full_name', sa.String(length=500), nullable=False),
+            sa.Column('date_from', sa.String(length=20), nullable=False),
+            sa.Column('date_to', sa.String(length=20), nullable=False),
+            sa.Column('order_num', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['application_id'], ['applications.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('participants')
+    op.drop_index(op.f('ix_delivery_jobs_next_attempt_at'), table_name='delivery_jobs')
+    op.drop_table('delivery_jobs')
+    op.drop_table('drafts')
+    op.drop_table('applications')
+    op.drop_index(op.f('ix_users_telegram_id'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_fsm_storage_updated_at'), table_name='fsm_storage')
+    op.drop_table('fsm_storage')
+    for enum_name in ('deliverystatus', 'applicationstatus', 'userstatus'):
+        op.execute(f'DROP TYPE IF EXISTS {enum_name}')
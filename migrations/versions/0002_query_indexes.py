@@ -0,0 +1,32 @@
+"""query indexes
+
+Индексы под запросы обработчиков: история и черновики пользователя,
+участники заявки, пользователи по статусу.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:57:30
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_applications_user_created', 'applications', ['user_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_applications_user_status_updated', 'applications', ['user_id', 'status', 'updated_at', 'id'], unique=False)
+    op.create_index(op.f('ix_participants_application_id'), 'participants', ['application_id'], unique=False)
+    op.create_index(op.f('ix_users_status'), 'users', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_status'), table_name='users')
+    op.drop_index(op.f('ix_participants_application_id'), table_name='participants')
+    op.drop_index('ix_applications_user_status_updated', table_name='applications')
+    op.drop_index('ix_applications_user_created', table_name='applications')
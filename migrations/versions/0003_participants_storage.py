@@ -0,0 +1,90 @@
+"""participants storage
+
+applications.participants_data переводится в JSONB (допускает NULL) с
+GIN-индексом, и участники всех заявок переносятся в режим
+PARTICIPANTS_STORAGE: rows - только таблица participants, jsonb - только
+participants_data. Для смены режима на рабочей базе:
+python -m bot.database.participants --to <режим>.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 11:20:04
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# SQL переноса зафиксирован здесь, чтобы миграция не зависела от будущих изменений кода
+TO_ROWS_SQL = (
+    """
+    DELETE FROM participants
+    WHERE application_id IN (SELECT id FROM applications WHERE participants_data IS NOT NULL)
+    """,
+    """
+    INSERT INTO participants (application_id, full_name, date_from, date_to, order_num)
+    SELECT a.id, e.item->>'full_name', e.item->>'date_from', e.item->>'date_to', e.idx
+    FROM applications a
+    CROSS JOIN LATERAL jsonb_array_elements(
+        COALESCE(a.participants_data->'participants', '[]'::jsonb)
+    ) WITH ORDINALITY AS e(item, idx)
+    WHERE a.participants_data IS NOT NULL
+    """,
+    "UPDATE applications SET participants_data = NULL WHERE participants_data IS NOT NULL"
+)
+
+TO_JSONB_SQL = (
+    """
+    UPDATE applications a
+    SET participants_data = jsonb_build_object('participants', p.items)
+    FROM (
+        SELECT application_id,
+               jsonb_agg(
+                   jsonb_build_object('full_name', full_name, 'date_from', date_from, 'date_to', date_to)
+                   ORDER BY order_num
+               ) AS items
+        FROM participants
+        GROUP BY application_id
+    ) p
+    WHERE p.application_id = a.id
+    """,
+    """UPDATE applications SET participants_data = '{"participants": []}'::jsonb WHERE participants_data IS NULL""",
+    "DELETE FROM participants"
+)
+
+
+def upgrade() -> None:
+    op.alter_column('applications', 'participants_data',
+        existing_type=postgresql.JSON(astext_type=sa.Text()),
+        type_=postgresql.JSONB(astext_type=sa.Text()),
+        postgresql_using='participants_data::jsonb',
+        nullable=True)
+    op.create_index('ix_applications_participants_data', 'applications', ['participants_data'], unique=False,
+        postgresql_using='gin', postgresql_ops={'participants_data': 'jsonb_path_ops'})
+
+    target = os.getenv("PARTICIPANTS_STORAGE", "rows").lower()
+    for statement in (TO_JSONB_SQL if target == "jsonb" else TO_ROWS_SQL):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    # Возврат к двойной записи: заполняем и JSON, и таблицу
+    op.execute(TO_JSONB_SQL[0])
+    op.execute(TO_JSONB_SQL[1])
+    op.execute(TO_ROWS_SQL[0])
+    op.execute(TO_ROWS_SQL[1])
+
+    op.drop_index('ix_applications_participants_data', table_name='applications',
+        postgresql_using='gin', postgresql_ops={'participants_data': 'jsonb_path_ops'})
+    op.alter_column('applications', 'participants_data',
+        existing_type=postgresql.JSONB(astext_type=sa.Text()),
+        type_=postgresql.JSON(astext_type=sa.Text()),
+        postgresql_using='participants_data::json',
+        nullable=False)
@@ -0,0 +1,102 @@
+"""participant dates
+
+participants.date_from / date_to переводятся из строк ДД.ММ.ГГГГ в DATE.
+Существующие строки разбираются пачками по id (BACKFILL_BATCH_SIZE),
+некорректные значения становятся NULL и попадают в лог. Добавляется
+частичный GiST-индекс по daterange(date_from, date_to, '[]') для запросов
+«кто в поездке в период»: строки без дат или с date_from > date_to в него
+не входят (для них daterange() неограничен или падает).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:05:41
+"""
+import logging
+from datetime import datetime
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+BACKFILL_BATCH_SIZE = 5000
+
+TRAVEL_PERIOD_PREDICATE = "date_from IS NOT NULL AND date_to IS NOT NULL AND date_from <= date_to"
+
+SELECT_BATCH_SQL = sa.text(
+    "SELECT id, date_from, date_to FROM participants WHERE id > :last_id ORDER BY id LIMIT :limit"
+)
+UPDATE_ROW_SQL = sa.text(
+    "UPDATE participants SET date_from_new = :date_from, date_to_new = :date_to WHERE id = :id"
+)
+
+
+def _parse(value: Optional[str]):
+    try:
+        return datetime.strptime(value.strip(), "%d.%m.%Y").date()
+    except (AttributeError, ValueError):
+        return None
+
+
+def _backfill() -> None:
+    """Разбор строковых дат пачками: память не зависит от размера таблицы"""
+    bind = op.get_bind()
+    last_id, total, invalid = 0, 0, 0
+
+    while True:
+        rows = bind.execute(SELECT_BATCH_SQL, {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+
+        params = []
+        for row in rows:
+            date_from, date_to = _parse(row.date_from), _parse(row.date_to)
+            if date_from is None or date_to is None:
+                invalid += 1
+                logger.warning(
+                    f"Участник {row.id}: некорректные даты {row.date_from!r} - {row.date_to!r}, записан NULL"
+                )
+            params.append({"id": row.id, "date_from": date_from, "date_to": date_to})
+
+        bind.execute(UPDATE_ROW_SQL, params)
+        last_id = rows[-1].id
+        total += len(rows)
+
+    logger.info(f"Даты участников: обработано {total}, некорректных {invalid}")
+
+
+def upgrade() -> None:
+    op.add_column('participants', sa.Column('date_from_new', sa.Date(), nullable=True))
+    op.add_column('participants', sa.Column('date_to_new', sa.Date(), nullable=True))
+
+    _backfill()
+
+    op.drop_column('participants', 'date_from')
+    op.drop_column('participants', 'date_to')
+    op.alter_column('participants', 'date_from_new', new_column_name='date_from')
+    op.alter_column('participants', 'date_to_new', new_column_name='date_to')
+
+    op.create_index('ix_participants_travel_period', 'participants',
+        [sa.text("daterange(date_from, date_to, '[]')")], unique=False, postgresql_using='gist',
+        postgresql_where=sa.text(TRAVEL_PERIOD_PREDICATE))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_participants_travel_period', table_name='participants', postgresql_using='gist')
+
+    op.alter_column('participants', 'date_from',
+        existing_type=sa.Date(),
+        type_=sa.String(length=20),
+        postgresql_using="COALESCE(to_char(date_from, 'DD.MM.YYYY'), '')",
+        nullable=False)
+    op.alter_column('participants', 'date_to',
+        existing_type=sa.Date(),
+        type_=sa.String(length=20),
+        postgresql_using="COALESCE(to_char(date_to, 'DD.MM.YYYY'), '')",
+        nullable=False)
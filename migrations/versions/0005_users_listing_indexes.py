@@ -0,0 +1,32 @@
+"""users listing indexes
+
+Индексы для /users: keyset-пагинация по статусу (status, id) вместо
+ix_users_status и поиск по началу username без учета регистра.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:10:22
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_users_status_id', 'users', ['status', 'id'], unique=False)
+    op.drop_index('ix_users_status', table_name='users')
+    op.create_index('ix_users_username_lower', 'users',
+        [sa.text('lower(username) varchar_pattern_ops')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_username_lower', table_name='users')
+    op.create_index('ix_users_status', 'users', ['status'], unique=False)
+    op.drop_index('ix_users_status_id', table_name='users')
@@ -0,0 +1,30 @@
+"""application idempotency key
+
+applications.idempotency_key с уникальным ограничением: повторное
+нажатие «Подтвердить» или повтор callback от Telegram не создают
+вторую заявку и второе задание на отправку.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:02:37
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('applications', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_applications_idempotency_key', 'applications', ['idempotency_key'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_applications_idempotency_key', 'applications', type_='unique')
+    op.drop_column('applications', 'idempotency_key')
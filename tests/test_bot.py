@@ -2,8 +2,73 @@
 """
 Тесты для бота
 """
+import asyncio
+import importlib
+import io
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from copy import copy
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import openpyxl
 import pytest
-from bot.utils.validators import validate_date, validate_date_range, validate_full_name, validate_text
+from aiogram import Bot, Dispatcher
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User as TelegramUser
+from aiohttp.test_utils import TestClient, TestServer
+from aiosmtpd.controller import Controller
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from bot.config import config
+from bot.database import LazySession
+from bot.database.database import _upgrade
+from bot.database.fsm_storage import CoalescingStorage
+from bot.database.models import UserStatus
+from bot.database.models import Application, ApplicationStatus, DeliveryJob, Participant, User
+from bot.database.pagination import PREV, decode_cursor, encode_cursor
+from bot.database.participants import (
+    find_travelling, format_date, load_participants, parse_date, participants_json, save_participants,
+    sync_participants, with_participants_count
+)
+from bot.middlewares import (
+    AdmissionMiddleware, ChatEventIsolation, DbSessionMiddleware, FSMFlushMiddleware, ThrottlingMiddleware
+)
+from bot.middlewares.throttling import THROTTLED_TEXT
+from bot.handlers import application as application_handlers
+from bot.handlers.application import _history_page, _submit_application
+from bot.handlers.drafts import _drafts_page
+from bot.handlers.admin import _apps_text, _stats_text, _user_search_query, _users_page, show_users_page
+from bot.utils.delivery import retry_delay, build_email
+from bot.utils.email_sender import SMTPPool, build_message
+from bot.utils.excel_executor import ExcelRenderExecutor
+from bot.utils import export
+from bot.utils.export import ExportFilter, parse_export_args, write_export
+from bot.utils.idempotency import InFlightGuard, submission_key
+from bot.utils.notifier import NotificationDispatcher
+from bot.utils.participant_import import parse_participants_file
+from bot.utils.rate_limit import KeyedBuckets, TokenBucket
+from bot.utils.stats import StatsCache
+from bot.utils.excel_generator import (
+    build_simple_workbook, generate_excel_bytes, stream_simple_workbook, template_renderer
+)
+from bot.webhook import WebhookServer, SECRET_HEADER, wait_for_stop_signal
+from bot.utils.validators import (
+    parse_participants_batch, validate_date, validate_date_range, validate_full_name, validate_text
+)
+from bot.utils.user_cache import (
+    CachedUser, UserAccessCache, UserCacheListener, check_user_access, publish_user_change
+)
 
 
 class TestValidators:
@@ -86,6 +151,1433 @@ class TestValidators:
         is_valid, msg = validate_text("")
         assert is_valid is False
         assert "пустым" in msg.lower()
+    
+    def test_parse_participants_batch(self):
+        """Тест разбора списка участников с ошибками по строкам"""
+        participants, errors = parse_participants_batch(
+            "Иванов  Иван; 01.06.2025; 10.06.2025\n"
+            "\n"
+            "Петров; 01.06.2025; 10.06.2025\n"
+            "Сидоров Петр; 10.06.2025; 01.06.2025\n"
+            "Кузнецов Олег 01.06.2025 10.06.2025\n"
+            "Смирнова Анна ; 02.06.2025 ; 10.06.2025"
+        )
+        assert participants == [
+            {"full_name": "Иванов Иван", "date_from": "01.06.2025", "date_to": "10.06.2025"},
+            {"full_name": "Смирнова Анна", "date_from": "02.06.2025", "date_to": "10.06.2025"}
+        ]
+        assert [line_num for line_num, _, _ in errors] == [3, 4, 5]
+        assert "минимум" in errors[0][2].lower()
+        assert "раньше" in errors[1][2].lower()
+        assert "три поля" in errors[2][2].lower()
+
+
+class TestParticipantImport:
+    """Тесты импорта участников из файла"""
+    
+    def test_xlsx_application_form(self):
+        """Книга заявки читается обратно: заголовок таблицы находится под шапкой"""
+        content, filename = generate_excel_bytes(make_excel_data(3))
+        result = parse_participants_file(content, filename, max_rows=100)
+        assert result.participants == make_excel_data(3)["participants"]
+        assert not result.errors and not result.truncated
+    
+    def test_xlsx_dates_and_row_cap(self):
+        """Даты Excel приводятся к ДД.ММ.ГГГГ, строки сверх лимита не разбираются"""
+        wb = openpyxl.Workbook()
+        wb.active.append(["ФИО", "Дата начала", "Дата окончания"])
+        for idx in range(1, 8):
+            wb.active.append([f"Участник {idx}", datetime(2025, 6, 1), datetime(2025, 6, idx)])
+        wb.active.append([])
+        output = io.BytesIO()
+        wb.save(output)
+        
+        result = parse_participants_file(output.getvalue(), "team.xlsx", max_rows=5)
+        assert len(result.participants) == 5 and result.truncated
+        assert result.participants[1] == {"full_name": "Участник 2", "date_from": "01.06.2025", "date_to": "02.06.2025"}
+    
+    def test_csv_without_header(self):
+        """CSV в cp1251 без заголовка: колонки по порядку, ошибки с номером строки"""
+        content = (
+            "Иванов Иван,01.06.2025,10.06.2025\n"
+            "\n"
+            "Петров,01.06.2025,10.06.2025\n"
+            "Сидорова Анна,01.06.2025,31.05.2025\n"
+        ).encode("cp1251")
+        result = parse_participants_file(content, "team.CSV", max_rows=100)
+        assert result.participants == [
+            {"full_name": "Иванов Иван", "date_from": "01.06.2025", "date_to": "10.06.2025"}
+        ]
+        assert [(row_num, values) for row_num, values, _ in result.errors] == [
+            (3, "Петров; 01.06.2025; 10.06.2025"), (4, "Сидорова Анна; 01.06.2025; 31.05.2025")
+        ]
+    
+    def test_rejects_broken_file(self):
+        """Поврежденный или неподдерживаемый файл - ValueError с текстом для пользователя"""
+        with pytest.raises(ValueError):
+            parse_participants_file(b"not a zip", "team.xlsx", max_rows=100)
+        with pytest.raises(ValueError):
+            parse_participants_file(b"", "team.pdf", max_rows=100)
+
+
+class TestUserAccessCache:
+    """Тесты кэша пользователей"""
+    
+    @staticmethod
+    def make_user(user_id: int, status: UserStatus = UserStatus.APPROVED) -> CachedUser:
+        return CachedUser(telegram_id=user_id, status=status, is_admin=False)
+    
+    def test_hit_after_put(self):
+        """Повторное обращение обслуживается из кэша"""
+        cache = UserAccessCache(ttl=60, max_size=10)
+        cache.put(self.make_user(1))
+        assert cache.get(1).telegram_id == 1
+        assert cache.hits == 1
+    
+    def test_ttl_expiry(self, monkeypatch):
+        """Запись устаревает по истечении TTL"""
+        cache = UserAccessCache(ttl=10, max_size=10)
+        now = time.monotonic()
+        monkeypatch.setattr(time, "monotonic", lambda: now)
+        cache.put(self.make_user(1))
+        monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+        assert cache.get(1) is None
+        assert len(cache) == 0
+    
+    def test_size_bound_evicts_lru(self):
+        """При превышении размера вытесняется давно не использованная запись"""
+        cache = UserAccessCache(ttl=60, max_size=2)
+        cache.put(self.make_user(1))
+        cache.put(self.make_user(2))
+        cache.get(1)
+        cache.put(self.make_user(3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.get(3) is not None
+    
+    def test_invalidate(self):
+        """Инвалидация удаляет запись сразу"""
+        cache = UserAccessCache(ttl=60, max_size=10)
+        cache.put(self.make_user(1))
+        cache.invalidate(1)
+        assert cache.get(1) is None
+    
+    def test_stale_load_is_discarded(self):
+        """Загрузка, начатая до инвалидации, не попадает в кэш"""
+        cache = UserAccessCache(ttl=60, max_size=10)
+        generation = cache.generation
+        cache.invalidate(1)
+        cache.put(self.make_user(1, UserStatus.APPROVED), generation)
+        assert cache.get(1) is None
+    
+    @pytest.mark.asyncio
+    async def test_fresh_check_bypasses_cache(self, sqlite_session, monkeypatch):
+        """Проверка перед записью видит отзыв доступа, еще не дошедший до кэша"""
+        cache = UserAccessCache(ttl=60, max_size=10)
+        # Имя модуля в bot.utils занято экземпляром кэша
+        monkeypatch.setattr(importlib.import_module("bot.utils.user_cache"), "user_cache", cache)
+        sqlite_session.add(User(id=1, telegram_id=1, status=UserStatus.REVOKED, is_admin=False))
+        sqlite_session.flush()
+        cache.put(self.make_user(1))
+        session = SyncSessionAdapter(sqlite_session)
+        
+        assert (await check_user_access(1, session))[0]
+        has_access, user = await check_user_access(1, session, fresh=True)
+        assert not has_access and user.status == UserStatus.REVOKED
+        assert cache.get(1).status == UserStatus.REVOKED
+
+
+class TestDbSessionMiddleware:
+    """Тесты ленивой сессии БД"""
+    
+    @pytest.mark.asyncio
+    async def test_session_not_created_when_unused(self):
+        """Обработчик без обращения к БД не создает сессию"""
+        middleware = DbSessionMiddleware(lambda: LazySession(lambda: AsyncSession()))
+        
+        async def handler(event, data):
+            return "ok"
+        
+        assert await middleware(handler, None, {}) == "ok"
+        assert middleware.get_stats() == {"updates_total": 1, "sessions_created": 0, "db_used": 0}
+    
+    @pytest.mark.asyncio
+    async def test_session_created_on_first_access(self):
+        """Сессия создается при первом обращении"""
+        middleware = DbSessionMiddleware(lambda: LazySession(lambda: AsyncSession()))
+        
+        async def handler(event, data):
+            return data["session"].info
+        
+        await middleware(handler, None, {})
+        stats = middleware.get_stats()
+        assert stats["sessions_created"] == 1
+        assert stats["db_used"] == 0
+
+
+def message_update(update_id, user_id, text):
+    """Обновление с текстовым сообщением пользователя в личном чате"""
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=TelegramUser(id=user_id, is_bot=False, first_name="Тест"),
+            text=text
+        )
+    )
+
+
+class FlowStates(StatesGroup):
+    first = State()
+    second = State()
+
+
+class TestChatEventIsolation:
+    """Тесты последовательной обработки обновлений чата"""
+    
+    @pytest.mark.asyncio
+    async def test_same_key_serialized(self):
+        """Обновления одного ключа не пересекаются и идут в порядке прихода"""
+        isolation = ChatEventIsolation()
+        key = StorageKey(bot_id=42, chat_id=1, user_id=1)
+        participants = []
+        
+        async def handler(idx):
+            async with isolation.lock(key):
+                # Чтение - ожидание - запись, как в обработчиках FSM
+                current = list(participants)
+                await asyncio.sleep(0.01)
+                participants[:] = current + [idx]
+        
+        await asyncio.gather(*(handler(idx) for idx in range(5)))
+        assert participants == [0, 1, 2, 3, 4]
+        
+        stats = isolation.get_stats()
+        assert (stats["updates_total"], stats["waited"], stats["max_depth"]) == (5, 4, 5)
+        assert stats["active_chats"] == 0 and isolation.queue_depth(key) == 0
+    
+    @pytest.mark.asyncio
+    async def test_different_keys_parallel(self):
+        """Обновления разных чатов выполняются одновременно"""
+        isolation = ChatEventIsolation()
+        running = set()
+        overlapped = []
+        
+        async def handler(idx):
+            async with isolation.lock(StorageKey(bot_id=42, chat_id=idx, user_id=idx)):
+                running.add(idx)
+                await asyncio.sleep(0.01)
+                overlapped.append(len(running))
+                running.discard(idx)
+        
+        await asyncio.gather(*(handler(idx) for idx in range(3)))
+        assert max(overlapped) == 3
+        assert isolation.get_stats()["waited"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_state_transition_through_dispatcher(self):
+        """Второе сообщение маршрутизируется по состоянию, записанному первым"""
+        bot = Bot("42:TEST")
+        dp = Dispatcher(events_isolation=ChatEventIsolation())
+        handled = []
+        
+        @dp.message(FlowStates.first)
+        async def first_step(message, state):
+            await asyncio.sleep(0.01)
+            handled.append(("first", message.text))
+            await state.set_state(FlowStates.second)
+        
+        @dp.message(FlowStates.second)
+        async def second_step(message, state):
+            handled.append(("second", message.text))
+        
+        await dp.fsm.get_context(bot, chat_id=1, user_id=1).set_state(FlowStates.first)
+        await asyncio.gather(
+            dp.feed_update(bot, message_update(1, 1, "a")),
+            dp.feed_update(bot, message_update(2, 1, "b"))
+        )
+        assert handled == [("first", "a"), ("second", "b")]
+        await bot.session.close()
+
+
+class FakeFSMBackend:
+    """Заглушка PostgresStorage, считающая обращения"""
+    
+    def __init__(self):
+        self.records = {}
+        self.loads = 0
+        self.saves = 0
+    
+    async def load_record(self, key):
+        self.loads += 1
+        state, data = self.records.get(key, (None, {}))
+        return state, dict(data)
+    
+    async def save_record(self, key, state, data):
+        self.saves += 1
+        self.records[key] = (state, dict(data))
+    
+    async def close(self):
+        pass
+
+
+class TestCoalescingStorage:
+    """Тесты слоя объединения записей FSM"""
+    
+    key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+    
+    @pytest.mark.asyncio
+    async def test_updates_coalesced_into_single_write(self):
+        """Несколько изменений в рамках обновления дают одну запись"""
+        backend = FakeFSMBackend()
+        storage = CoalescingStorage(backend)
+        
+        await storage.update_data(self.key, {"current_participant_name": "Иванов Иван"})
+        await storage.update_data(self.key, {"current_participant_date_from": "01.01.2025"})
+        await storage.set_state(self.key, "ApplicationStates:participant_date_to")
+        await storage.flush(self.key)
+        
+        assert backend.loads == 1
+        assert backend.saves == 1
+        state, data = backend.records[self.key]
+        assert state == "ApplicationStates:participant_date_to"
+        assert data["current_participant_date_from"] == "01.01.2025"
+    
+    @pytest.mark.asyncio
+    async def test_read_only_update_does_not_write(self):
+        """Обновление без изменений не пишет в БД и не оставляет кэш"""
+        backend = FakeFSMBackend()
+        storage = CoalescingStorage(backend)
+        
+        await storage.get_state(self.key)
+        await storage.flush(self.key)
+        await storage.get_state(self.key)
+        
+        assert backend.saves == 0
+        assert backend.loads == 2
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_updates_through_dispatcher(self):
+        """Одновременные обновления ключа не делят незаписанную запись"""
+        backend = FakeFSMBackend()
+        storage = CoalescingStorage(backend)
+        bot = Bot("42:TEST")
+        dp = Dispatcher(storage=storage, events_isolation=ChatEventIsolation())
+        dp.update.middleware(FSMFlushMiddleware(storage))
+        
+        @dp.message()
+        async def add_participant(message, state):
+            participants = (await state.get_data()).get("participants", [])
+            await asyncio.sleep(0.01)
+            await state.update_data(participants=participants + [message.text])
+        
+        await asyncio.gather(*(dp.feed_update(bot, message_update(idx, 10, f"Участник {idx}")) for idx in range(3)))
+        
+        _, data = next(iter(backend.records.values()))
+        assert data["participants"] == ["Участник 0", "Участник 1", "Участник 2"]
+        assert backend.saves == 3
+        assert storage._records == {}
+        await bot.session.close()
+
+
+RECORDED_UPDATE = {
+    "update_id": 1001,
+    "message": {
+        "message_id": 1,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Иван"},
+        "text": "/start"
+    }
+}
+
+
+class FakeDispatcher:
+    """Заглушка Dispatcher, запоминающая обновления"""
+    
+    def __init__(self):
+        self.updates = []
+    
+    async def feed_update(self, bot, update):
+        self.updates.append(update)
+
+
+class TestWebhookServer:
+    """Тесты webhook-сервера на записанных обновлениях"""
+    
+    @pytest.mark.asyncio
+    async def test_recorded_update_is_processed(self):
+        """Обновление с верным токеном принимается и обрабатывается"""
+        dp = FakeDispatcher()
+        server = WebhookServer(dp, Bot("42:TEST"), secret_token="secret", workers=2)
+        
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.post(
+                "/webhook", json=RECORDED_UPDATE, headers={SECRET_HEADER: "secret"}
+            )
+            assert response.status == 200
+        
+        # Остановка сервера дожидается обработки очереди
+        assert [u.update_id for u in dp.updates] == [1001]
+        assert dp.updates[0].message.text == "/start"
+    
+    @pytest.mark.asyncio
+    async def test_wrong_secret_rejected(self):
+        """Запрос без секретного токена отклоняется"""
+        dp = FakeDispatcher()
+        server = WebhookServer(dp, Bot("42:TEST"), secret_token="secret")
+        
+        async with TestClient(TestServer(server.create_app())) as client:
+            response = await client.post("/webhook", json=RECORDED_UPDATE)
+            assert response.status == 401
+        
+        assert dp.updates == []
+    
+    @pytest.mark.asyncio
+    async def test_full_queue_returns_503(self):
+        """При переполнении очереди Telegram получает 503"""
+        dp = FakeDispatcher()
+        server = WebhookServer(dp, Bot("42:TEST"), queue_size=1, workers=0)
+        
+        async with TestClient(TestServer(server.create_app())) as client:
+            first = await client.post("/webhook", json=RECORDED_UPDATE)
+            second = await client.post("/webhook", json=RECORDED_UPDATE)
+            assert first.status == 200
+            assert second.status == 503
+            server.queue.get_nowait()
+            server.queue.task_done()
+        
+        assert server.get_stats()["rejected"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_stop_signal(self):
+        """SIGTERM завершает ожидание, и сервер переходит к дообработке очереди"""
+        waiter = asyncio.create_task(wait_for_stop_signal())
+        await asyncio.sleep(0)
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(waiter, timeout=1)
+
+
+class TestDelivery:
+    """Тесты фоновой отправки заявок"""
+    
+    def test_retry_delay_is_exponential_and_capped(self):
+        """Задержка удваивается с каждой попыткой и ограничена сверху"""
+        assert retry_delay(1, 30) == 30
+        assert retry_delay(2, 30) == 60
+        assert retry_delay(3, 30) == 120
+        assert retry_delay(20, 30, max_delay=3600) == 3600
+    
+    def test_build_email(self):
+        """Письмо формируется из сохраненной заявки"""
+        application = Application(
+            sport_type="Футбол",
+            event_rank="Чемпионат",
+            country="Россия",
+            city="Казань",
+            participants_data={"participants": [{"full_name": "Иванов Иван"}]}
+        )
+        user = User(first_name="Иван", last_name="Иванов", organization="ЦСП")
+        
+        subject, body = build_email(application, user)
+        assert "Казань" in subject
+        assert "Количество участников: 1" in body
+        assert "Организация: ЦСП" in body
+
+
+class CollectingSMTPHandler:
+    """Обработчик aiosmtpd, сохраняющий полученные письма"""
+    
+    def __init__(self):
+        self.envelopes = []
+    
+    async def handle_DATA(self, server, session, envelope):
+        self.envelopes.append(envelope)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """Локальный SMTP-сервер вместо mail.ru"""
+    monkeypatch.setattr(config, "SMTP_FROM", "bot@example.com")
+    handler = CollectingSMTPHandler()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield controller, handler
+    controller.stop()
+
+
+class TestSMTPPool:
+    """Тесты пула SMTP-соединений"""
+    
+    @pytest.mark.asyncio
+    async def test_connection_reused(self, smtp_server):
+        """Несколько писем отправляются через одно соединение"""
+        controller, handler = smtp_server
+        pool = SMTPPool(controller.hostname, controller.port)
+        
+        for idx in range(3):
+            await pool.send([build_message(f"Тема {idx}", "Текст", to_email="a@example.com")])
+        await pool.close()
+        
+        assert len(handler.envelopes) == 3
+        assert pool.connects == 1
+        assert pool.reuses == 2
+    
+    @pytest.mark.asyncio
+    async def test_batch_and_multiple_recipients(self, smtp_server):
+        """Пакет писем и список получателей в одной сессии"""
+        controller, handler = smtp_server
+        pool = SMTPPool(controller.hostname, controller.port)
+        
+        messages = [
+            build_message("Первое", "Текст", to_email=["a@example.com", "b@example.com"]),
+            build_message("Второе", "Текст", to_email="c@example.com")
+        ]
+        await pool.send(messages)
+        await pool.close()
+        
+        assert pool.connects == 1
+        assert handler.envelopes[0].rcpt_tos == ["a@example.com", "b@example.com"]
+        assert handler.envelopes[1].rcpt_tos == ["c@example.com"]
+    
+    @pytest.mark.asyncio
+    async def test_reconnect_after_lost_connection(self, smtp_server):
+        """Оборванное соединение заменяется новым"""
+        controller, handler = smtp_server
+        pool = SMTPPool(controller.hostname, controller.port)
+        
+        await pool.send([build_message("Первое", "Текст", to_email="a@example.com")])
+        pool._idle[0].client.close()
+        await pool.send([build_message("Второе", "Текст", to_email="a@example.com")])
+        await pool.close()
+        
+        assert len(handler.envelopes) == 2
+        assert pool.connects == 2
+
+
+def make_excel_data(participants: int) -> dict:
+    """Данные заявки для генерации Excel"""
+    return {
+        "sport_type": "Футбол",
+        "event_rank": "Чемпионат",
+        "country": "Россия",
+        "city": "Казань",
+        "participants": [
+            {"full_name": f"Участник {idx}", "date_from": "01.06.2025", "date_to": "10.06.2025"}
+            for idx in range(1, participants + 1)
+        ]
+    }
+
+
+class TestExcelGenerator:
+    """Тесты генерации Excel"""
+    
+    def test_simple_layout(self):
+        """Упрощенная книга: поля заявки и таблица участников"""
+        ws = build_simple_workbook(make_excel_data(2)).active
+        assert ws["A1"].value == "ЗАЯВКА НА СЛУЖЕБНУЮ ПОЕЗДКУ"
+        assert ws["B7"].value == "Казань"
+        assert [c.value for c in ws[10]][:4] == ['№', 'ФИО участника', 'Дата начала', 'Дата окончания']
+        assert ws["B12"].value == "Участник 2"
+    
+    def test_stream_matches_simple_layout(self):
+        """Потоковая запись дает ту же разметку, что и обычная книга"""
+        data = make_excel_data(3)
+        output = io.BytesIO()
+        assert stream_simple_workbook(data, iter(data["participants"]), output) == 3
+
+        expected = build_simple_workbook(data).active
+        ws = openpyxl.load_workbook(output).active
+        assert ws.dimensions == expected.dimensions
+        assert {str(r) for r in ws.merged_cells.ranges} == {str(r) for r in expected.merged_cells.ranges}
+        assert ws.column_dimensions["B"].width == expected.column_dimensions["B"].width
+        for row in expected.iter_rows():
+            for cell in row:
+                streamed = ws[cell.coordinate]
+                if cell.row != 2:  # дата подачи может разойтись на минуту
+                    assert streamed.value == cell.value
+                for attr in ("font", "fill", "border", "alignment"):
+                    assert copy(getattr(streamed, attr)) == copy(getattr(cell, attr))
+    
+    def test_bytes_attachment_without_disk(self):
+        """Книга формируется в памяти и прикладывается к письму без файла"""
+        content, filename = generate_excel_bytes(make_excel_data(2))
+        assert filename.startswith("Заявка_Казань_") and filename.endswith(".xlsx")
+        assert openpyxl.load_workbook(io.BytesIO(content)).active["B12"].value == "Участник 2"
+        
+        message = build_message("Тема", "Текст", attachment=io.BytesIO(content), attachment_name=filename)
+        part = message.get_payload()[1]
+        assert part.get_filename() == filename
+        assert part.get_payload(decode=True) == content
+    
+    def test_template_fills_form_slots(self):
+        """Участники заполняют обе половины формы шаблона"""
+        wb = template_renderer.build_workbook(make_excel_data(16))
+        ws = wb.active
+        assert ws.title == "Версия для печати"
+        assert ws["D5"].value == "Футбол"
+        assert ws["I7"].value == "Россия"
+        assert ws["B10"].value == "Участник 1"
+        assert ws["G10"].value == "Участник 16"
+        assert ws["A9"].value == "№"
+        assert len(wb.sheetnames) == 1
+    
+    def test_template_does_not_mutate_snapshot(self):
+        """Заполнение формы не меняет кэшированный шаблон"""
+        template_renderer.build_workbook(make_excel_data(1))
+        ws = template_renderer.build_workbook(make_excel_data(0)).active
+        assert ws["B10"].value is None
+    
+    def test_template_overflow_sheet(self):
+        """Участники сверх формы попадают на отдельный лист"""
+        wb = template_renderer.build_workbook(make_excel_data(31))
+        assert wb.sheetnames == ["Версия для печати", "Список участников"]
+        assert wb["Список участников"]["B32"].value == "Участник 31"
+
+
+class TestExcelRenderExecutor:
+    """Тесты пула генерации Excel"""
+    
+    @pytest.mark.asyncio
+    async def test_semaphore_caps_concurrent_renders(self):
+        """Генерации сверх лимита ждут в очереди"""
+        executor = ExcelRenderExecutor(mode="thread", workers=2, max_concurrent=1)
+        await executor.start()
+        results = await asyncio.gather(*(executor.render(make_excel_data(2)) for _ in range(3)))
+        await executor.shutdown()
+        
+        assert all(name.endswith(".xlsx") for _, name in results)
+        stats = executor.get_stats()
+        assert stats["rendered"] == 3
+        assert stats["max_waiting"] == 2
+        assert stats["waiting"] == 0 and stats["active"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_process_pool_render(self):
+        """Генерация в отдельном процессе возвращает готовый файл"""
+        executor = ExcelRenderExecutor(mode="process", workers=1)
+        await executor.start()
+        content, _ = await executor.render(make_excel_data(1))
+        await executor.shutdown()
+        
+        assert openpyxl.load_workbook(io.BytesIO(content)).active["B11"].value == "Участник 1"
+    
+    @pytest.mark.asyncio
+    async def test_broken_pool_recreated(self):
+        """После падения процесса пул пересоздается, генерация повторяется"""
+        executor = ExcelRenderExecutor(mode="process", workers=1)
+        await executor.start()
+        broken = executor._executor
+        with pytest.raises(BrokenProcessPool):
+            await asyncio.get_running_loop().run_in_executor(broken, os._exit, 1)
+        
+        content, _ = await executor.render(make_excel_data(1))
+        assert executor._executor is not broken
+        await executor.shutdown()
+        
+        assert executor.get_stats()["restarts"] == 1
+        assert openpyxl.load_workbook(io.BytesIO(content)).active["B11"].value == "Участник 1"
+
+
+class SyncSessionAdapter:
+    """Синхронная сессия SQLite с интерфейсом execute() как у AsyncSession"""
+    
+    def __init__(self, session: Session):
+        self.session = session
+        self.statements = 0
+    
+    async def execute(self, statement):
+        self.statements += 1
+        return self.session.execute(statement)
+    
+    async def stream(self, statement):
+        self.statements += 1
+        result = self.session.execute(statement)
+        
+        async def rows():
+            for row in result:
+                yield row
+        return rows()
+    
+    def add(self, instance):
+        self.session.add(instance)
+    
+    async def flush(self):
+        self.session.flush()
+    
+    async def commit(self):
+        self.session.commit()
+    
+    async def rollback(self):
+        self.session.rollback()
+
+
+@pytest.fixture
+def sqlite_session():
+    """SQLite в памяти с таблицами пользователей, заявок и участников"""
+    engine = create_engine("sqlite://")
+    tables = [User.__table__, Application.__table__, Participant.__table__]
+    User.metadata.create_all(engine, tables=tables)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+class TestHistoryPagination:
+    """Тесты keyset-пагинации истории заявок"""
+    
+    def test_cursor_roundtrip(self):
+        """Курсор переживает кодирование в callback_data"""
+        created_at = datetime(2025, 6, 1, 12, 30, 15, 123456)
+        cursor = encode_cursor([created_at, 42])
+        assert len(f"history:n:{cursor}") <= 64
+        assert decode_cursor(cursor, (Application.created_at, Application.id)) == (created_at, 42)
+    
+    @pytest.mark.asyncio
+    async def test_pages_and_participant_counts(self, sqlite_session, monkeypatch):
+        """Страницы не пересекаются, счетчики участников считаются в SQL"""
+        monkeypatch.setattr(config, "HISTORY_PAGE_SIZE", 10)
+        same_time = datetime(2025, 6, 1, 12, 0)
+        for idx in range(1, 26):
+            sqlite_session.add(Application(
+                id=idx, user_id=1, sport_type="Футбол", event_rank="ЧР", country="Россия",
+                city=f"Город {idx}", participants_data={}, status=ApplicationStatus.SUBMITTED,
+                created_at=same_time if idx > 20 else datetime(2025, 5, idx)
+            ))
+        sqlite_session.add(Application(
+            id=100, user_id=2, sport_type="", event_rank="", country="", city="Чужая", participants_data={}
+        ))
+        sqlite_session.add_all(
+            Participant(application_id=25, full_name=f"У {n}", date_from=None, date_to=None, order_num=n)
+            for n in range(3)
+        )
+        sqlite_session.commit()
+        session = SyncSessionAdapter(sqlite_session)
+        
+        text, keyboard = await _history_page(session, 1)
+        assert "Заявка #25" in text and "Участников: 3" in text and "Заявка #16" in text
+        assert "Заявка #15" not in text
+        assert [b.callback_data[:10] for b in keyboard.inline_keyboard[0]] == ["history:n:"]
+        
+        next_cursor = keyboard.inline_keyboard[0][0].callback_data.split(":", 2)[2]
+        text, keyboard = await _history_page(session, 1, next_cursor)
+        assert "Заявка #15" in text and "Заявка #6" in text and "Заявка #16" not in text
+        prev_cursor = keyboard.inline_keyboard[0][0].callback_data.split(":", 2)[2]
+        
+        text, _ = await _history_page(session, 1, prev_cursor, PREV)
+        assert "Заявка #25" in text and "Заявка #16" in text and "Заявка #15" not in text
+        assert "Чужая" not in text
+
+
+class TestDraftsPagination:
+    """Тесты списка черновиков"""
+    
+    @pytest.mark.asyncio
+    async def test_grouped_counts_and_pages(self, sqlite_session, monkeypatch):
+        """Число участников считается GROUP BY, кнопки листания добавляются к кнопкам черновиков"""
+        monkeypatch.setattr(config, "DRAFTS_PAGE_SIZE", 2)
+        for idx in range(1, 4):
+            sqlite_session.add(Application(
+                id=idx, user_id=1, sport_type="", event_rank="", country="Россия", city=f"Город {idx}",
+                participants_data={}, status=ApplicationStatus.DRAFT, updated_at=datetime(2025, 6, idx)
+            ))
+        sqlite_session.add(Application(
+            id=4, user_id=1, sport_type="", event_rank="", country="", city="Поданная",
+            participants_data={}, status=ApplicationStatus.SUBMITTED
+        ))
+        sqlite_session.add_all(
+            Participant(application_id=3, full_name=f"У {n}", date_from=None, date_to=None, order_num=n)
+            for n in range(2)
+        )
+        sqlite_session.commit()
+        session = SyncSessionAdapter(sqlite_session)
+        
+        text, keyboard = await _drafts_page(session, 1)
+        assert "Черновик #3" in text and "Участников: 2" in text and "Черновик #2" in text
+        assert "Черновик #1" not in text and "Поданная" not in text
+        assert keyboard.inline_keyboard[0][0].callback_data == "load_draft:3"
+        nav = keyboard.inline_keyboard[-1]
+        assert len(nav) == 1 and nav[0].callback_data.startswith("drafts:n:")
+        
+        text, keyboard = await _drafts_page(session, 1, nav[0].callback_data.split(":", 2)[2])
+        assert "Черновик #1" in text and "Участников: 0" in text
+        assert keyboard.inline_keyboard[-1][0].callback_data.startswith("drafts:p:")
+
+
+class TestParticipantSync:
+    """Тесты пакетной записи участников"""
+    
+    @pytest.mark.asyncio
+    async def test_replace_in_fixed_number_of_statements(self, sqlite_session):
+        """200 участников заменяются одним DELETE и одним INSERT"""
+        session = SyncSessionAdapter(sqlite_session)
+        old = [{"full_name": "Старый", "date_from": "01.01.2025", "date_to": "02.01.2025"}] * 3
+        await sync_participants(session, 1, old, replace=False)
+        await sync_participants(session, 2, old, replace=False)
+        
+        session.statements = 0
+        new = [
+            {"full_name": f"Участник {idx}", "date_from": "01.06.2025", "date_to": "10.06.2025"}
+            for idx in range(1, 201)
+        ]
+        await sync_participants(session, 1, new)
+        assert session.statements == 2
+        
+        rows = sqlite_session.query(Participant).filter_by(application_id=1).order_by(Participant.order_num).all()
+        assert len(rows) == 200
+        assert (rows[0].full_name, rows[0].order_num) == ("Участник 1", 1)
+        assert (rows[-1].full_name, rows[-1].order_num) == ("Участник 200", 200)
+        assert (rows[0].date_from, rows[0].date_to) == (date(2025, 6, 1), date(2025, 6, 10))
+        assert sqlite_session.query(Participant).filter_by(application_id=2).count() == 3
+        
+        loaded = await load_participants(session, Application(id=1))
+        assert loaded[0] == {"full_name": "Участник 1", "date_from": "01.06.2025", "date_to": "10.06.2025"}
+        assert len(loaded) == 200
+    
+    @pytest.mark.asyncio
+    async def test_jsonb_mode(self, sqlite_session, monkeypatch):
+        """В режиме jsonb участники хранятся только в participants_data"""
+        monkeypatch.setattr(config, "PARTICIPANTS_STORAGE", "jsonb")
+        session = SyncSessionAdapter(sqlite_session)
+        participants = [{"full_name": "Иванов Иван", "date_from": "01.06.2025", "date_to": "10.06.2025"}]
+        
+        application = Application(id=1, participants_data=participants_json(participants))
+        await save_participants(session, 1, participants)
+        assert session.statements == 0
+        assert await load_participants(session, application) == participants
+        
+        query = with_participants_count(select(Application.id))
+        assert "jsonb_array_length" in str(query.compile(dialect=postgresql.dialect()))
+        
+        monkeypatch.setattr(config, "PARTICIPANTS_STORAGE", "rows")
+        assert participants_json(participants) is None
+    
+    def test_date_parsing(self):
+        """Строки ДД.ММ.ГГГГ переводятся в даты, некорректные - в None"""
+        assert parse_date("29.02.2024") == date(2024, 2, 29)
+        assert parse_date("31.02.2025") is None
+        assert parse_date(None) is None
+        assert format_date(date(2025, 6, 1)) == "01.06.2025"
+        assert format_date(None) == ""
+
+
+class TestIdempotentSubmit:
+    """Тесты защиты от повторного подтверждения заявки"""
+    
+    DATA = {
+        "sport_type": "Футбол",
+        "event_rank": "Чемпионат России",
+        "country": "Россия",
+        "city": "Москва",
+        "participants": [{"full_name": "Иванов Иван", "date_from": "01.06.2025", "date_to": "10.06.2025"}]
+    }
+    
+    def test_submission_key(self):
+        """Ключ зависит от пользователя, сообщения подтверждения и данных заявки"""
+        key = submission_key(1, 100, self.DATA)
+        assert len(key) == 64
+        assert key == submission_key(1, 100, dict(self.DATA, unrelated="x"))
+        assert key != submission_key(1, 101, self.DATA)
+        assert key != submission_key(2, 100, self.DATA)
+        assert key != submission_key(1, 100, dict(self.DATA, city="Казань"))
+    
+    def test_in_flight_guard(self):
+        """Ключ нельзя захватить повторно до освобождения"""
+        guard = InFlightGuard()
+        assert guard.acquire(1)
+        assert not guard.acquire(1)
+        assert guard.acquire(2)
+        guard.release(1)
+        assert 1 not in guard and len(guard) == 1
+        assert guard.acquire(1)
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_submit(self, sqlite_session):
+        """Повторное подтверждение возвращает ту же заявку без второй отправки"""
+        DeliveryJob.__table__.create(sqlite_session.get_bind())
+        session = SyncSessionAdapter(sqlite_session)
+        key = submission_key(1, 100, self.DATA)
+        
+        application_id, created = await _submit_application(session, 1, 1, self.DATA, key)
+        assert created
+        assert await _submit_application(session, 1, 1, self.DATA, key) == (application_id, False)
+        
+        assert sqlite_session.query(Application).count() == 1
+        assert sqlite_session.query(DeliveryJob).count() == 1
+        assert sqlite_session.query(Participant).filter_by(application_id=application_id).count() == 1
+        
+        other_key = submission_key(1, 101, self.DATA)
+        assert (await _submit_application(session, 1, 1, self.DATA, other_key))[1]
+        assert sqlite_session.query(Application).count() == 2
+    
+    @pytest.mark.asyncio
+    async def test_confirm_after_state_cleared(self):
+        """Повтор подтверждения после очистки состояния получает ответ сразу"""
+        bot = RecordingBot("42:TEST")
+        dp = Dispatcher()
+        dp.include_router(application_handlers.router)
+        update = Update(
+            update_id=1,
+            callback_query=CallbackQuery(
+                id="1",
+                from_user=TelegramUser(id=10, is_bot=False, first_name="Тест"),
+                chat_instance="1",
+                data="confirm_yes",
+                message=Message(
+                    message_id=100, date=datetime.now(), chat=Chat(id=10, type="private"), text="Подтвердите"
+                )
+            )
+        )
+        await dp.feed_update(bot, update)
+        
+        assert [(type(method), method.text) for method in bot.requests] == [
+            (AnswerCallbackQuery, "✅ Заявка уже принята")
+        ]
+        await bot.session.close()
+
+
+class TestApplicationStats:
+    """Тесты статистики для администраторов"""
+    
+    @pytest.mark.asyncio
+    async def test_grouped_counts_and_cache(self, sqlite_session):
+        """Агрегаты считаются GROUP BY, повторный запрос берется из кэша"""
+        sqlite_session.add(User(id=1, telegram_id=1, status=UserStatus.APPROVED))
+        sqlite_session.add(User(id=2, telegram_id=2, status=UserStatus.PENDING))
+        trips = [
+            ("Футбол", "Россия", "Казань", ApplicationStatus.SUBMITTED, datetime(2025, 5, 3)),
+            ("Футбол", "Россия", "Казань", ApplicationStatus.APPROVED, datetime(2025, 6, 1)),
+            ("Хоккей", "Беларусь", "Минск", ApplicationStatus.SUBMITTED, datetime(2025, 6, 20)),
+            ("Хоккей", "Беларусь", "Минск", ApplicationStatus.DRAFT, None)
+        ]
+        for sport_type, country, city, status, submitted_at in trips:
+            sqlite_session.add(Application(
+                user_id=1, sport_type=sport_type, event_rank="", country=country, city=city,
+                status=status, submitted_at=submitted_at
+            ))
+        sqlite_session.flush()
+        
+        session = SyncSessionAdapter(sqlite_session)
+        cache = StatsCache(ttl=60)
+        stats = await cache.get(session)
+        statements = session.statements
+        assert await cache.get(session) is stats
+        assert session.statements == statements
+        assert (cache.hits, cache.misses) == (1, 1)
+        
+        assert stats.submitted_total == 3
+        assert stats.by_status[ApplicationStatus.DRAFT] == 1
+        assert stats.users_by_status == {UserStatus.APPROVED: 1, UserStatus.PENDING: 1}
+        assert stats.by_sport == [("Футбол", 2), ("Хоккей", 1)]
+        assert stats.by_month == [(2025, 6, 2), (2025, 5, 1)]
+        assert stats.top_destinations[0] == ("Россия", "Казань", 2)
+        
+        assert "июнь 2025: 2" in _stats_text(stats)
+        assert "1. Казань, Россия: 2" in _apps_text(stats)
+
+
+class FakeClock:
+    """Управляемые часы для корзин токенов"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestNotifier:
+    """Тесты ограничения частоты и рассылки"""
+    
+    def test_token_bucket(self):
+        """Токены копятся со скоростью rate, не больше capacity"""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=1, clock=clock)
+        assert bucket.wait_time() == 0
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        assert bucket.wait_time() == 0.5
+        
+        clock.now = 10
+        assert bucket.idle
+        bucket.pause(3)
+        assert bucket.wait_time() == 3.0
+        
+        buckets = KeyedBuckets(rate=1, clock=clock)
+        buckets.get(1).try_acquire()
+        buckets.get(2)
+        assert buckets.prune() == 1 and len(buckets) == 1
+    
+    @pytest.mark.asyncio
+    async def test_pause_delays_waiting_acquire(self):
+        """Пауза после начала ожидания задерживает и уже ожидающих"""
+        bucket = TokenBucket(rate=20, capacity=1)
+        await bucket.acquire()
+        
+        started = time.monotonic()
+        waiter = asyncio.create_task(bucket.acquire())
+        await asyncio.sleep(0.01)
+        bucket.pause(0.2)
+        await waiter
+        assert time.monotonic() - started >= 0.2
+    
+    @pytest.mark.asyncio
+    async def test_broadcast_retries_and_concurrency(self):
+        """Flood wait повторяется, заблокированные не повторяются, параллельность ограничена"""
+        class FakeBot:
+            def __init__(self):
+                self.calls = []
+                self.active = 0
+                self.max_active = 0
+            
+            async def send_message(self, chat_id, text, **kwargs):
+                self.calls.append(chat_id)
+                if chat_id == 1 and self.calls.count(1) == 1:
+                    raise TelegramRetryAfter(SendMessage(chat_id=1, text=text), "Flood control", retry_after=0)
+                if chat_id == 2:
+                    raise TelegramForbiddenError(SendMessage(chat_id=2, text=text), "Forbidden: bot was blocked")
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                await asyncio.sleep(0.01)
+                self.active -= 1
+        
+        bot = FakeBot()
+        dispatcher = NotificationDispatcher(global_rate=1000, chat_rate=1000, max_concurrent=3)
+        result = await dispatcher.broadcast(bot, range(1, 21), "Новость")
+        
+        assert (result.sent, result.blocked, result.failed) == (19, 1, 0)
+        assert bot.calls.count(1) == 2 and bot.calls.count(2) == 1
+        assert bot.max_active == 3
+        assert dispatcher.get_stats()["flood_waits"] == 1
+
+
+class RecordingBot(Bot):
+    """Bot, запоминающий запросы к API вместо отправки"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+    
+    async def __call__(self, method, request_timeout=None):
+        self.requests.append(method)
+        return True
+
+
+class TestThrottlingMiddleware:
+    """Тесты ограничения частоты и числа одновременных обработок"""
+    
+    @staticmethod
+    def _data(user_id):
+        return {"event_from_user": TelegramUser(id=user_id, is_bot=False, first_name="Тест")}
+    
+    @pytest.mark.asyncio
+    async def test_per_user_throttling(self):
+        """Обновления сверх корзины пользователя отбрасываются, других пользователей это не касается"""
+        clock = FakeClock()
+        middleware = ThrottlingMiddleware(rate=1, burst=2, clock=clock)
+        
+        async def handler(event, data):
+            return "ok"
+        
+        results = [await middleware(handler, None, self._data(1)) for _ in range(4)]
+        assert results == ["ok", "ok", None, None]
+        assert await middleware(handler, None, self._data(2)) == "ok"
+        
+        clock.now = 1.0
+        assert await middleware(handler, None, self._data(1)) == "ok"
+        
+        assert middleware.get_stats() == {"updates_total": 6, "throttled": 2}
+    
+    @pytest.mark.asyncio
+    async def test_admission_control(self):
+        """Сверх max_in_flight обновления ждут места и отбрасываются по таймауту"""
+        middleware = AdmissionMiddleware(max_in_flight=2, admission_timeout=0.05)
+        release = asyncio.Event()
+        
+        async def slow_handler(event, data):
+            await release.wait()
+            return "ok"
+        
+        running = [asyncio.create_task(middleware(slow_handler, None, self._data(idx))) for idx in range(2)]
+        await asyncio.sleep(0)
+        assert middleware.get_stats()["in_flight"] == 2
+        
+        # Место не освободилось за admission_timeout
+        assert await middleware(slow_handler, None, self._data(3)) is None
+        
+        # Место освобождается во время ожидания
+        waiting = asyncio.create_task(middleware(slow_handler, None, self._data(4)))
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*running, waiting) == ["ok", "ok", "ok"]
+        
+        stats = middleware.get_stats()
+        assert (stats["shed"], stats["deferred"], stats["max_in_flight"], stats["in_flight"]) == (1, 2, 2, 0)
+    
+    @pytest.mark.asyncio
+    async def test_throttled_before_fsm_load(self):
+        """Отброшенное обновление не читает состояние FSM и получает ответ"""
+        backend = FakeFSMBackend()
+        storage = CoalescingStorage(backend)
+        bot = RecordingBot("42:TEST")
+        dp = Dispatcher(storage=storage, events_isolation=ChatEventIsolation(), disable_fsm=True)
+        middleware = ThrottlingMiddleware(rate=0.001, burst=1)
+        dp.update.outer_middleware(middleware)
+        dp.update.outer_middleware(dp.fsm)
+        dp.update.middleware(FSMFlushMiddleware(storage))
+        handled = []
+        
+        @dp.message()
+        async def handler(message, state):
+            handled.append(message.text)
+        
+        for idx in range(3):
+            await dp.feed_update(bot, message_update(idx, 10, f"Сообщение {idx}"))
+        
+        assert handled == ["Сообщение 0"]
+        assert backend.loads == 1 and storage._records == {}
+        assert middleware.get_stats()["throttled"] == 2
+        # Ответ «подождите» - один на NOTICE_INTERVAL
+        assert [type(method) for method in bot.requests] == [SendMessage]
+        await bot.session.close()
+    
+    @pytest.mark.asyncio
+    async def test_throttled_callback_always_answered(self):
+        """Отброшенный callback отвечается всегда, текст - не чаще раза в NOTICE_INTERVAL"""
+        bot = RecordingBot("42:TEST")
+        dp = Dispatcher()
+        dp.update.outer_middleware(ThrottlingMiddleware(rate=0.001, burst=0))
+        user = TelegramUser(id=10, is_bot=False, first_name="Тест")
+        
+        for idx in range(2):
+            await dp.feed_update(bot, Update(
+                update_id=idx,
+                callback_query=CallbackQuery(id=str(idx), from_user=user, chat_instance="1", data="history:n:x")
+            ))
+        
+        assert [(type(method), method.text) for method in bot.requests] == [
+            (AnswerCallbackQuery, THROTTLED_TEXT), (AnswerCallbackQuery, None)
+        ]
+        await bot.session.close()
+    
+    @pytest.mark.asyncio
+    async def test_chat_queue_does_not_hold_slots(self):
+        """Обновления, ждущие очереди своего чата, не занимают места обработки"""
+        dp = Dispatcher(events_isolation=ChatEventIsolation())
+        admission = AdmissionMiddleware(max_in_flight=2, admission_timeout=0.01)
+        dp.update.middleware(admission)
+        bot = Bot("42:TEST")
+        handled = []
+        
+        @dp.message()
+        async def handler(message):
+            await asyncio.sleep(0.03)
+            handled.append(message.text)
+        
+        await asyncio.gather(
+            *(dp.feed_update(bot, message_update(idx, 1, f"A{idx}")) for idx in range(3)),
+            dp.feed_update(bot, message_update(10, 2, "B"))
+        )
+        assert sorted(handled) == ["A0", "A1", "A2", "B"]
+        assert admission.get_stats()["shed"] == 0
+        await bot.session.close()
+
+
+class TestUsersListing:
+    """Тесты списка пользователей /users"""
+    
+    @pytest.mark.asyncio
+    async def test_filter_pages_and_counts(self, sqlite_session, monkeypatch):
+        """Счетчики по статусам в кнопках, страницы по id без пересечений"""
+        monkeypatch.setattr(config, "USERS_PAGE_SIZE", 5)
+        for idx in range(1, 13):
+            status = UserStatus.PENDING if idx % 3 == 0 else UserStatus.APPROVED
+            sqlite_session.add(User(id=idx, telegram_id=1000 + idx, username=f"user{idx}", status=status))
+        sqlite_session.flush()
+        session = SyncSessionAdapter(sqlite_session)
+        
+        response, keyboard = await _users_page(session)
+        buttons = [button for row in keyboard.inline_keyboard for button in row]
+        assert "• 👥 Все (12)" in [button.text for button in buttons]
+        assert "⏳ Ожидают (4)" in [button.text for button in buttons]
+        assert "<code>1012</code>" in response and "<code>1007</code>" not in response
+        
+        next_button = buttons[-1]
+        assert next_button.callback_data.startswith("users:all:n:")
+        _, status_filter, direction, cursor = next_button.callback_data.split(":")
+        response, _ = await _users_page(session, status_filter, cursor, direction)
+        assert "<code>1007</code>" in response and "<code>1012</code>" not in response
+        
+        response, keyboard = await _users_page(session, "pending")
+        assert response.count(" | @user") == 4
+        assert not any(
+            button.callback_data.startswith("users:pending:") for row in keyboard.inline_keyboard for button in row
+        )
+    
+    @pytest.mark.asyncio
+    async def test_same_filter_pressed_again(self, sqlite_session, monkeypatch):
+        """Неизмененная страница не роняет обработчик, callback получает ответ"""
+        monkeypatch.setattr(config, "ADMIN_IDS", [1])
+        answers = []
+        
+        async def edit_text(*args, **kwargs):
+            raise TelegramBadRequest(SendMessage(chat_id=1, text=""), "Bad Request: message is not modified")
+        
+        async def answer(*args, **kwargs):
+            answers.append(args)
+        
+        callback = SimpleNamespace(
+            from_user=SimpleNamespace(id=1),
+            data="users:all",
+            message=SimpleNamespace(edit_text=edit_text),
+            answer=answer
+        )
+        await show_users_page(callback, SyncSessionAdapter(sqlite_session))
+        assert answers == [()]
+    
+    def test_search_query(self):
+        """Поиск по ID - точное совпадение, по username - префикс без учета регистра"""
+        by_id = str(_user_search_query("12345").compile(compile_kwargs={"literal_binds": True}))
+        assert "users.telegram_id = 12345" in by_id
+        
+        by_name = _user_search_query("@Ivan_").compile(dialect=postgresql.dialect())
+        assert "lower(users.username) LIKE %(lower_1)s ESCAPE" in str(by_name)
+        assert by_name.params["lower_1"] == "ivan\\_%"
+
+
+class TestExport:
+    """Тесты выгрузки заявок"""
+    
+    def test_parse_args(self):
+        """Аргументы /export разбираются в любом порядке"""
+        export_filter = parse_export_args(["csv", "01.06.2025", "approved", "30.06.2025"])
+        assert export_filter == ExportFilter(
+            date_from=date(2025, 6, 1), date_to=date(2025, 6, 30),
+            statuses=(ApplicationStatus.APPROVED,), fmt="csv"
+        )
+        assert parse_export_args([]) == ExportFilter()
+        with pytest.raises(ValueError):
+            parse_export_args(["вчера"])
+        with pytest.raises(ValueError):
+            parse_export_args(["30.06.2025", "01.06.2025"])
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fmt", ["xlsx", "csv"])
+    async def test_rows_per_participant(self, sqlite_session, fmt):
+        """Строка на участника, фильтр по периоду подачи, черновики не выгружаются"""
+        session = SyncSessionAdapter(sqlite_session)
+        for idx, (status, submitted_at) in enumerate([
+            (ApplicationStatus.SUBMITTED, datetime(2025, 6, 30, 23, 0)),
+            (ApplicationStatus.SUBMITTED, datetime(2025, 7, 1, 9, 0)),
+            (ApplicationStatus.DRAFT, None)
+        ], start=1):
+            sqlite_session.add(Application(
+                id=idx, user_id=1, sport_type="Футбол", event_rank="ЧР", country="Россия", city="Казань",
+                status=status, submitted_at=submitted_at
+            ))
+        sqlite_session.flush()
+        await sync_participants(session, 1, [
+            {"full_name": "Иванов Иван", "date_from": "01.07.2025", "date_to": "05.07.2025"},
+            {"full_name": "Петров Петр", "date_from": "02.07.2025", "date_to": "05.07.2025"}
+        ], replace=False)
+        
+        output = io.BytesIO()
+        count = await write_export(session, ExportFilter(date_to=date(2025, 6, 30), fmt=fmt), output)
+        assert count == 2
+        
+        output.seek(0)
+        if fmt == "csv":
+            lines = output.read().decode("utf-8-sig").splitlines()
+            rows = [line.split(";") for line in lines]
+        else:
+            rows = list(openpyxl.load_workbook(output).active.iter_rows(values_only=True))
+        assert len(rows) == 3
+        assert rows[0][0] == "№ заявки"
+        assert [row[8] for row in rows[1:]] == ["Иванов Иван", "Петров Петр"]
+        assert rows[1][9] == "01.07.2025"
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("fmt", ["xlsx", "csv"])
+    async def test_rows_written_off_loop(self, monkeypatch, fmt):
+        """Строки пишутся порциями вне потока event loop"""
+        async def rows(session, export_filter):
+            for idx in range(5):
+                yield (idx, "submitted", "", "Футбол", "ЧР", "Россия", "Казань", 1, f"Участник {idx}", "", "")
+        
+        threads = []
+        append = getattr(export, f"_append_{fmt}")
+        
+        def recording_append(target, batch):
+            threads.append((threading.get_ident(), len(batch)))
+            append(target, batch)
+        
+        monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+        monkeypatch.setattr(export, "iter_export_rows", rows)
+        monkeypatch.setattr(export, f"_append_{fmt}", recording_append)
+        
+        output = io.BytesIO()
+        assert await write_export(None, ExportFilter(fmt=fmt), output) == 5
+        assert [size for _, size in threads] == [2, 2, 1]
+        assert threading.get_ident() not in {ident for ident, _ in threads}
+
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+EXPLAIN_CASES = [
+    (
+        "SELECT id FROM applications WHERE user_id = 7 ORDER BY created_at DESC, id DESC LIMIT 11",
+        "ix_applications_user_created"
+    ),
+    (
+        "SELECT id FROM applications WHERE user_id = 7 AND status = 'DRAFT' "
+        "ORDER BY updated_at DESC, id DESC LIMIT 6",
+        "ix_applications_user_status_updated"
+    ),
+    ("SELECT count(*) FROM participants WHERE application_id = 42", "ix_participants_application_id"),
+    (
+        "SELECT id FROM users WHERE status = 'PENDING' AND id < 4000 ORDER BY id DESC LIMIT 21",
+        "ix_users_status_id"
+    ),
+    ("SELECT id FROM users WHERE lower(username) LIKE 'user12%'", "ix_users_username_lower"),
+    (
+        "SELECT id FROM participants WHERE participants.date_from IS NOT NULL "
+        "AND participants.date_to IS NOT NULL AND participants.date_from <= participants.date_to "
+        "AND daterange(date_from, date_to, '[]') && daterange('2025-03-01', '2025-03-02', '[]')",
+        "ix_participants_travel_period"
+    )
+]
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL не задан")
+class TestMigrations:
+    """Миграции на PostgreSQL: индексы используются планировщиком"""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("query,index_name", EXPLAIN_CASES)
+    async def test_query_uses_index(self, query, index_name):
+        """EXPLAIN показывает нужный индекс (все изменения откатываются)"""
+        engine = create_async_engine(TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"))
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.execute(text("CREATE SCHEMA migrations_test"))
+                await conn.execute(text("SET LOCAL search_path TO migrations_test"))
+                await conn.run_sync(_upgrade)
+                
+                await conn.execute(text(
+                    "INSERT INTO users (id, telegram_id, username, status, is_admin) "
+                    "SELECT g, g, 'User' || g, CASE WHEN g % 50 = 0 THEN 'PENDING' ELSE 'APPROVED' END::userstatus, "
+                    "false FROM generate_series(1, 5000) g"
+                ))
+                await conn.execute(text(
+                    "INSERT INTO applications (user_id, sport_type, event_rank, country, city, "
+                    "participants_data, status, email_sent, telegram_sent, created_at) "
+                    "SELECT g % 500 + 1, '', '', '', '', '{}', "
+                    "CASE WHEN g % 5 = 0 THEN 'DRAFT' ELSE 'SUBMITTED' END::applicationstatus, false, false, "
+                    "now() - g * interval '1 minute' FROM generate_series(1, 20000) g"
+                ))
+                await conn.execute(text(
+                    "INSERT INTO participants (application_id, full_name, date_from, date_to, order_num) "
+                    "SELECT g % 20000 + 1, '', date '2025-01-01' + g % 365, date '2025-01-01' + g % 365 + 7, 1 "
+                    "FROM generate_series(1, 40000) g"
+                ))
+                await conn.execute(text("ANALYZE"))
+                
+                plan = "\n".join((await conn.execute(text(f"EXPLAIN {query}"))).scalars())
+                assert index_name in plan, plan
+            finally:
+                await transaction.rollback()
+        await engine.dispose()
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["rows", "jsonb"])
+    async def test_find_travelling(self, mode, monkeypatch):
+        """Пересечение периодов с границами включительно, черновики и участники без дат не учитываются"""
+        monkeypatch.setattr(config, "PARTICIPANTS_STORAGE", mode)
+        engine = create_async_engine(TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"))
+        async with engine.connect() as conn:
+            transaction = await conn.begin()
+            try:
+                await conn.execute(text("CREATE SCHEMA migrations_test"))
+                await conn.execute(text("SET LOCAL search_path TO migrations_test"))
+                await conn.run_sync(_upgrade)
+                await conn.execute(text(
+                    "INSERT INTO users (id, telegram_id, status, is_admin) VALUES (1, 1, 'APPROVED', false)"
+                ))
+                
+                session = AsyncSession(bind=conn)
+                trips = [
+                    ("Иванов", "01.06.2025", "10.06.2025", ApplicationStatus.SUBMITTED),
+                    ("Петров", "10.06.2025", "20.06.2025", ApplicationStatus.APPROVED),
+                    ("Сидоров", "11.06.2025", "12.06.2025", ApplicationStatus.SUBMITTED),
+                    ("Черновик", "01.06.2025", "30.06.2025", ApplicationStatus.DRAFT),
+                    # Старые данные: пустые, нераспознанные и перепутанные даты
+                    ("Без дат", "", "", ApplicationStatus.SUBMITTED),
+                    ("Не дата", "5 июня", "10.06.2025", ApplicationStatus.SUBMITTED),
+                    ("Наоборот", "10.06.2025", "05.06.2025", ApplicationStatus.SUBMITTED)
+                ]
+                for full_name, date_from, date_to, status in trips:
+                    participants = [{"full_name": full_name, "date_from": date_from, "date_to": date_to}]
+                    application = Application(
+                        user_id=1, sport_type="", event_rank="", country="Россия", city="Казань",
+                        participants_data=participants_json(participants), status=status
+                    )
+                    session.add(application)
+                    await session.flush()
+                    await save_participants(session, application.id, participants, replace=False)
+                
+                rows = await find_travelling(session, date(2025, 6, 5), date(2025, 6, 10))
+                assert [(row.full_name, row.date_from) for row in rows] == [
+                    ("Иванов", date(2025, 6, 1)), ("Петров", date(2025, 6, 10))
+                ]
+            finally:
+                await transaction.rollback()
+        await engine.dispose()
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL не задан")
+class TestUserCacheListener:
+    """Инвалидация кэша пользователей через LISTEN/NOTIFY"""
+    
+    @staticmethod
+    async def wait_for(condition, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+    
+    @pytest.mark.asyncio
+    async def test_invalidated_on_commit(self):
+        """Изменение пользователя в другом процессе удаляет его из кэша после commit"""
+        cache = UserAccessCache(ttl=60, max_size=10)
+        cache.put(CachedUser(telegram_id=1, status=UserStatus.APPROVED, is_admin=False))
+        listener = UserCacheListener(cache, TEST_DATABASE_URL)
+        await listener.start()
+        engine = create_async_engine(TEST_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"))
+        try:
+            # После подписки кэш очищается: уведомления до нее могли быть пропущены
+            await self.wait_for(lambda: len(cache) == 0)
+            for user_id in (1, 2):
+                cache.put(CachedUser(telegram_id=user_id, status=UserStatus.APPROVED, is_admin=False))
+            
+            async with AsyncSession(engine) as session:
+                await publish_user_change(session, 1)
+                await asyncio.sleep(0.1)
+                assert cache.get(1) is not None
+                await session.commit()
+            
+            await self.wait_for(lambda: cache.get(1) is None)
+            assert cache.get(2) is not None
+            assert listener.get_stats()["received"] == 1
+        finally:
+            await listener.stop()
+            await engine.dispose()
 
 
 class TestApplication: